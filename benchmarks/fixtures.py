@@ -0,0 +1,155 @@
+"""Synthetic data, an isolated service container and the in-process fake Gmail server"""
+import asyncio
+import os
+import random
+import socket
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from config.settings import settings
+
+# (category, vocabulary) pairs the synthetic policies and inquiries draw from
+TOPICS = [
+    ("billing", ["refund", "invoice", "charge", "payment", "credit", "subscription", "prorated", "receipt"]),
+    ("shipping", ["shipping", "delivery", "tracking", "courier", "package", "express", "customs", "address"]),
+    ("support", ["support", "hours", "hotline", "ticket", "agent", "response", "escalation", "contact"]),
+    ("account", ["account", "password", "login", "profile", "security", "verification", "email", "settings"]),
+    ("product", ["warranty", "repair", "defect", "replacement", "manual", "setup", "compatibility", "model"]),
+]
+FILLER = [
+    "customers", "may", "request", "within", "days", "of", "purchase", "our", "team", "reviews",
+    "each", "case", "and", "responds", "by", "email", "business", "standard", "additional", "fee",
+    "applies", "orders", "over", "eligible", "for", "free", "processing", "takes", "weeks", "policy"
+]
+
+def synthetic_policies(count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """Policies of about 500 characters each, so every policy is one index chunk"""
+    rng = random.Random(seed)
+    records = []
+    for i in range(count):
+        category, vocabulary = TOPICS[i % len(TOPICS)]
+        sentences = []
+        while sum(len(s) for s in sentences) < 500:
+            words = rng.sample(vocabulary, 2) + rng.sample(FILLER, 8)
+            rng.shuffle(words)
+            sentences.append(" ".join(words).capitalize() + ".")
+        records.append({
+            'title': f"{category.title()} policy {i}",
+            'content': " ".join(sentences),
+            'category': category,
+            'keywords': rng.sample(vocabulary, 3)
+        })
+    return records
+
+def synthetic_emails(count: int, seed: int = 1) -> List[Dict[str, Any]]:
+    """Distinct customer inquiries, so exact-match caching does not hide the work"""
+    rng = random.Random(seed)
+    emails = []
+    for i in range(count):
+        _, vocabulary = TOPICS[rng.randrange(len(TOPICS))]
+        topic = " ".join(rng.sample(vocabulary, 2))
+        emails.append({
+            'to': f"customer{i}@example.com",
+            'subject': f"Question about {topic}",
+            'body': (
+                f"Hello, I have a question about {topic} for order {rng.randrange(10**6)}. "
+                f"Could you explain how {rng.choice(vocabulary)} works? Thanks."
+            ),
+            'priority': rng.choice(["low", "normal", "high"])
+        })
+    return emails
+
+def configure(workdir: str, options, gmail_endpoint: Optional[str] = None):
+    """Point every backend at a fake and every data file into workdir"""
+    settings.LLM_BACKEND = "fake"
+    settings.EMBEDDING_BACKEND = "fake"
+    settings.FAKE_LLM_LATENCY_MS = options.llm_latency_ms
+    settings.FAKE_LLM_ERROR_RATE = options.error_rate
+    settings.FAKE_EMBEDDING_LATENCY_MS = options.embedding_latency_ms
+    settings.FAKE_EMBEDDING_ERROR_RATE = options.error_rate
+    settings.FAKE_EMBEDDING_DIMENSIONS = options.dimensions
+    settings.OPENAI_API_KEY = settings.OPENAI_API_KEY or "unused"
+    settings.GMAIL_API_ENDPOINT = gmail_endpoint
+    settings.EMBEDDING_CACHE_PATH = os.path.join(workdir, "embedding_cache.db")
+    settings.POLICY_INDEX_PATH = os.path.join(workdir, "policy_index")
+    settings.DATABASE_URL = f"sqlite:///{os.path.join(workdir, 'auto_responder.db')}"
+    settings.INBOX_POLL_INTERVAL = 0
+    # Splitting one-chunk policies in a process pool only adds start-up noise
+    settings.INGEST_SPLIT_WORKERS = 0
+    if not options.rate_limits:
+        # Measure the code rather than the configured OpenAI and Gmail quotas
+        settings.OPENAI_REQUESTS_PER_MINUTE = 10 ** 9
+        settings.OPENAI_BURST = 10 ** 6
+        settings.GMAIL_SEND_RATE_PER_SECOND = float(10 ** 9)
+        settings.GMAIL_SEND_BURST = 10 ** 6
+
+async def create_services(redis_url: Optional[str] = None):
+    """A ServiceContainer with an empty policy index.
+
+    Redis is only used when redis_url is given, so runs are reproducible
+    on machines without it.
+    """
+    # Imported late so the settings changed by configure() are seen by every service
+    from services.container import ServiceContainer
+
+    services = ServiceContainer()
+    await services.template_service.load_templates()
+    if redis_url:
+        settings.REDIS_URL = redis_url
+        await services.cache_service.initialize()
+    return services
+
+async def build_services(corpus_size: int, redis_url: Optional[str] = None):
+    """A ServiceContainer over a synthetic corpus of corpus_size chunks"""
+    services = await create_services(redis_url)
+    await services.policy_service.add_policies_bulk(synthetic_policies(corpus_size))
+    return services
+
+class FakeGmail:
+    """tools/fake_gmail_server.py served by uvicorn on a background thread"""
+
+    def __init__(self, latency_ms: float, error_rate: float):
+        os.environ.setdefault("FAKE_GMAIL_SEED_MESSAGES", "0")
+        import uvicorn
+        from tools import fake_gmail_server
+
+        self.module = fake_gmail_server
+        self.module.LATENCY_MS = latency_ms
+        self.module.ERROR_RATE = error_rate
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            self.port = probe.getsockname()[1]
+        self.server = uvicorn.Server(uvicorn.Config(
+            self.module.app, host="127.0.0.1", port=self.port, log_level="warning"
+        ))
+        self._thread = threading.Thread(target=self.server.run, name="fake-gmail", daemon=True)
+
+    @property
+    def endpoint(self) -> str:
+        return f"http://127.0.0.1:{self.port}/"
+
+    def start(self):
+        self._thread.start()
+        deadline = time.monotonic() + 10
+        while not self.server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError("Fake Gmail server did not start")
+            time.sleep(0.05)
+
+    def stop(self):
+        self.server.should_exit = True
+        self._thread.join(timeout=10)
+
+    def deliver(self, emails: List[Dict[str, Any]]):
+        """Add inbound messages to the fake inbox, sent from each email's customer address"""
+        for email in emails:
+            self.module.mailbox.add(email['to'], email['subject'], email['body'])
+
+    def sent_count(self) -> int:
+        return sum(1 for m in self.module.mailbox.messages.values() if 'SENT' in m['labelIds'])
+
+async def shutdown(services):
+    await services.shutdown()
+    # Let cancelled inbox workers finish unwinding before the next container starts
+    await asyncio.sleep(0)
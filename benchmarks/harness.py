@@ -0,0 +1,137 @@
+"""Timing, memory and regression helpers shared by the benchmark scenarios"""
+import asyncio
+import math
+import sys
+import time
+import tracemalloc
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows: peak RSS is not reported
+    resource = None
+
+# A call returns how many of its operations failed (None counts as 0);
+# raising counts every operation of the call as failed
+Call = Callable[[int], Awaitable[Optional[int]]]
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of already sorted values"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+def max_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process so far"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes elsewhere
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+async def drive(
+    call: Call,
+    count: int,
+    concurrency: int = 1,
+    operations_per_call: int = 1,
+    trace_memory: bool = True
+) -> Dict[str, Any]:
+    """Run call(0..count-1) with at most ``concurrency`` in flight and summarize.
+
+    Latency is per call; throughput is operations per second of wall time.
+    Peak memory is the Python heap high-water mark while the calls ran
+    (tracemalloc, so native FAISS buffers are not included).
+    """
+    latencies: List[float] = []
+    errors = 0
+    slots = asyncio.Semaphore(concurrency)
+
+    async def run(i: int):
+        nonlocal errors
+        async with slots:
+            started = time.perf_counter()
+            try:
+                errors += await call(i) or 0
+            except Exception:
+                errors += operations_per_call
+            latencies.append(time.perf_counter() - started)
+
+    if trace_memory:
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*[run(i) for i in range(count)])
+        elapsed = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+
+    latencies.sort()
+    operations = count * operations_per_call
+    return {
+        'operations': operations,
+        'errors': errors,
+        'seconds': round(elapsed, 3),
+        'throughput_per_s': round(operations / elapsed, 2) if elapsed else 0.0,
+        'latency_ms': {
+            'mean': round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+            'p50': round(percentile(latencies, 50) * 1000, 2),
+            'p95': round(percentile(latencies, 95) * 1000, 2),
+            'p99': round(percentile(latencies, 99) * 1000, 2),
+            'max': round(latencies[-1] * 1000, 2) if latencies else 0.0
+        },
+        'peak_memory_mb': round(peak / (1024 * 1024), 2) if peak is not None else None,
+        'max_rss_mb': max_rss_mb()
+    }
+
+def case_key(result: Dict[str, Any]) -> str:
+    """Identifies a case across runs, e.g. ``batch[batch_size=100]``"""
+    params = ",".join(f"{k}={v}" for k, v in sorted(result['params'].items()))
+    return f"{result['scenario']}[{params}]"
+
+def compare(
+    results: List[Dict[str, Any]],
+    baseline: List[Dict[str, Any]],
+    max_regression: float
+) -> List[str]:
+    """Cases whose p95 latency rose, or throughput fell, by more than max_regression (a fraction)"""
+    previous = {case_key(result): result for result in baseline}
+    regressions = []
+    for result in results:
+        before = previous.get(case_key(result))
+        if before is None:
+            continue
+        key = case_key(result)
+        p95, base_p95 = result['latency_ms']['p95'], before['latency_ms']['p95']
+        if base_p95 and p95 > base_p95 * (1 + max_regression):
+            regressions.append(f"{key}: p95 {base_p95}ms -> {p95}ms")
+        rate, base_rate = result['throughput_per_s'], before['throughput_per_s']
+        if base_rate and rate < base_rate * (1 - max_regression):
+            regressions.append(f"{key}: throughput {base_rate}/s -> {rate}/s")
+    return regressions
+
+def format_table(results: List[Dict[str, Any]]) -> str:
+    """Human-readable summary, one row per case"""
+    header = ("case", "ops", "errors", "ops/s", "p50 ms", "p95 ms", "p99 ms", "peak MB")
+    rows = [header]
+    for result in results:
+        latency = result['latency_ms']
+        rows.append((
+            case_key(result),
+            str(result['operations']),
+            str(result['errors']),
+            f"{result['throughput_per_s']:.1f}",
+            f"{latency['p50']:.1f}",
+            f"{latency['p95']:.1f}",
+            f"{latency['p99']:.1f}",
+            "-" if result['peak_memory_mb'] is None else f"{result['peak_memory_mb']:.1f}"
+        ))
+    widths = [max(len(row[i]) for row in rows) for i in range(len(header))]
+    return "\n".join(
+        "  ".join(cell.ljust(width) if i == 0 else cell.rjust(width)
+                  for i, (cell, width) in enumerate(zip(row, widths)))
+        for row in rows
+    )
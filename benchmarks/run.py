@@ -0,0 +1,128 @@
+"""Offline benchmarks for the hot paths, using the fake LLM, embedding and Gmail backends.
+
+    python -m benchmarks.run --profile quick --output results.json
+    python -m benchmarks.run --profile quick --baseline results.json --max-regression 0.25
+
+Prints throughput, p50/p95/p99 latency and peak memory per case. With
+--baseline, exits with status 1 when any case regressed by more than
+--max-regression, so it can gate CI.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import random
+import sys
+import tempfile
+from typing import List
+
+from benchmarks import fixtures, harness, scenarios
+
+PROFILES = {
+    # Small enough for every CI run
+    'quick': {
+        'corpus_sizes': [10, 1000],
+        'batch_sizes': [1, 10, 50],
+        'inbox_sizes': [50],
+        'queries': 100,
+        'repeats': 3
+    },
+    # Full range, for laptops and release checks
+    'full': {
+        'corpus_sizes': [10, 100, 1000, 10000, 100000],
+        'batch_sizes': [1, 10, 100, 500],
+        'inbox_sizes': [100, 500],
+        'queries': 500,
+        'repeats': 5
+    }
+}
+SCENARIOS = ("search", "generate", "batch", "inbox")
+
+def _sizes(value: str) -> List[int]:
+    return [int(size) for size in value.split(",") if size]
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run the offline benchmarks")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="quick")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"comma-separated subset of {', '.join(SCENARIOS)}")
+    parser.add_argument("--corpus-sizes", type=_sizes, help="policy chunks indexed by the search scenario")
+    parser.add_argument("--batch-sizes", type=_sizes, help="emails per batch for the batch scenario")
+    parser.add_argument("--inbox-sizes", type=_sizes, help="messages per poll for the inbox scenario")
+    parser.add_argument("--queries", type=int, help="searches and generations per case")
+    parser.add_argument("--repeats", type=int, help="batches and polls per case")
+    parser.add_argument("--generate-corpus", type=int, default=1000,
+                        help="corpus size for the generate, batch and inbox scenarios")
+    parser.add_argument("--concurrency", type=int, default=8, help="searches and generations in flight")
+    parser.add_argument("--llm-latency-ms", type=float, default=50.0)
+    parser.add_argument("--embedding-latency-ms", type=float, default=10.0)
+    parser.add_argument("--gmail-latency-ms", type=float, default=20.0)
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="fraction of fake LLM, embedding and Gmail calls that fail")
+    parser.add_argument("--dimensions", type=int, default=1536, help="fake embedding dimensions")
+    parser.add_argument("--rate-limits", action="store_true",
+                        help="keep the configured OpenAI and Gmail rate limits (off: unthrottled)")
+    parser.add_argument("--redis-url", help="use this Redis for the cache (default: in-process only)")
+    parser.add_argument("--no-trace-memory", dest="trace_memory", action="store_false",
+                        help="skip tracemalloc, which slows Python code down while it runs")
+    parser.add_argument("--seed", type=int, default=0, help="seed for injected errors")
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.25,
+                        help="allowed p95 increase / throughput drop against the baseline (fraction)")
+    options = parser.parse_args(argv)
+
+    for name, value in PROFILES[options.profile].items():
+        if getattr(options, name) is None:
+            setattr(options, name, value)
+    options.scenarios = [name for name in options.scenarios.split(",") if name]
+    unknown = set(options.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    return options
+
+async def run(options: argparse.Namespace) -> List[dict]:
+    random.seed(options.seed)
+    results = []
+    gmail = None
+    if {"batch", "inbox"} & set(options.scenarios):
+        gmail = fixtures.FakeGmail(options.gmail_latency_ms, options.error_rate)
+        gmail.start()
+    try:
+        with tempfile.TemporaryDirectory(prefix="autoresponder-bench-") as workdir:
+            if "search" in options.scenarios:
+                results += await scenarios.bench_search(options, workdir)
+            if "generate" in options.scenarios:
+                results += await scenarios.bench_generate(options, workdir)
+            if "batch" in options.scenarios:
+                results += await scenarios.bench_batch(options, workdir, gmail)
+            if "inbox" in options.scenarios:
+                results += await scenarios.bench_inbox(options, workdir, gmail)
+    finally:
+        if gmail:
+            gmail.stop()
+    return results
+
+def main(argv=None) -> int:
+    options = parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+    results = asyncio.run(run(options))
+    print(harness.format_table(results))
+
+    if options.output:
+        with open(options.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if options.baseline:
+        with open(options.baseline) as f:
+            regressions = harness.compare(results, json.load(f), options.max_regression)
+        if regressions:
+            print(f"\nRegressions beyond {options.max_regression:.0%}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print("\nNo regressions against the baseline")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
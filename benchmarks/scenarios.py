@@ -0,0 +1,129 @@
+"""Benchmark scenarios for the hot paths.
+
+Each scenario builds its own services over a synthetic corpus and returns
+one result per case (see harness.drive for the fields).
+"""
+import os
+from typing import Any, Dict, List
+
+from benchmarks import fixtures
+from benchmarks.harness import drive
+from config.settings import settings
+
+def _case(scenario: str, params: Dict[str, Any], measured: Dict[str, Any]) -> Dict[str, Any]:
+    return {'scenario': scenario, 'params': params, **measured}
+
+async def bench_search(options, workdir: str) -> List[Dict[str, Any]]:
+    """Ingest, then search_policies, at each corpus size"""
+    results = []
+    queries = [
+        f"{email['subject']} {email['body']}"
+        for email in fixtures.synthetic_emails(options.queries)
+    ]
+    for corpus_size in options.corpus_sizes:
+        fixtures.configure(os.path.join(workdir, f"search-{corpus_size}"), options)
+        services = await fixtures.create_services(options.redis_url)
+        try:
+            policy_service = services.policy_service
+            records = fixtures.synthetic_policies(corpus_size)
+
+            async def ingest(i: int):
+                await policy_service.add_policies_bulk(records)
+
+            # Throughput is chunks per second (one chunk per synthetic policy)
+            results.append(_case(
+                "ingest", {'corpus': corpus_size},
+                await drive(ingest, 1, operations_per_call=corpus_size, trace_memory=options.trace_memory)
+            ))
+            store = policy_service.vector_store
+            index = type(store.index).__name__ if store is not None else "none"
+
+            async def search(i: int):
+                await policy_service.search_policies(queries[i])
+
+            results.append(_case(
+                "search", {'corpus': corpus_size, 'index': index},
+                await drive(search, len(queries), options.concurrency, trace_memory=options.trace_memory)
+            ))
+        finally:
+            await fixtures.shutdown(services)
+    return results
+
+async def bench_generate(options, workdir: str) -> List[Dict[str, Any]]:
+    """generate_response with the cache off, then cold, then warm over the same inquiries"""
+    fixtures.configure(os.path.join(workdir, "generate"), options)
+    services = await fixtures.build_services(options.generate_corpus, options.redis_url)
+    emails = fixtures.synthetic_emails(options.queries)
+    results = []
+    try:
+        generator = services.response_generator
+        for cache in ("off", "cold", "warm"):
+            async def generate(i: int, cache=cache):
+                email = emails[i]
+                await generator.generate_response(
+                    email['subject'], email['body'], email['priority'], use_cache=cache != "off"
+                )
+
+            results.append(_case(
+                "generate",
+                {'corpus': options.generate_corpus, 'cache': cache, 'concurrency': options.concurrency},
+                await drive(generate, len(emails), options.concurrency, trace_memory=options.trace_memory)
+            ))
+    finally:
+        await fixtures.shutdown(services)
+    return results
+
+async def bench_batch(options, workdir: str, gmail: fixtures.FakeGmail) -> List[Dict[str, Any]]:
+    """BatchProcessor.process_batch (what /emails/batch runs) at each batch size"""
+    fixtures.configure(os.path.join(workdir, "batch"), options, gmail_endpoint=gmail.endpoint)
+    settings.MAX_BATCH_SIZE = max(options.batch_sizes)
+    services = await fixtures.build_services(options.generate_corpus, options.redis_url)
+    results = []
+    try:
+        for batch_size in options.batch_sizes:
+            batches = [
+                fixtures.synthetic_emails(batch_size, seed=batch_size * 1000 + n)
+                for n in range(options.repeats)
+            ]
+
+            async def run_batch(i: int):
+                outcome = await services.batch_processor.process_batch(batches[i], use_cache=True)
+                return sum(1 for result in outcome if result['status'] != 'sent')
+
+            results.append(_case(
+                "batch", {'batch_size': batch_size},
+                await drive(
+                    run_batch, options.repeats,
+                    operations_per_call=batch_size, trace_memory=options.trace_memory
+                )
+            ))
+    finally:
+        await fixtures.shutdown(services)
+    return results
+
+async def bench_inbox(options, workdir: str, gmail: fixtures.FakeGmail) -> List[Dict[str, Any]]:
+    """A full inbox poll (what /emails/process-inbox queues) until every message is handled"""
+    fixtures.configure(os.path.join(workdir, "inbox"), options, gmail_endpoint=gmail.endpoint)
+    services = await fixtures.build_services(options.generate_corpus, options.redis_url)
+    inbox = services.inbox_processor
+    results = []
+    try:
+        for inbox_size in options.inbox_sizes:
+            settings.GMAIL_SYNC_MAX_RESULTS = inbox_size
+
+            async def poll(i: int, inbox_size=inbox_size):
+                # Fresh mail each round; earlier rounds' messages are already in the ledger
+                gmail.deliver(fixtures.synthetic_emails(inbox_size, seed=inbox_size * 1000 + i))
+                outcomes = await inbox.poll_and_wait(incremental=False)
+                return outcomes['failed']
+
+            results.append(_case(
+                "inbox", {'messages': inbox_size},
+                await drive(
+                    poll, options.repeats,
+                    operations_per_call=inbox_size, trace_memory=options.trace_memory
+                )
+            ))
+    finally:
+        await fixtures.shutdown(services)
+    return results
@@ -6,21 +6,121 @@ class Settings(BaseSettings):
     GMAIL_CREDENTIALS_PATH: str = "credentials.json"
     GMAIL_TOKEN_PATH: str = "token.json"
     GMAIL_SCOPES: list = ["https://www.googleapis.com/auth/gmail.modify"]
+    GMAIL_MAX_WORKERS: int = 8  # threads (and keep-alive connections) for Gmail calls
+    GMAIL_HTTP_TIMEOUT: int = 30  # seconds
+    GMAIL_BATCH_SIZE: int = 50  # messages per batch HTTP request (Gmail recommends <= 50)
+    GMAIL_SYNC_MAX_RESULTS: int = 100  # messages listed on a full sync / processed per poll
+    GMAIL_BODY_BATCH_WINDOW_MS: int = 10  # inbox body fetches started within this window share a batch
+    GMAIL_API_ENDPOINT: Optional[str] = None  # e.g. http://localhost:8025/ for the fake server
     
     # OpenAI settings
     OPENAI_API_KEY: Optional[str] = None
     OPENAI_MODEL: str = "gpt-3.5-turbo"
+    EMBEDDING_MODEL: str = "text-embedding-ada-002"
+    OPENAI_MAX_CONNECTIONS: int = 20  # pooled connections shared by chat and embeddings
+    OPENAI_TIMEOUT: float = 60.0  # seconds
+    
+    # Model backends: openai, or fake for offline benchmarks and development
+    LLM_BACKEND: str = "openai"
+    EMBEDDING_BACKEND: str = "openai"
+    FAKE_LLM_LATENCY_MS: float = 300.0  # before the first token
+    FAKE_LLM_TOKEN_LATENCY_MS: float = 0.0  # per generated token
+    FAKE_LLM_REPLY_TOKENS: int = 80
+    FAKE_LLM_ERROR_RATE: float = 0.0  # fraction of calls that fail with a server error
+    FAKE_EMBEDDING_DIMENSIONS: int = 1536
+    FAKE_EMBEDDING_LATENCY_MS: float = 50.0  # per request
+    FAKE_EMBEDDING_ERROR_RATE: float = 0.0
+    
+    # Embedding cache settings
+    EMBEDDING_CACHE_PATH: str = "./data/embedding_cache.db"
+    EMBEDDING_CACHE_LRU_SIZE: int = 10000  # vectors kept in process memory
+    
+    # Policy index persistence
+    POLICY_INDEX_PATH: str = "./data/policy_index"
+    POLICY_INDEX_MMAP: bool = True  # memory-map the index where FAISS supports it
+    POLICY_INDEX_TYPE: str = "auto"  # auto, flat, ivf or hnsw
+    POLICY_INDEX_FLAT_THRESHOLD: int = 10000  # auto: exact flat index below this many chunks, IVF above
+    POLICY_INDEX_QUANTIZER: str = "none"  # none, sq8 or pq
+    POLICY_INDEX_PQ_M: int = 16  # PQ sub-vectors; must divide the embedding dimension
+    POLICY_INDEX_NPROBE: int = 16  # IVF lists scanned per query
+    POLICY_INDEX_HNSW_M: int = 32  # HNSW graph degree
+    POLICY_INDEX_HNSW_EF_SEARCH: int = 64  # HNSW search breadth
+    POLICY_RELOAD_INTERVAL: float = 5.0  # seconds between checks for policy and template changes saved by other processes (0: off)
+    
+    # Bulk policy ingestion
+    INGEST_EMBED_BATCH_SIZE: int = 512  # chunks per embedding request
+    INGEST_EMBED_CONCURRENCY: int = 4  # embedding requests in flight
+    INGEST_MAX_RETRIES: int = 6  # per batch, on rate limits, timeouts and 5xx
+    INGEST_RETRY_BASE_DELAY: float = 1.0  # seconds; doubles per retry unless Retry-After says otherwise
+    INGEST_SPLIT_WORKERS: int = 4  # processes for chunk splitting; 0 splits in-process
+    
+    # Hybrid (BM25 + vector) policy retrieval
+    HYBRID_SEARCH_ENABLED: bool = True
+    HYBRID_CANDIDATES: int = 20  # hits taken from each retriever before fusion
+    HYBRID_RRF_K: int = 60  # reciprocal rank fusion constant
+    HYBRID_FAST_PATH_MARGIN: float = 2.0  # BM25 lead needed to skip the embedding call; 0 disables
+    
+    # Coalescing of identical in-flight generations
+    COALESCE_ENABLED: bool = True
+    COALESCE_LOCK_TTL: float = 30.0  # seconds; upper bound on how long other workers wait
+    COALESCE_POLL_INTERVAL: float = 0.1  # seconds between lock checks while another worker generates
+    
+    # Response templates (answered without the LLM)
+    TEMPLATES_ENABLED: bool = True
+    TEMPLATE_MATCH_THRESHOLD: float = 0.92  # cosine similarity to a template example
+    TEMPLATE_MATCH_MARGIN: float = 0.03  # lead over the next template's best example
+    TEMPLATE_PREFILTER_OVERLAP: float = 0.5  # share of an example's words an inquiry needs before it is embedded (0: always)
     
     # Database settings
     DATABASE_URL: str = "sqlite:///./auto_responder.db"
     
+    # Durable job queue (stored in DATABASE_URL)
+    JOB_WORKERS_IN_API: int = 1  # job slots run by the API process; 0 leaves jobs to worker.py
+    JOB_WORKER_CONCURRENCY: int = 2  # job slots per worker.py process
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_RETRY_BASE_DELAY: float = 5.0  # seconds; doubles per attempt, with jitter
+    JOB_RETRY_MAX_DELAY: float = 300.0  # seconds
+    JOB_LEASE_SECONDS: int = 120  # a job whose worker stops renewing is reclaimed after this
+    JOB_POLL_INTERVAL: float = 1.0  # seconds an idle job slot waits before checking again
+    
     # Redis settings for caching
     REDIS_URL: str = "redis://localhost:6379"
+    REDIS_MAX_CONNECTIONS: int = 50  # connection pool size shared by every cache call
     CACHE_TTL: int = 3600  # 1 hour
+    CACHE_NAMESPACE: str = "autoresponder"  # prefix for every Redis key this app writes
+    CACHE_COMPRESS_THRESHOLD: int = 1024  # bytes; larger encoded values are zlib-compressed
+    
+    # In-process L1 cache in front of Redis
+    L1_CACHE_MAX_ENTRIES: int = 2048
+    L1_CACHE_MAX_BYTES: int = 64 * 1024 * 1024  # approximate, by encoded value size
+    L1_CACHE_TTL: int = 300  # caps how long a key lives in-process
+    
+    # Semantic response cache for near-duplicate inquiries
+    SEMANTIC_CACHE_ENABLED: bool = True
+    SEMANTIC_CACHE_THRESHOLD: float = 0.95  # cosine similarity required for reuse
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 5000
     
     # Email processing settings
     MAX_BATCH_SIZE: int = 10
-    PROCESSING_DELAY: int = 2  # seconds
+    BATCH_GENERATION_CONCURRENCY: int = 8  # concurrent retrieval + LLM calls
+    BATCH_SEND_CONCURRENCY: int = 4  # concurrent Gmail sends
+    PROCESSING_DELAY: int = 2  # seconds; unused, superseded by the rate limits below
+    
+    # Inbox processing pipeline
+    INBOX_WORKERS: int = 4
+    INBOX_QUEUE_SIZE: int = 100  # producer blocks when this many emails are waiting
+    INBOX_POLL_INTERVAL: int = 0  # seconds between automatic polls; 0 = on demand only
+    INBOX_CLAIM_TIMEOUT: int = 600  # seconds before a message claimed by a worker that died is retried
+    OPENAI_REQUESTS_PER_MINUTE: int = 500
+    OPENAI_BURST: int = 10
+    GMAIL_SEND_RATE_PER_SECOND: float = 2.0  # messages.send costs 100 of 250 quota units/s
+    GMAIL_SEND_BURST: int = 5
+    
+    # Inbox triage (runs before any OpenAI call)
+    TRIAGE_OWN_ADDRESSES: str = ""  # comma-separated; the Gmail account's address is added automatically
+    TRIAGE_TEXT_THRESHOLD: float = 2.0  # text-model score at which mail counts as automated
+    TRIAGE_MAX_REPLIES_PER_THREAD: int = 3  # replies per thread within the window before it is a loop
+    TRIAGE_LOOP_WINDOW: int = 3600  # seconds
     
     model_config = {
         "env_file": ".env"
@@ -63,7 +63,45 @@ const EmailAPI = {
         });
     },
 
-    // Send batch emails
+    // Stream an AI response; onEvent(event, data) is called for each Server-Sent Event
+    async streamResponse(emailData, onEvent) {
+        const response = await fetch(`${API_BASE_URL}/emails/generate/stream`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(emailData)
+        });
+
+        if (!response.ok || !response.body) {
+            throw new Error(response.statusText || `HTTP ${response.status}`);
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+
+            // Events are separated by a blank line
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const block = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+
+                let event = 'message';
+                let data = '';
+                for (const line of block.split('\n')) {
+                    if (line.startsWith('event:')) event = line.slice(6).trim();
+                    else if (line.startsWith('data:')) data += line.slice(5).trim();
+                }
+                onEvent(event, data ? JSON.parse(data) : {});
+            }
+        }
+    },
+
+// Send batch emails
     async sendBatchEmails(batchData) {
         return await fetchAPI('/emails/batch', {
             method: 'POST',
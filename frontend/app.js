@@ -24,6 +24,8 @@ const singleEmailForm = document.querySelector('#compose .form-section:nth-child
 const batchEmailForm = document.querySelector('#compose .form-section:nth-child(2)');
 const sendEmailButton = singleEmailForm ? singleEmailForm.querySelector('.button') : null;
 const generateResponseButton = singleEmailForm ? singleEmailForm.querySelector('.button.secondary') : null;
+const responsePreview = singleEmailForm ? singleEmailForm.querySelector('.response-preview') : null;
+const responsePolicies = singleEmailForm ? singleEmailForm.querySelector('.response-policies') : null;
 const processBatchButton = batchEmailForm ? batchEmailForm.querySelector('.button') : null;
 
 // DOM Elements - Policies
@@ -345,6 +347,55 @@ async function sendEmail(event) {
     }
 }
 
+async function streamGeneratedResponse(event) {
+    event.preventDefault();
+    
+    if (!singleEmailForm || !responsePreview) return;
+    
+    const toInput = singleEmailForm.querySelector('input[type="email"]');
+    const subjectInput = singleEmailForm.querySelector('input[type="text"]');
+    const bodyInput = singleEmailForm.querySelector('textarea');
+    const prioritySelect = singleEmailForm.querySelector('select');
+    
+    if (!subjectInput.value || !bodyInput.value) {
+        showNotification('Please enter a subject and message first', 'error');
+        return;
+    }
+    
+    const emailData = {
+        to: toInput.value,
+        subject: subjectInput.value,
+        body: bodyInput.value,
+        priority: prioritySelect.value.toLowerCase()
+    };
+    
+    responsePreview.value = '';
+    if (responsePolicies) responsePolicies.textContent = '';
+    generateResponseButton.disabled = true;
+    
+    try {
+        await withConnectivityCheck(async () => {
+            await API.Email.streamResponse(emailData, (name, data) => {
+                if (name === 'policies' && responsePolicies) {
+                    const titles = data.policies.map(policy => policy.title);
+                    responsePolicies.textContent = titles.length ? `Policies: ${titles.join(', ')}` : 'No matching policies';
+                } else if (name === 'token') {
+                    responsePreview.value += data.text;
+                    responsePreview.scrollTop = responsePreview.scrollHeight;
+                } else if (name === 'done') {
+                    responsePreview.value = data.response;
+                } else if (name === 'error') {
+                    throw new Error(data.detail);
+                }
+            });
+        });
+    } catch (error) {
+        showNotification(`Error generating response: ${error.message}`, 'error');
+    } finally {
+        generateResponseButton.disabled = false;
+    }
+}
+
 async function processBatchEmails(event) {
     event.preventDefault();
     
@@ -547,6 +598,9 @@ document.addEventListener('DOMContentLoaded', () => {
     if (sendEmailButton) {
         sendEmailButton.addEventListener('click', sendEmail);
     }
+    if (generateResponseButton) {
+        generateResponseButton.addEventListener('click', streamGeneratedResponse);
+    }
     if (processBatchButton) {
         processBatchButton.addEventListener('click', processBatchEmails);
     }
@@ -1,40 +1,46 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Query, Request, Header
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, ValidationError
 from typing import List, Optional, Dict, Any
 import asyncio
+import json
 from datetime import datetime
 import logging
 from contextlib import asynccontextmanager
 
-from services.gmail_service import GmailService
-from services.policy_service import PolicyService
-from services.response_generator import ResponseGenerator
-from services.cache_service import CacheService
+from services import metrics, tracing
+from services.container import ServiceContainer
+from services.jobs import EMAIL_BATCH, INBOX_POLL
 from config.settings import settings
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Configure logging (every line carries the request ID)
+tracing.configure_logging(logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize services
-gmail_service = GmailService()
-policy_service = PolicyService()
-response_generator = ResponseGenerator()
-cache_service = CacheService()
+# Initialize services: one shared instance of each, wired by the container
+services = ServiceContainer()
+gmail_service = services.gmail_service
+policy_service = services.policy_service
+response_generator = services.response_generator
+cache_service = services.cache_service
+template_service = services.template_service
+batch_processor = services.batch_processor
+inbox_processor = services.inbox_processor
+job_queue = services.job_queue
+metrics.register_services(services)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup event
-    # await gmail_service.initialize()
-    await policy_service.load_policies()
-    await cache_service.initialize()
+    # Gmail credentials are loaded lazily on first use
+    await services.startup()
     logger.info("Auto Email Responder started successfully")
     
     yield
     
-    # Shutdown event (if needed)
-    # Add any cleanup code here
+    # Shutdown event
+    await services.shutdown()
 
 app = FastAPI(
     title="Auto Email Responder",
@@ -50,8 +56,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[tracing.REQUEST_ID_HEADER],
 )
 
+# Request IDs and HTTP metrics; added last so it wraps everything else
+app.add_middleware(tracing.RequestContextMiddleware)
+
 # Pydantic models
 class EmailRequest(BaseModel):
     to: str
@@ -59,12 +69,20 @@ class EmailRequest(BaseModel):
     body: str
     priority: Optional[str] = "normal"
 
+class StreamEmailRequest(EmailRequest):
+    send: bool = False
+    use_cache: bool = True
+
 class EmailResponse(BaseModel):
-    id: str
+    id: Optional[str] = None
     status: str
     generated_response: str
     policies_used: List[str]
     timestamp: datetime
+    error: Optional[str] = None
+    cache: Optional[str] = None  # exact, semantic, coalesced or miss
+    source: Optional[str] = None  # template or llm: what produced the reply
+    usage: Optional[Dict[str, int]] = None  # token usage when the LLM was called
 
 class PolicyRequest(BaseModel):
     title: str
@@ -72,6 +90,24 @@ class PolicyRequest(BaseModel):
     category: str
     keywords: List[str]
 
+class PolicyUpdateRequest(BaseModel):
+    title: Optional[str] = None
+    content: Optional[str] = None
+    category: Optional[str] = None
+    keywords: Optional[List[str]] = None
+
+class TemplateRequest(BaseModel):
+    intent: str
+    examples: List[str]
+    response: str
+    policy_ids: List[str] = []
+
+class TemplateUpdateRequest(BaseModel):
+    intent: Optional[str] = None
+    examples: Optional[List[str]] = None
+    response: Optional[str] = None
+    policy_ids: Optional[List[str]] = None
+
 class BatchEmailRequest(BaseModel):
     emails: List[EmailRequest]
     use_cache: bool = True
@@ -93,6 +129,13 @@ async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "timestamp": datetime.now()}
 
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics(request: Request):
+    """Prometheus metrics: stage latencies, cache hit ratios, token usage and queue depths"""
+    # Scraping reads job counts from SQLite, so keep it off the event loop
+    data, content_type = await asyncio.to_thread(metrics.render, request.headers.get("accept", ""))
+    return Response(content=data, headers={"Content-Type": content_type})
+
 @app.post("/emails/send", response_model=EmailResponse)
 async def send_email(email_request: EmailRequest):
     """Send a single email with AI-generated response"""
@@ -116,68 +159,194 @@ async def send_email(email_request: EmailRequest):
             status="sent",
             generated_response=response_data["response"],
             policies_used=response_data["policies_used"],
-            timestamp=datetime.now()
+            timestamp=datetime.now(),
+            cache=response_data.get("cache"),
+            source=response_data.get("source"),
+            usage=response_data.get("usage")
         )
         
     except Exception as e:
         logger.error(f"Error sending email: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/emails/batch", response_model=List[EmailResponse])
-async def send_batch_emails(batch_request: BatchEmailRequest):
-    """Send multiple emails with batch processing"""
-    try:
-        responses = []
-        
-        # Process emails in batches
-        for email_request in batch_request.emails:
-            response_data = await response_generator.generate_response(
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@app.post("/emails/generate/stream")
+async def stream_email_response(email_request: StreamEmailRequest):
+    """Stream an AI-generated response as Server-Sent Events.
+    
+    Emits ``policies`` first, then ``token`` events as text is generated and
+    ``done`` with the full response. With ``send`` set the finished reply is
+    sent via Gmail and a ``sent`` event follows. Failures end the stream with
+    an ``error`` event.
+    """
+    async def events():
+        try:
+            result = None
+            async for item in response_generator.stream_response(
                 subject=email_request.subject,
                 body=email_request.body,
                 priority=email_request.priority,
-                use_cache=batch_request.use_cache
-            )
-            
-            email_id = await gmail_service.send_email(
-                to=email_request.to,
-                subject=email_request.subject,
-                body=response_data["response"]
-            )
+                use_cache=email_request.use_cache
+            ):
+                if item['event'] == 'done':
+                    result = item['data']
+                yield _sse(item['event'], item['data'])
             
-            responses.append(EmailResponse(
-                id=email_id,
-                status="sent",
-                generated_response=response_data["response"],
-                policies_used=response_data["policies_used"],
-                timestamp=datetime.now()
-            ))
-        
-        return responses
+            if email_request.send and result:
+                email_id = await gmail_service.send_email(
+                    to=email_request.to,
+                    subject=email_request.subject,
+                    body=result["response"]
+                )
+                yield _sse('sent', {'id': email_id, 'timestamp': datetime.now()})
+        except Exception as e:
+            logger.error(f"Error streaming response: {str(e)}")
+            yield _sse('error', {'detail': str(e)})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/emails/batch", response_model=List[EmailResponse])
+async def send_batch_emails(batch_request: BatchEmailRequest):
+    """Send multiple emails with batch processing"""
+    try:
+        results = await batch_processor.process_batch(
+            [email.model_dump() for email in batch_request.emails],
+            use_cache=batch_request.use_cache
+        )
+        return [EmailResponse(**result) for result in results]
         
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error in batch processing: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/jobs/emails/batch", status_code=202)
+async def submit_batch_job(
+    batch_request: BatchEmailRequest,
+    idempotency_key: Optional[str] = Header(None)
+):
+    """Queue a batch of emails for a worker; poll /jobs/{job_id} for per-email results"""
+    try:
+        if not batch_request.emails:
+            raise ValueError("No emails provided")
+        job, created = await asyncio.to_thread(
+            job_queue.submit,
+            EMAIL_BATCH,
+            {
+                "emails": [email.model_dump() for email in batch_request.emails],
+                "use_cache": batch_request.use_cache
+            },
+            idempotency_key
+        )
+        return {"job_id": job["id"], "status": job["status"], "created": created}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error submitting batch job: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/jobs/inbox", status_code=202)
+async def submit_inbox_job(
+    incremental: bool = True,
+    idempotency_key: Optional[str] = Header(None)
+):
+    """Queue an inbox-processing job"""
+    try:
+        job, created = await asyncio.to_thread(
+            job_queue.submit, INBOX_POLL, {"incremental": incremental}, idempotency_key
+        )
+        return {"job_id": job["id"], "status": job["status"], "created": created}
+    except Exception as e:
+        logger.error(f"Error submitting inbox job: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/jobs")
+async def list_jobs(
+    status: Optional[str] = Query(None, pattern="^(queued|running|succeeded|failed)$"),
+    limit: int = Query(50, ge=1, le=500)
+):
+    """Most recent jobs, optionally filtered by status"""
+    try:
+        jobs = await asyncio.to_thread(job_queue.list_jobs, status, limit)
+        return {"jobs": jobs, "count": len(jobs)}
+    except Exception as e:
+        logger.error(f"Error listing jobs: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/jobs/stats")
+async def get_job_stats():
+    """Job counts by status and this process's job worker counters"""
+    try:
+        return {
+            "queue": await asyncio.to_thread(job_queue.get_stats),
+            "worker": services.job_worker.get_stats()
+        }
+    except Exception as e:
+        logger.error(f"Error retrieving job stats: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status, progress and result of a job"""
+    try:
+        return {"job": await asyncio.to_thread(job_queue.get, job_id)}
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error retrieving job: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/emails/inbox")
-async def get_inbox_emails():
+async def get_inbox_emails(max_results: int = 10):
     """Retrieve inbox emails"""
     try:
-        emails = await gmail_service.get_inbox_emails()
+        emails = await gmail_service.get_inbox_emails(max_results=max_results)
         return {"emails": emails, "count": len(emails)}
     except Exception as e:
         logger.error(f"Error retrieving emails: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/emails/process-inbox")
-async def process_inbox_emails(background_tasks: BackgroundTasks):
-    """Process inbox emails with auto-responses"""
+async def process_inbox_emails(
+    incremental: bool = True,
+    idempotency_key: Optional[str] = Header(None)
+):
+    """Process inbox emails with auto-responses, as a queued job"""
     try:
-        background_tasks.add_task(gmail_service.process_inbox_emails)
-        return {"message": "Inbox processing started", "status": "processing"}
+        job, _ = await asyncio.to_thread(
+            job_queue.submit, INBOX_POLL, {"incremental": incremental}, idempotency_key
+        )
+        return {"message": "Inbox processing queued", "status": job["status"], "job_id": job["id"]}
     except Exception as e:
         logger.error(f"Error processing inbox: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/emails/pipeline/stats")
+async def get_pipeline_stats():
+    """Inbox pipeline queue depth, backpressure and rate-limit counters"""
+    try:
+        return {"pipeline": inbox_processor.get_stats()}
+    except Exception as e:
+        logger.error(f"Error retrieving pipeline stats: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/emails/sync/status")
+async def get_sync_status():
+    """Inbox sync position and processed-message ledger counts"""
+    try:
+        return {"sync": gmail_service.ledger.get_stats()}
+    except Exception as e:
+        logger.error(f"Error retrieving sync status: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.post("/policies/add")
 async def add_policy(policy_request: PolicyRequest):
     """Add a new company policy"""
@@ -193,16 +362,116 @@ async def add_policy(policy_request: PolicyRequest):
         logger.error(f"Error adding policy: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def _parse_policy_records(raw: bytes) -> List[PolicyRequest]:
+    """Parse a JSON array, {"policies": [...]} or JSON Lines into validated policies"""
+    text = raw.decode("utf-8").strip()
+    if text.startswith("[") or text.startswith("{\"policies\""):
+        data = json.loads(text)
+        records = data["policies"] if isinstance(data, dict) else data
+    else:
+        records = []
+        for line_number, line in enumerate(text.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Line {line_number}: {str(e)}")
+    
+    policies = []
+    for position, record in enumerate(records, start=1):
+        try:
+            policies.append(PolicyRequest(**record))
+        except (ValidationError, TypeError) as e:
+            raise ValueError(f"Policy {position}: {str(e)}")
+    return policies
+
+@app.post("/policies/bulk")
+async def bulk_add_policies(request: Request):
+    """Add many policies from a JSON body, a JSON Lines body or an uploaded .jsonl file"""
+    try:
+        if request.headers.get("content-type", "").startswith("multipart/form-data"):
+            form = await request.form()
+            upload = form.get("file")
+            if upload is None:
+                raise ValueError("Expected a 'file' field")
+            raw = await upload.read()
+        else:
+            raw = await request.body()
+        
+        policies = _parse_policy_records(raw)
+        if not policies:
+            raise ValueError("No policies provided")
+        
+        result = await policy_service.add_policies_bulk(
+            [policy.model_dump() for policy in policies]
+        )
+        return {**result, "status": "added"}
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error in bulk policy ingest: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.put("/policies/{policy_id}")
+async def update_policy(policy_id: str, policy_request: PolicyUpdateRequest):
+    """Update an existing company policy"""
+    try:
+        policy = await policy_service.update_policy(
+            policy_id,
+            title=policy_request.title,
+            content=policy_request.content,
+            category=policy_request.category,
+            keywords=policy_request.keywords
+        )
+        return {"policy": policy, "status": "updated"}
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error updating policy: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.delete("/policies/{policy_id}")
+async def delete_policy(policy_id: str):
+    """Delete a company policy"""
+    try:
+        await policy_service.delete_policy(policy_id)
+        return {"policy_id": policy_id, "status": "deleted"}
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error deleting policy: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/policies/search")
-async def search_policies(query: str):
-    """Search for relevant policies"""
+async def search_policies(
+    query: str,
+    category: Optional[List[str]] = Query(None),
+    k: int = Query(3, ge=1, le=50),
+    score_threshold: Optional[float] = Query(None, ge=0.0, le=1.0)
+):
+    """Search for relevant policies, optionally within categories"""
     try:
-        policies = await policy_service.search_policies(query)
+        policies = await policy_service.search_policies(
+            query, k=k, categories=category, score_threshold=score_threshold
+        )
         return {"policies": policies, "count": len(policies)}
     except Exception as e:
         logger.error(f"Error searching policies: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/policies/index/report")
+async def get_index_report(
+    k: int = Query(10, ge=1, le=100),
+    queries: int = Query(100, ge=1, le=1000)
+):
+    """Recall@k and latency of the policy index against an exact flat baseline"""
+    try:
+        return {"report": await policy_service.index_report(k=k, n_queries=queries)}
+    except Exception as e:
+        logger.error(f"Error building index report: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/policies/all")
 async def get_all_policies():
     """Get all company policies"""
@@ -213,21 +482,101 @@ async def get_all_policies():
         logger.error(f"Error retrieving policies: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/templates/add")
+async def add_template(template_request: TemplateRequest):
+    """Add a response template for a common intent"""
+    try:
+        template_id = await template_service.add_template(
+            intent=template_request.intent,
+            examples=template_request.examples,
+            response=template_request.response,
+            policy_ids=template_request.policy_ids
+        )
+        return {"template_id": template_id, "status": "added"}
+    except Exception as e:
+        logger.error(f"Error adding template: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.put("/templates/{template_id}")
+async def update_template(template_id: str, template_request: TemplateUpdateRequest):
+    """Update an existing response template"""
+    try:
+        template = await template_service.update_template(
+            template_id,
+            intent=template_request.intent,
+            examples=template_request.examples,
+            response=template_request.response,
+            policy_ids=template_request.policy_ids
+        )
+        return {"template": template, "status": "updated"}
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error updating template: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.delete("/templates/{template_id}")
+async def delete_template(template_id: str):
+    """Delete a response template"""
+    try:
+        await template_service.delete_template(template_id)
+        return {"template_id": template_id, "status": "deleted"}
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error deleting template: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/templates/match")
+async def match_template(subject: str, body: str = ""):
+    """Show which template, if any, would answer an inquiry"""
+    try:
+        match = await template_service.match(f"{subject} {body}")
+        if not match:
+            return {"matched": False}
+        return {
+            "matched": True,
+            "template_id": match["template"]["id"],
+            "intent": match["template"]["intent"],
+            "confidence": round(match["confidence"], 4)
+        }
+    except Exception as e:
+        logger.error(f"Error matching template: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/templates/all")
+async def get_all_templates():
+    """Get all response templates"""
+    try:
+        templates = await template_service.get_all_templates()
+        return {"templates": templates, "count": len(templates)}
+    except Exception as e:
+        logger.error(f"Error retrieving templates: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/cache/stats")
 async def get_cache_stats():
     """Get cache statistics"""
     try:
         stats = await cache_service.get_stats()
-        return {"cache_stats": stats}
+        return {
+            "cache_stats": stats,
+            "embedding_cache": await asyncio.to_thread(policy_service.embeddings.get_stats),
+            "retrieval": policy_service.get_search_stats(),
+            "templates": template_service.get_stats(),
+            "semantic_cache": response_generator.semantic_cache.get_stats(),
+            "coalescing": response_generator.get_coalescing_stats(),
+            "prompt_cache": response_generator.get_usage_stats()
+        }
     except Exception as e:
         logger.error(f"Error retrieving cache stats: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/cache/clear")
-async def clear_cache():
-    """Clear all cached data"""
+async def clear_cache(pattern: str = "*"):
+    """Clear this application's cached data, optionally only keys matching a glob pattern"""
     try:
-        await cache_service.clear_cache()
+        await cache_service.clear_cache(pattern)
         return {"message": "Cache cleared successfully"}
     except Exception as e:
         logger.error(f"Error clearing cache: {str(e)}")
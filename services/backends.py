@@ -0,0 +1,69 @@
+from typing import Optional
+import logging
+
+import httpx
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+
+from services.embedding_cache import CachedEmbeddings
+from services.fake_backends import FakeChatModel, FakeEmbeddings
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("openai", "fake")
+
+def _check_backend(name: str, value: str):
+    if value not in BACKENDS:
+        raise ValueError(f"Unknown {name}: {value} (expected one of {', '.join(BACKENDS)})")
+
+def create_embeddings(
+    http_client: Optional[httpx.Client] = None,
+    http_async_client: Optional[httpx.AsyncClient] = None
+) -> CachedEmbeddings:
+    """Embedding model selected by EMBEDDING_BACKEND, behind the shared embedding cache"""
+    _check_backend("EMBEDDING_BACKEND", settings.EMBEDDING_BACKEND)
+    if settings.EMBEDDING_BACKEND == "fake":
+        logger.info("Using the fake embedding backend")
+        # Its own model name keeps fake vectors out of real cache entries and index snapshots
+        return CachedEmbeddings(
+            FakeEmbeddings(
+                dimensions=settings.FAKE_EMBEDDING_DIMENSIONS,
+                latency_ms=settings.FAKE_EMBEDDING_LATENCY_MS,
+                error_rate=settings.FAKE_EMBEDDING_ERROR_RATE
+            ),
+            model=f"fake-hash-{settings.FAKE_EMBEDDING_DIMENSIONS}"
+        )
+    return CachedEmbeddings(
+        OpenAIEmbeddings(
+            model=settings.EMBEDDING_MODEL,
+            openai_api_key=settings.OPENAI_API_KEY,
+            http_client=http_client,
+            http_async_client=http_async_client
+        ),
+        model=settings.EMBEDDING_MODEL
+    )
+
+def create_chat_model(
+    http_client: Optional[httpx.Client] = None,
+    http_async_client: Optional[httpx.AsyncClient] = None
+) -> BaseChatModel:
+    """Chat model selected by LLM_BACKEND"""
+    _check_backend("LLM_BACKEND", settings.LLM_BACKEND)
+    if settings.LLM_BACKEND == "fake":
+        logger.info("Using the fake LLM backend")
+        return FakeChatModel(
+            latency_ms=settings.FAKE_LLM_LATENCY_MS,
+            token_latency_ms=settings.FAKE_LLM_TOKEN_LATENCY_MS,
+            reply_tokens=settings.FAKE_LLM_REPLY_TOKENS,
+            error_rate=settings.FAKE_LLM_ERROR_RATE
+        )
+    return ChatOpenAI(
+        model_name=settings.OPENAI_MODEL,
+        openai_api_key=settings.OPENAI_API_KEY,
+        temperature=0.7,
+        # Report token usage (including cached prompt tokens) on streamed replies too
+        stream_usage=True,
+        http_client=http_client,
+        http_async_client=http_async_client
+    )
@@ -0,0 +1,128 @@
+import asyncio
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Callable, Awaitable
+import logging
+
+from services import tracing
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+class BatchProcessor:
+    """Two-stage batch pipeline: response generation followed by Gmail send.
+
+    Each stage has its own concurrency limit, so a slow LLM call never holds
+    a send slot and vice versa. Results are returned in request order and a
+    failure for one email is recorded on that email only.
+    """
+
+    def __init__(
+        self,
+        response_generator,
+        gmail_service,
+        generation_concurrency: Optional[int] = None,
+        send_concurrency: Optional[int] = None
+    ):
+        self.response_generator = response_generator
+        self.gmail_service = gmail_service
+        self.max_batch_size = settings.MAX_BATCH_SIZE
+        self.generation_concurrency = generation_concurrency or settings.BATCH_GENERATION_CONCURRENCY
+        self.send_concurrency = send_concurrency or settings.BATCH_SEND_CONCURRENCY
+
+    async def process_batch(
+        self,
+        emails: List[Dict[str, Any]],
+        use_cache: bool = True,
+        on_result: Optional[Callable[[int, Dict[str, Any]], Awaitable[None]]] = None
+    ) -> List[Dict[str, Any]]:
+        """Generate and send responses for a batch of emails.
+
+        ``on_result(position, result)`` is awaited as each email finishes,
+        so callers can checkpoint progress.
+        """
+        if len(emails) > self.max_batch_size:
+            raise ValueError(
+                f"Batch size {len(emails)} exceeds maximum of {self.max_batch_size}"
+            )
+
+        # Semaphores are created per batch so they bind to the running loop
+        generation_slots = asyncio.Semaphore(self.generation_concurrency)
+        send_slots = asyncio.Semaphore(self.send_concurrency)
+
+        # Each email runs as <parent>.<position>, so its log lines can be told apart
+        parent = tracing.get_request_id() or tracing.new_request_id()
+
+        async def run(position: int, email: Dict[str, Any]) -> Dict[str, Any]:
+            with tracing.request_scope(f"{parent}.{position}"):
+                result = await self._process_email(email, use_cache, generation_slots, send_slots)
+            if on_result:
+                await on_result(position, result)
+            return result
+
+        tasks = [run(position, email) for position, email in enumerate(emails)]
+        if use_cache:
+            # One cache read for the whole batch up front and one write at the end
+            async with self.response_generator.cache_scope(emails):
+                results = await asyncio.gather(*tasks)
+        else:
+            results = await asyncio.gather(*tasks)
+
+        failed = sum(1 for r in results if r['status'] == 'failed')
+        logger.info(f"Processed batch of {len(results)} emails ({failed} failed)")
+        return results
+
+    async def _process_email(
+        self,
+        email: Dict[str, Any],
+        use_cache: bool,
+        generation_slots: asyncio.Semaphore,
+        send_slots: asyncio.Semaphore
+    ) -> Dict[str, Any]:
+        """Run a single email through both pipeline stages"""
+        result = {
+            'id': None,
+            'status': 'failed',
+            'generated_response': '',
+            'policies_used': [],
+            'error': None,
+            'cache': None,
+            'source': None,
+            'usage': None,
+            'timestamp': None
+        }
+
+        # Stage 1: retrieval + generation
+        try:
+            async with generation_slots:
+                response_data = await self.response_generator.generate_response(
+                    subject=email['subject'],
+                    body=email['body'],
+                    priority=email.get('priority') or 'normal',
+                    use_cache=use_cache
+                )
+            result['generated_response'] = response_data['response']
+            result['policies_used'] = response_data['policies_used']
+            result['cache'] = response_data.get('cache')
+            result['source'] = response_data.get('source')
+            result['usage'] = response_data.get('usage')
+        except Exception as e:
+            logger.error(f"Error generating response for {email['to']}: {str(e)}")
+            result['error'] = f"generation failed: {str(e)}"
+            result['timestamp'] = datetime.now()
+            return result
+
+        # Stage 2: send
+        try:
+            async with send_slots:
+                result['id'] = await self.gmail_service.send_email(
+                    to=email['to'],
+                    subject=email['subject'],
+                    body=response_data['response']
+                )
+            result['status'] = 'sent'
+        except Exception as e:
+            logger.error(f"Error sending email to {email['to']}: {str(e)}")
+            result['error'] = f"send failed: {str(e)}"
+
+        result['timestamp'] = datetime.now()
+        return result
@@ -0,0 +1,48 @@
+import json
+import zlib
+from typing import Any, Optional
+
+try:
+    import msgpack
+except ImportError:  # optional: values are stored as JSON instead
+    msgpack = None
+
+# First byte of every encoded value: the serialization format, plus a flag
+# bit when the payload is zlib-compressed
+MSGPACK = 0x01
+JSON = 0x02
+COMPRESSED = 0x80
+
+def codec_name() -> str:
+    return "msgpack" if msgpack is not None else "json"
+
+def encode(value: Any, compress_threshold: Optional[int] = None) -> bytes:
+    """Serialize a JSON-compatible value, compressing payloads above the threshold"""
+    if msgpack is not None:
+        fmt, payload = MSGPACK, msgpack.packb(value, use_bin_type=True)
+    else:
+        fmt, payload = JSON, json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+    if compress_threshold and len(payload) > compress_threshold:
+        compressed = zlib.compress(payload)
+        # Already-dense payloads can grow; keep whichever is smaller
+        if len(compressed) < len(payload):
+            fmt, payload = fmt | COMPRESSED, compressed
+    return bytes([fmt]) + payload
+
+def decode(raw: bytes) -> Any:
+    """Inverse of encode"""
+    fmt, payload = raw[0], raw[1:]
+    if fmt & COMPRESSED:
+        payload = zlib.decompress(payload)
+        fmt &= ~COMPRESSED
+    if fmt == MSGPACK:
+        if msgpack is None:
+            raise ValueError("Value was encoded with msgpack, which is not installed")
+        return msgpack.unpackb(payload, raw=False)
+    if fmt == JSON:
+        return json.loads(payload)
+    raise ValueError(f"Unknown cache encoding: {fmt:#x}")
+
+def is_compressed(raw: bytes) -> bool:
+    return bool(raw and raw[0] & COMPRESSED)
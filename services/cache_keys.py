@@ -0,0 +1,63 @@
+import hashlib
+import re
+from typing import Optional
+
+# Bump to invalidate every response key when the key scheme changes
+KEY_VERSION = "v1"
+
+SUBJECT_PREFIX = re.compile(r"^\s*((re|fw|fwd|aw|sv)\s*(\[\d+\])?\s*:\s*)+", re.IGNORECASE)
+# Lines that start the quoted previous message in a reply
+QUOTE_HEADERS = [
+    re.compile(r"^on\b.+\bwrote:$", re.IGNORECASE),
+    re.compile(r"^-{2,}\s*original message\s*-{2,}$", re.IGNORECASE),
+    re.compile(r"^_{5,}$"),
+    re.compile(r"^from:\s.+", re.IGNORECASE),
+]
+# Lines that start a signature block
+SIGNATURE_MARKERS = [
+    re.compile(r"^--\s*$"),
+    re.compile(r"^sent from my\b", re.IGNORECASE),
+    re.compile(r"^get outlook for\b", re.IGNORECASE),
+]
+WHITESPACE = re.compile(r"\s+")
+
+def normalize_subject(subject: str) -> str:
+    """Drop reply/forward prefixes, lowercase and collapse whitespace"""
+    subject = SUBJECT_PREFIX.sub("", subject or "")
+    return WHITESPACE.sub(" ", subject).strip().lower()
+
+def normalize_body(body: str) -> str:
+    """Keep only the new text of an email: no quoted reply, no signature, no case or spacing noise"""
+    kept = []
+    for line in (body or "").splitlines():
+        stripped = line.strip()
+        if stripped.startswith(">"):
+            continue
+        if any(p.match(stripped) for p in QUOTE_HEADERS + SIGNATURE_MARKERS):
+            break
+        kept.append(stripped)
+    return WHITESPACE.sub(" ", " ".join(kept)).strip().lower()
+
+def response_cache_key(
+    subject: str,
+    body: str,
+    priority: str,
+    model: str,
+    corpus_version: Optional[str]
+) -> str:
+    """Deterministic response cache key, identical across processes and restarts.
+
+    Python's built-in hash() is salted per process, so it cannot be used for
+    keys shared through Redis. The policy corpus version is part of the key
+    so cached replies stop matching as soon as policies change.
+    """
+    parts = [
+        KEY_VERSION,
+        normalize_subject(subject),
+        normalize_body(body),
+        (priority or "normal").lower(),
+        model,
+        corpus_version or "",
+    ]
+    digest = hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+    return f"response:{digest}"
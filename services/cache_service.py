@@ -1,89 +1,338 @@
 import asyncio
-import json
-from typing import Any, Optional, Dict
+import contextvars
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, Optional, Dict, List, Iterable
 import aioredis
 from datetime import datetime, timedelta
 import logging
 
+from services import cache_codec, tracing
+from services.memory_cache import MemoryCache, MISSING
 from config.settings import settings
 
 logger = logging.getLogger(__name__)
 
+# Deletes a lock only if it still holds our token, so an expired lock that
+# another worker has since taken is never released by mistake
+RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+# Keys deleted per UNLINK while scanning for invalidation
+SCAN_BATCH_SIZE = 500
+
+class _Batch:
+    """Values prefetched for a batch scope, and the writes it defers"""
+
+    def __init__(self, keys: Iterable[str], values: Dict[str, Any]):
+        self.keys = set(keys)
+        self.values = values
+        self.writes: Dict[str, Any] = {}
+        self.ttls: Dict[str, int] = {}
+
+_current_batch: contextvars.ContextVar[Optional[_Batch]] = contextvars.ContextVar(
+    "cache_batch", default=None
+)
+
 class CacheService:
+    """Two-tier cache: a bounded in-process LRU (L1) in front of Redis (L2).
+
+    L1 serves hot keys without a network round trip and keeps caching
+    working when Redis is unreachable. L2 is shared by all workers; an L2
+    hit fills L1 for the key's remaining Redis TTL, capped at L1_CACHE_TTL
+    so entries invalidated elsewhere do not linger in-process for long.
+
+    Every Redis key lives under CACHE_NAMESPACE, so invalidation never
+    touches other applications' data. Values are stored in a compact binary
+    encoding (msgpack when installed, else JSON), zlib-compressed above
+    CACHE_COMPRESS_THRESHOLD bytes.
+    """
+
     def __init__(self):
         self.redis = None
         self.ttl = settings.CACHE_TTL
-    
+        self.namespace = settings.CACHE_NAMESPACE
+        self.compress_threshold = settings.CACHE_COMPRESS_THRESHOLD
+        self.l1 = MemoryCache(
+            max_entries=settings.L1_CACHE_MAX_ENTRIES,
+            max_bytes=settings.L1_CACHE_MAX_BYTES,
+            max_ttl=settings.L1_CACHE_TTL
+        )
+        self.l2_stats = {'hits': 0, 'misses': 0, 'errors': 0, 'round_trips': 0, 'compressed_writes': 0}
+
     async def initialize(self):
         """Initialize Redis connection"""
         try:
             self.redis = await aioredis.from_url(
                 settings.REDIS_URL,
-                decode_responses=True
+                max_connections=settings.REDIS_MAX_CONNECTIONS
             )
+            await self.redis.ping()
             logger.info("Cache service initialized successfully")
         except Exception as e:
             logger.warning(f"Redis not available, using in-memory cache: {str(e)}")
             self.redis = None
-    
+
+    async def close(self):
+        """Close the Redis connection pool"""
+        if self.redis:
+            await self.redis.close()
+            self.redis = None
+
+    def _key(self, key: str) -> str:
+        """Redis key for a cache key"""
+        return f"{self.namespace}:{key}"
+
     async def get(self, key: str) -> Optional[Any]:
         """Get value from cache"""
+        batch = _current_batch.get()
+        if batch is not None and (key in batch.keys or key in batch.values):
+            return batch.values.get(key)
+        return (await self.get_many([key])).get(key)
+
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Look up several keys with at most one Redis round trip; returns the ones found.
+
+        Always reads through to L1/Redis, even inside a batch scope.
+        """
+        found = {}
+        missing = []
+        for key in dict.fromkeys(keys):
+            value = self.l1.get(key)
+            if value is not MISSING:
+                found[key] = value
+            else:
+                missing.append(key)
+        if not missing or not self.redis:
+            return found
+
         try:
-            if self.redis:
-                value = await self.redis.get(key)
-                if value:
-                    return json.loads(value)
-            return None
+            # MGET plus each key's PTTL in one pipeline so L1 can honour the TTLs
+            with tracing.span("redis_read"):
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    pipe.mget([self._key(k) for k in missing])
+                    for key in missing:
+                        pipe.pttl(self._key(key))
+                    raws, *pttls = await pipe.execute()
+            self.l2_stats['round_trips'] += 1
         except Exception as e:
+            self.l2_stats['errors'] += 1
             logger.error(f"Error getting from cache: {str(e)}")
-            return None
-    
+            return found
+
+        for key, raw, pttl in zip(missing, raws, pttls):
+            if not raw:
+                self.l2_stats['misses'] += 1
+                continue
+            try:
+                value = cache_codec.decode(raw)
+            except Exception as e:
+                self.l2_stats['errors'] += 1
+                logger.error(f"Error decoding cached value: {str(e)}")
+                continue
+            self.l2_stats['hits'] += 1
+            ttl = pttl / 1000 if pttl and pttl > 0 else None
+            self.l1.set(key, value, ttl=ttl, size=len(raw))
+            found[key] = value
+        return found
+
     async def set(self, key: str, value: Any, ttl: Optional[int] = None) -> bool:
         """Set value in cache"""
+        return await self.set_many({key: value}, ttl=ttl)
+
+    async def set_many(self, items: Dict[str, Any], ttl: Optional[int] = None) -> bool:
+        """Store several values with one pipelined Redis round trip"""
+        ttl = ttl or self.ttl
+        batch = _current_batch.get()
+        if batch is not None:
+            # Written when the batch scope ends
+            for key, value in items.items():
+                batch.values[key] = value
+                batch.writes[key] = value
+                batch.ttls[key] = ttl
+            return True
+        return await self._write(items, {key: ttl for key in items})
+
+    async def _write(
+        self,
+        items: Dict[str, Any],
+        ttls: Dict[str, int],
+        lock_releases: Optional[List[tuple]] = None
+    ) -> bool:
         try:
-            if self.redis:
-                ttl = ttl or self.ttl
-                await self.redis.setex(key, ttl, json.dumps(value))
-                return True
-            return False
+            encoded = {}
+            for key, value in items.items():
+                raw = cache_codec.encode(value, self.compress_threshold)
+                if cache_codec.is_compressed(raw):
+                    self.l2_stats['compressed_writes'] += 1
+                encoded[key] = raw
+                self.l1.set(key, value, ttl=ttls[key], size=len(raw))
+            if self.redis and (encoded or lock_releases):
+                with tracing.span("redis_write"):
+                    async with self.redis.pipeline(transaction=False) as pipe:
+                        for key, raw in encoded.items():
+                            pipe.setex(self._key(key), ttls[key], raw)
+                        for name, token in lock_releases or []:
+                            pipe.eval(RELEASE_LOCK_SCRIPT, 1, self._key(f"lock:{name}"), token)
+                        await pipe.execute()
+                self.l2_stats['round_trips'] += 1
+            return True
         except Exception as e:
+            self.l2_stats['errors'] += 1
             logger.error(f"Error setting cache: {str(e)}")
             return False
-    
+
+    @asynccontextmanager
+    async def batch(self, keys: Iterable[str]):
+        """Scope in which cache traffic for a known set of keys is batched.
+
+        The keys are fetched up front with one round trip. Inside the scope,
+        ``get`` serves them from that snapshot and ``set`` is deferred; the
+        writes go out in one pipeline when the scope exits. Locks are still
+        released as soon as their holder finishes (see ``release_lock``).
+        The scope follows the task context, so work started with
+        asyncio.gather inside it shares the batch.
+        """
+        keys = list(keys)
+        values = await self.get_many(keys)
+        batch = _Batch(keys, values)
+        reset = _current_batch.set(batch)
+        try:
+            yield values
+        finally:
+            _current_batch.reset(reset)
+            if batch.writes:
+                await self._write(batch.writes, batch.ttls)
+
     async def delete(self, key: str) -> bool:
         """Delete value from cache"""
         try:
+            self.l1.delete(key)
             if self.redis:
-                await self.redis.delete(key)
-                return True
-            return False
+                await self.redis.delete(self._key(key))
+            return True
         except Exception as e:
             logger.error(f"Error deleting from cache: {str(e)}")
             return False
-    
-    async def clear_cache(self) -> bool:
-        """Clear all cache"""
+
+    async def acquire_lock(self, name: str, ttl: float) -> Optional[str]:
+        """Take a short-lived cross-process lock; returns a token, or None if it is held elsewhere.
+
+        Without Redis (or when Redis fails) every caller gets the lock, since
+        there is no other process to coordinate with through it.
+        """
+        token = uuid.uuid4().hex
+        if not self.redis:
+            return token
         try:
-            if self.redis:
-                await self.redis.flushdb()
-                return True
+            with tracing.span("redis_lock"):
+                acquired = await self.redis.set(
+                    self._key(f"lock:{name}"), token, nx=True, px=int(ttl * 1000)
+                )
+            return token if acquired else None
+        except Exception as e:
+            self.l2_stats['errors'] += 1
+            logger.error(f"Error acquiring lock: {str(e)}")
+            return token
+
+    async def is_locked(self, name: str) -> bool:
+        """Whether another process currently holds a lock"""
+        if not self.redis:
+            return False
+        try:
+            return bool(await self.redis.exists(self._key(f"lock:{name}")))
+        except Exception as e:
+            self.l2_stats['errors'] += 1
+            logger.error(f"Error checking lock: {str(e)}")
             return False
+
+    async def release_lock(self, name: str, token: str):
+        """Release a lock taken with acquire_lock.
+
+        Inside a batch scope, a deferred write of the key named by the lock
+        goes out in the same round trip, so a worker waiting on the lock
+        finds the value as soon as the lock is gone.
+        """
+        if not self.redis:
+            return
+        batch = _current_batch.get()
+        if batch is not None and name in batch.writes:
+            value = batch.writes.pop(name)
+            await self._write({name: value}, {name: batch.ttls.pop(name)}, [(name, token)])
+            return
+        try:
+            await self.redis.eval(RELEASE_LOCK_SCRIPT, 1, self._key(f"lock:{name}"), token)
+        except Exception as e:
+            self.l2_stats['errors'] += 1
+            logger.error(f"Error releasing lock: {str(e)}")
+
+    async def invalidate(self, pattern: str = "*") -> int:
+        """Delete keys in our namespace matching a glob pattern (e.g. ``response:*``).
+
+        Uses SCAN, so Redis keeps serving other clients while large key
+        spaces are walked, and never touches keys outside the namespace.
+        """
+        removed = self.l1.delete_matching(pattern)
+        if not self.redis:
+            return removed
+        removed = 0
+        pending = []
+        async for redis_key in self.redis.scan_iter(match=self._key(pattern), count=SCAN_BATCH_SIZE):
+            pending.append(redis_key)
+            if len(pending) >= SCAN_BATCH_SIZE:
+                removed += await self.redis.unlink(*pending)
+                pending = []
+        if pending:
+            removed += await self.redis.unlink(*pending)
+        return removed
+
+    async def clear_cache(self, pattern: str = "*") -> bool:
+        """Clear this application's cache entries, optionally only those matching a pattern"""
+        try:
+            removed = await self.invalidate(pattern)
+            logger.info(f"Cleared {removed} cache entries matching {pattern}")
+            return True
         except Exception as e:
             logger.error(f"Error clearing cache: {str(e)}")
             return False
-    
+
     async def get_stats(self) -> Dict[str, Any]:
         """Get cache statistics"""
+        l2_lookups = self.l2_stats['hits'] + self.l2_stats['misses']
+        tiers = {
+            'l1': self.l1.get_stats(),
+            'l2': {
+                **self.l2_stats,
+                'hit_ratio': round(self.l2_stats['hits'] / l2_lookups, 4) if l2_lookups else 0.0
+            }
+        }
+        encoding = {
+            'codec': cache_codec.codec_name(),
+            'compress_threshold': self.compress_threshold,
+            'namespace': self.namespace
+        }
         try:
             if self.redis:
                 info = await self.redis.info()
+                pool = self.redis.connection_pool
                 return {
                     'connected_clients': info.get('connected_clients', 0),
                     'used_memory': info.get('used_memory_human', '0B'),
                     'keyspace_hits': info.get('keyspace_hits', 0),
-                    'keyspace_misses': info.get('keyspace_misses', 0)
+                    'keyspace_misses': info.get('keyspace_misses', 0),
+                    'pool': {
+                        'max_connections': pool.max_connections,
+                        'in_use': len(getattr(pool, '_in_use_connections', ())),
+                        'idle': len(getattr(pool, '_available_connections', ()))
+                    },
+                    'encoding': encoding,
+                    'tiers': tiers
                 }
-            return {'status': 'Redis not available'}
+            return {'status': 'Redis not available', 'encoding': encoding, 'tiers': tiers}
         except Exception as e:
             logger.error(f"Error getting cache stats: {str(e)}")
-            return {'error': str(e)}
+            return {'error': str(e), 'encoding': encoding, 'tiers': tiers}
@@ -0,0 +1,93 @@
+import logging
+from typing import Optional
+
+import httpx
+
+from services.gmail_service import GmailService
+from services.policy_service import PolicyService
+from services.response_generator import ResponseGenerator
+from services.template_service import TemplateService
+from services.cache_service import CacheService
+from services.batch_processor import BatchProcessor
+from services.inbox_processor import InboxProcessor
+from services.triage import EmailTriage
+from services.job_queue import JobQueue
+from services.job_worker import JobWorker
+from services.jobs import build_handlers
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+class ServiceContainer:
+    """Owns the single instance of every service and wires them together.
+
+    Consumers receive their dependencies through their constructors, so the
+    whole app shares one warmed policy index, one Redis pool and one pair of
+    pooled HTTP clients for OpenAI. startup() and shutdown() run the
+    lifecycle hooks in dependency order.
+    """
+
+    def __init__(self):
+        limits = httpx.Limits(
+            max_connections=settings.OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.OPENAI_MAX_CONNECTIONS
+        )
+        timeout = httpx.Timeout(settings.OPENAI_TIMEOUT)
+        self.http_client = httpx.Client(limits=limits, timeout=timeout)
+        self.http_async_client = httpx.AsyncClient(limits=limits, timeout=timeout)
+
+        self.cache_service = CacheService()
+        self.policy_service = PolicyService(
+            http_client=self.http_client,
+            http_async_client=self.http_async_client
+        )
+        # Templates share the policy embedding cache and sit next to the policies on disk
+        self.template_service = TemplateService(
+            self.policy_service.embeddings,
+            index_store=self.policy_service.index_store
+        )
+        self.gmail_service = GmailService()
+        self.response_generator = ResponseGenerator(
+            self.policy_service,
+            self.cache_service,
+            self.template_service,
+            http_client=self.http_client,
+            http_async_client=self.http_async_client
+        )
+        self.batch_processor = BatchProcessor(self.response_generator, self.gmail_service)
+        self.triage = EmailTriage(own_addresses=settings.TRIAGE_OWN_ADDRESSES.split(","))
+        self.inbox_processor = InboxProcessor(
+            self.gmail_service, self.response_generator, self.triage
+        )
+        self.job_queue = JobQueue()
+        self.job_worker = JobWorker(
+            self.job_queue, build_handlers(self.batch_processor, self.inbox_processor)
+        )
+
+    async def startup(self, job_workers: Optional[int] = None):
+        """Warm shared state before serving requests.
+
+        ``job_workers`` is how many queued jobs this process runs at once
+        (JOB_WORKERS_IN_API by default).
+        """
+        await self.policy_service.load_policies()
+        # Policies and templates edited through another process (an API worker, worker.py) are picked up here
+        await self.policy_service.start_watching(settings.POLICY_RELOAD_INTERVAL)
+        await self.template_service.load_templates()
+        await self.template_service.start_watching(settings.POLICY_RELOAD_INTERVAL)
+        await self.cache_service.initialize()
+        await self.inbox_processor.start()
+        await self.job_worker.start(
+            settings.JOB_WORKERS_IN_API if job_workers is None else job_workers
+        )
+
+    async def shutdown(self):
+        """Stop background work, then release connections"""
+        await self.job_worker.stop()
+        await self.inbox_processor.stop()
+        await self.policy_service.stop_watching()
+        await self.template_service.stop_watching()
+        await self.gmail_service.shutdown()
+        await self.cache_service.close()
+        await self.http_async_client.aclose()
+        self.http_client.close()
@@ -0,0 +1,29 @@
+import os
+import sqlite3
+from typing import Optional
+import logging
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+def sqlite_path(database_url: Optional[str] = None) -> str:
+    """Resolve a sqlite:/// URL (settings.DATABASE_URL by default) to a file path"""
+    url = database_url or settings.DATABASE_URL
+    prefix = "sqlite:///"
+    if not url.startswith(prefix):
+        raise ValueError(f"Only sqlite:/// database URLs are supported, got: {url}")
+    return url[len(prefix):]
+
+def connect(database_url: Optional[str] = None) -> sqlite3.Connection:
+    """Open a connection tuned for several processes sharing one database file"""
+    path = sqlite_path(database_url)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # isolation_level=None: autocommit, explicit BEGIN where atomicity matters
+    conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
@@ -0,0 +1,159 @@
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+from typing import List, Dict, Any, Optional
+import logging
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from services.memory_cache import MemoryCache, MISSING
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+class EmbeddingCache:
+    """Content-addressed embedding store.
+
+    Vectors are keyed by sha256(model, text). An in-process LRU sits in front
+    of a SQLite table so repeated texts skip both the disk and the API.
+    """
+
+    def __init__(self, path: Optional[str] = None, lru_size: Optional[int] = None):
+        self.path = path or settings.EMBEDDING_CACHE_PATH
+        self.lru_size = lru_size or settings.EMBEDDING_CACHE_LRU_SIZE
+        self._lru = MemoryCache(max_entries=self.lru_size)
+        self._lock = threading.Lock()
+        self.stats = {'lru_hits': 0, 'store_hits': 0, 'misses': 0}
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        """Hash (model, text) into a cache key"""
+        return hashlib.sha256(f"{model}\x00{text}".encode('utf-8')).hexdigest()
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        """Return cached vectors for the keys that are present"""
+        found = {}
+        missing = []
+        with self._lock:
+            for key in keys:
+                vector = self._lru.get(key)
+                if vector is not MISSING:
+                    found[key] = vector
+                    self.stats['lru_hits'] += 1
+                else:
+                    missing.append(key)
+
+            # SQLite caps the number of bound parameters per statement
+            for start in range(0, len(missing), 500):
+                chunk = missing[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    chunk
+                ).fetchall()
+                for key, blob in rows:
+                    vector = np.frombuffer(blob, dtype=np.float32).tolist()
+                    found[key] = vector
+                    self._lru.set(key, vector)
+                    self.stats['store_hits'] += 1
+
+            self.stats['misses'] += len(set(keys) - set(found))
+        return found
+
+    def set_many(self, items: Dict[str, List[float]]):
+        """Store vectors in both tiers"""
+        if not items:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [
+                    (key, np.asarray(vector, dtype=np.float32).tobytes())
+                    for key, vector in items.items()
+                ]
+            )
+            self._conn.commit()
+            for key, vector in items.items():
+                self._lru.set(key, vector)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for the embedding cache"""
+        with self._lock:
+            stored = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            lookups = sum(self.stats.values())
+            hits = self.stats['lru_hits'] + self.stats['store_hits']
+            return {
+                **self.stats,
+                'hit_ratio': round(hits / lookups, 4) if lookups else 0.0,
+                'lru_entries': len(self._lru),
+                'lru_evictions': self._lru.evictions,
+                'stored_entries': stored
+            }
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that only sends cache misses to the underlying model"""
+
+    def __init__(self, underlying: Embeddings, model: str, cache: Optional[EmbeddingCache] = None):
+        self.underlying = underlying
+        self.model = model
+        self.cache = cache or EmbeddingCache()
+
+    def _partition(self, texts: List[str]):
+        keys = [EmbeddingCache.make_key(self.model, text) for text in texts]
+        found = self.cache.get_many(keys)
+        # De-duplicate misses so identical texts in one call are embedded once
+        missing = list(dict.fromkeys(
+            text for key, text in zip(keys, texts) if key not in found
+        ))
+        return keys, found, missing
+
+    def _merge(self, keys, found, missing, vectors) -> List[List[float]]:
+        computed = {
+            EmbeddingCache.make_key(self.model, text): vector
+            for text, vector in zip(missing, vectors)
+        }
+        self.cache.set_many(computed)
+        found.update(computed)
+        return [found[key] for key in keys]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, found, missing = self._partition(texts)
+        vectors = self.underlying.embed_documents(missing) if missing else []
+        return self._merge(keys, found, missing, vectors)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        # The store is SQLite, so keep its reads and writes off the event loop
+        keys, found, missing = await asyncio.to_thread(self._partition, texts)
+        if not missing:
+            return [found[key] for key in keys]
+        vectors = await self.underlying.aembed_documents(missing)
+        return await asyncio.to_thread(self._merge, keys, found, missing, vectors)
+
+    def embed_query(self, text: str) -> List[float]:
+        keys, found, missing = self._partition([text])
+        vectors = [self.underlying.embed_query(text)] if missing else []
+        return self._merge(keys, found, missing, vectors)[0]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        keys, found, missing = await asyncio.to_thread(self._partition, [text])
+        if not missing:
+            return found[keys[0]]
+        vectors = [await self.underlying.aembed_query(text)]
+        return (await asyncio.to_thread(self._merge, keys, found, missing, vectors))[0]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {'model': self.model, **self.cache.get_stats()}
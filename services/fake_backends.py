@@ -0,0 +1,206 @@
+"""Offline stand-ins for the OpenAI models, for benchmarks and local development.
+
+Selected with LLM_BACKEND=fake and EMBEDDING_BACKEND=fake. Both are
+deterministic, sleep for a configurable latency to mimic a network round
+trip, and can fail a fraction of calls with the same server error the
+OpenAI client raises, so retry paths get exercised too.
+"""
+import asyncio
+import hashlib
+import random
+import re
+import time
+from functools import lru_cache
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+import httpx
+import numpy as np
+import openai
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Filler for generated replies; any deterministic word list would do
+REPLY_WORDS = (
+    "we", "have", "reviewed", "your", "request", "and", "according", "to", "our",
+    "policy", "the", "team", "will", "follow", "up", "within", "two", "business",
+    "days", "please", "reply", "if", "you", "need", "anything", "else", "regarding",
+    "order", "account", "refund", "shipping", "support"
+)
+
+def _server_error(what: str) -> openai.InternalServerError:
+    """The error the OpenAI client raises on a 5xx, so callers' retry handling applies"""
+    request = httpx.Request("POST", f"https://fake-backend.invalid/{what}")
+    return openai.InternalServerError(
+        f"Injected {what} failure",
+        response=httpx.Response(503, request=request),
+        body=None
+    )
+
+@lru_cache(maxsize=65536)
+def _token_slot(token: str, dimensions: int) -> tuple:
+    digest = int.from_bytes(hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest(), 'big')
+    return digest % dimensions, 1.0 if (digest >> 32) & 1 else -1.0
+
+class FakeEmbeddings(Embeddings):
+    """Feature-hashing embedder: each word adds +-1 to one dimension, then the vector is normalized.
+
+    Texts that share words come out similar, so retrieval, the semantic
+    cache and template matching behave sensibly, and the same text always
+    gets the same vector.
+    """
+
+    def __init__(
+        self,
+        dimensions: int = 1536,
+        latency_ms: float = 0.0,
+        error_rate: float = 0.0
+    ):
+        self.dimensions = dimensions
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.stats = {'requests': 0, 'texts': 0, 'errors': 0}
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        tokens = TOKEN_PATTERN.findall(text.lower()) or [text]
+        for token in tokens:
+            slot, sign = _token_slot(token, self.dimensions)
+            vector[slot] += sign
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector /= norm
+        return vector.tolist()
+
+    def _begin(self, count: int):
+        self.stats['requests'] += 1
+        if self.error_rate and random.random() < self.error_rate:
+            self.stats['errors'] += 1
+            raise _server_error("embeddings")
+        self.stats['texts'] += count
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.latency_ms / 1000)
+        self._begin(len(texts))
+        return [self._embed(text) for text in texts]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        await asyncio.sleep(self.latency_ms / 1000)
+        self._begin(len(texts))
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+class FakeChatModel(BaseChatModel):
+    """Chat model that answers with canned text after a simulated delay.
+
+    The delay is ``latency_ms`` before the first token plus
+    ``token_latency_ms`` per generated token, and streaming spreads it the
+    same way. Token usage is estimated at four characters per token.
+    """
+
+    latency_ms: float = 0.0
+    token_latency_ms: float = 0.0
+    reply_tokens: int = 80
+    error_rate: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _reply_tokens(self, messages: List[BaseMessage]) -> List[str]:
+        prompt = "".join(str(message.content) for message in messages)
+        seed = int(hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:8], 16)
+        words = [REPLY_WORDS[(seed + i * 7) % len(REPLY_WORDS)] for i in range(self.reply_tokens)]
+        return ["Dear Customer,\n\nThank you for contacting us."] + \
+            [f" {word}" for word in words] + ["\n\nBest regards,\nCustomer Support"]
+
+    @staticmethod
+    def _usage(messages: List[BaseMessage], output_tokens: int) -> Dict[str, Any]:
+        input_tokens = sum(len(str(message.content)) for message in messages) // 4
+        return {
+            'input_tokens': input_tokens,
+            'output_tokens': output_tokens,
+            'total_tokens': input_tokens + output_tokens,
+            'input_token_details': {'cache_read': 0}
+        }
+
+    def _check_error(self):
+        if self.error_rate and random.random() < self.error_rate:
+            raise _server_error("chat")
+
+    def _total_delay(self, tokens: int) -> float:
+        return (self.latency_ms + self.token_latency_ms * tokens) / 1000
+
+    def _result(self, messages: List[BaseMessage], tokens: List[str]) -> ChatResult:
+        message = AIMessage(
+            content="".join(tokens),
+            usage_metadata=self._usage(messages, len(tokens))
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager=None,
+        **kwargs: Any
+    ) -> ChatResult:
+        tokens = self._reply_tokens(messages)
+        time.sleep(self._total_delay(len(tokens)))
+        self._check_error()
+        return self._result(messages, tokens)
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager=None,
+        **kwargs: Any
+    ) -> ChatResult:
+        tokens = self._reply_tokens(messages)
+        await asyncio.sleep(self._total_delay(len(tokens)))
+        self._check_error()
+        return self._result(messages, tokens)
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager=None,
+        **kwargs: Any
+    ) -> Iterator[ChatGenerationChunk]:
+        tokens = self._reply_tokens(messages)
+        time.sleep(self.latency_ms / 1000)
+        self._check_error()
+        for token in tokens:
+            time.sleep(self.token_latency_ms / 1000)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+        yield ChatGenerationChunk(message=AIMessageChunk(
+            content="", usage_metadata=self._usage(messages, len(tokens))
+        ))
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager=None,
+        **kwargs: Any
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        tokens = self._reply_tokens(messages)
+        await asyncio.sleep(self.latency_ms / 1000)
+        self._check_error()
+        for token in tokens:
+            await asyncio.sleep(self.token_latency_ms / 1000)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+        # Usage arrives on a final empty chunk, as with OpenAI's stream_options
+        yield ChatGenerationChunk(message=AIMessageChunk(
+            content="", usage_metadata=self._usage(messages, len(tokens))
+        ))
@@ -1,37 +1,80 @@
 import asyncio
 import base64
+import html
 import json
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+import httplib2
+from google.auth.credentials import AnonymousCredentials
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
-from typing import List, Dict, Any
+from googleapiclient.http import BatchHttpRequest
+from typing import List, Dict, Any, Callable, Optional
 import logging
 
+from services import tracing
+from services.sync_ledger import SyncLedger
 from config.settings import settings
 
 logger = logging.getLogger(__name__)
 
+# Headers requested with format=metadata; full payloads are only fetched for mail we answer
+METADATA_HEADERS = [
+    'Subject', 'From', 'To', 'Date', 'Message-ID', 'In-Reply-To', 'References',
+    # Used by triage to recognise automated, bulk and bounced mail
+    'Auto-Submitted', 'Precedence', 'List-Unsubscribe', 'List-Id', 'Return-Path',
+    'Content-Type', 'X-Autoreply', 'X-Autorespond', 'X-Auto-Response-Suppress'
+]
+
+# Gmail's list endpoint returns at most this many IDs per page
+LIST_PAGE_SIZE = 500
+
 class GmailService:
     def __init__(self):
-        self.service = None
         self.creds = None
+        # googleapiclient (httplib2) is not thread-safe, so every pool thread
+        # gets its own client and its own keep-alive connection
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.GMAIL_MAX_WORKERS,
+            thread_name_prefix="gmail"
+        )
+        self._local = threading.local()
+        self._init_lock = asyncio.Lock()
+        # new_batch_http_request() ignores api_endpoint, so build the URI ourselves
+        self._batch_uri = (settings.GMAIL_API_ENDPOINT or "https://gmail.googleapis.com/") + "batch/gmail/v1"
+        self.ledger = SyncLedger()
+        self.email_address: Optional[str] = None
+        # Body requests waiting for the next batch, by message ID
+        self._body_waiters: Dict[str, List[asyncio.Future]] = {}
+        self._body_flush: Optional[asyncio.Task] = None
     
     async def initialize(self):
         """Initialize Gmail API service"""
         try:
-            self.creds = await self._get_credentials()
-            self.service = build('gmail', 'v1', credentials=self.creds)
+            loop = asyncio.get_running_loop()
+            self.creds = await loop.run_in_executor(self._executor, self._get_credentials)
             logger.info("Gmail service initialized successfully")
         except Exception as e:
             logger.error(f"Failed to initialize Gmail service: {str(e)}")
             raise
     
-    async def _get_credentials(self):
+    async def shutdown(self):
+        """Release the worker threads and their connections"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+    
+    def _get_credentials(self):
         """Get Gmail API credentials"""
+        # A custom endpoint points at a local fake server that needs no auth
+        if settings.GMAIL_API_ENDPOINT:
+            return AnonymousCredentials()
+        
         creds = None
         
         # Load existing token
@@ -60,12 +103,63 @@ class GmailService:
         
         return creds
     
-    async def send_email(self, to: str, subject: str, body: str) -> str:
+    def _client(self):
+        """Return this worker thread's Gmail client, building it on first use"""
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            http = AuthorizedHttp(
+                self.creds,
+                http=httplib2.Http(timeout=settings.GMAIL_HTTP_TIMEOUT)
+            )
+            client_options = None
+            if settings.GMAIL_API_ENDPOINT:
+                client_options = {'api_endpoint': settings.GMAIL_API_ENDPOINT}
+            client = build(
+                'gmail', 'v1',
+                http=http,
+                client_options=client_options,
+                cache_discovery=False
+            )
+            self._local.client = client
+        return client
+    
+    async def _run(self, stage: str, fn: Callable[[Any], Any]) -> Any:
+        """Run fn(client) on a pool thread using that thread's Gmail client, timed as ``stage``"""
+        if self.creds is None:
+            async with self._init_lock:
+                if self.creds is None:
+                    await self.initialize()
+        
+        loop = asyncio.get_running_loop()
+        with tracing.span(stage):
+            return await loop.run_in_executor(self._executor, lambda: fn(self._client()))
+    
+    async def _execute(self, stage: str, make_request: Callable[[Any], Any]) -> Any:
+        """Build a request with this thread's client and execute it off the event loop"""
+        return await self._run(stage, lambda service: make_request(service).execute())
+    
+    async def send_email(
+        self,
+        to: str,
+        subject: str,
+        body: str,
+        thread_id: Optional[str] = None,
+        in_reply_to: Optional[str] = None,
+        auto_submitted: Optional[str] = None
+    ) -> str:
         """Send an email via Gmail API"""
         try:
             message = MIMEMultipart()
             message['to'] = to
             message['subject'] = subject
+            if auto_submitted:
+                # RFC 3834: tells other responders (and our own triage) not to reply
+                message['Auto-Submitted'] = auto_submitted
+                message['X-Auto-Response-Suppress'] = 'All'
+            if in_reply_to:
+                # Keep replies threaded in the customer's mail client
+                message['In-Reply-To'] = in_reply_to
+                message['References'] = in_reply_to
             
             message.attach(MIMEText(body, 'plain'))
             
@@ -73,10 +167,17 @@ class GmailService:
                 message.as_bytes()
             ).decode()
             
-            send_message = self.service.users().messages().send(
-                userId="me",
-                body={'raw': raw_message}
-            ).execute()
+            send_body = {'raw': raw_message}
+            if thread_id:
+                send_body['threadId'] = thread_id
+            
+            send_message = await self._execute(
+                "gmail_send",
+                lambda service: service.users().messages().send(
+                    userId="me",
+                    body=send_body
+                )
+            )
             
             logger.info(f"Email sent successfully: {send_message['id']}")
             return send_message['id']
@@ -91,34 +192,9 @@ class GmailService:
     async def get_inbox_emails(self, max_results: int = 10) -> List[Dict[str, Any]]:
         """Get emails from inbox"""
         try:
-            results = self.service.users().messages().list(
-                userId="me",
-                labelIds=['INBOX'],
-                maxResults=max_results
-            ).execute()
-            
-            messages = results.get('messages', [])
-            emails = []
-            
-            for message in messages:
-                msg = self.service.users().messages().get(
-                    userId="me", 
-                    id=message['id']
-                ).execute()
-                
-                headers = msg['payload'].get('headers', [])
-                subject = next((h['value'] for h in headers if h['name'] == 'Subject'), '')
-                sender = next((h['value'] for h in headers if h['name'] == 'From'), '')
-                
-                emails.append({
-                    'id': message['id'],
-                    'subject': subject,
-                    'sender': sender,
-                    'snippet': msg.get('snippet', ''),
-                    'timestamp': msg['internalDate']
-                })
-            
-            return emails
+            message_ids = await self._list_message_ids(['INBOX'], max_results)
+            messages = await self._get_messages(message_ids)
+            return [self._parse_message(msg) for msg in messages]
             
         except HttpError as e:
             logger.error(f"Gmail API error: {str(e)}")
@@ -127,31 +203,239 @@ class GmailService:
             logger.error(f"Error retrieving emails: {str(e)}")
             raise
     
-    async def process_inbox_emails(self):
-        """Process inbox emails and generate auto-responses"""
+    async def _list_message_ids(self, label_ids: List[str], max_results: int) -> List[str]:
+        """List message IDs, following nextPageToken until max_results is reached"""
+        message_ids = []
+        page_token = None
+        while len(message_ids) < max_results:
+            results = await self._execute(
+                "gmail_list",
+                lambda service, token=page_token: service.users().messages().list(
+                    userId="me",
+                    labelIds=label_ids,
+                    maxResults=min(LIST_PAGE_SIZE, max_results - len(message_ids)),
+                    pageToken=token
+                )
+            )
+            message_ids.extend(m['id'] for m in results.get('messages', []))
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                break
+        return message_ids[:max_results]
+    
+    async def _get_messages(self, message_ids: List[str], format: str = 'metadata') -> List[Dict[str, Any]]:
+        """Fetch messages (metadata by default) through the batch endpoint, preserving order"""
+        size = settings.GMAIL_BATCH_SIZE
+        chunks = [message_ids[i:i + size] for i in range(0, len(message_ids), size)]
+        
+        # Chunks run in parallel, bounded by the Gmail thread pool
+        results = await asyncio.gather(*[
+            self._run("gmail_get", lambda service, chunk=chunk: self._fetch_batch(service, chunk, format))
+            for chunk in chunks
+        ])
+        fetched = {}
+        failed = {}
+        for found, errors in results:
+            fetched.update(found)
+            failed.update(errors)
+        
+        # Per-message failures (usually rate limiting) get one more batched attempt
+        if failed:
+            retry_ids = list(failed)
+            logger.warning(f"Retrying {len(retry_ids)} messages that failed in batch")
+            found, errors = await self._run(
+                "gmail_get", lambda service: self._fetch_batch(service, retry_ids, format)
+            )
+            fetched.update(found)
+            for message_id, error in errors.items():
+                logger.error(f"Failed to fetch message {message_id}: {str(error)}")
+        
+        return [fetched[mid] for mid in message_ids if mid in fetched]
+    
+    def _fetch_batch(self, service, message_ids: List[str], format: str = 'metadata'):
+        """Execute one batch of messages.get calls on the calling pool thread"""
+        found = {}
+        errors = {}
+        
+        def callback(request_id, response, exception):
+            if exception is not None:
+                errors[request_id] = exception
+            else:
+                found[request_id] = response
+        
+        batch = BatchHttpRequest(callback=callback, batch_uri=self._batch_uri)
+        options = {'metadataHeaders': METADATA_HEADERS} if format == 'metadata' else {}
+        for message_id in message_ids:
+            batch.add(
+                service.users().messages().get(
+                    userId="me",
+                    id=message_id,
+                    format=format,
+                    **options
+                ),
+                request_id=message_id
+            )
+        batch.execute()
+        return found, errors
+    
+    @staticmethod
+    def _parse_message(msg: Dict[str, Any]) -> Dict[str, Any]:
+        """Flatten a metadata-format message into the email dict used by the app"""
+        headers = {
+            h['name'].lower(): h['value']
+            for h in msg.get('payload', {}).get('headers', [])
+        }
+        return {
+            'id': msg['id'],
+            'thread_id': msg.get('threadId'),
+            'subject': headers.get('subject', ''),
+            'sender': headers.get('from', ''),
+            'snippet': msg.get('snippet', ''),
+            'timestamp': msg['internalDate'],
+            'headers': headers
+        }
+    
+    async def get_message_body(self, message_id: str) -> Optional[str]:
+        """Plain-text body of a message, or None if it could not be fetched.
+
+        Sync only downloads metadata, so bodies are fetched once a message is
+        going to be answered. Requests made within GMAIL_BODY_BATCH_WINDOW_MS
+        of each other (inbox workers picking up one poll's messages) share
+        batch requests, like the metadata fetch.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._body_waiters.setdefault(message_id, []).append(future)
+        if self._body_flush is None:
+            self._body_flush = asyncio.create_task(self._flush_body_requests())
+        return await future
+    
+    async def _flush_body_requests(self):
+        """Fetch every body requested during the batch window in one go"""
+        try:
+            await asyncio.sleep(settings.GMAIL_BODY_BATCH_WINDOW_MS / 1000)
+        finally:
+            # Requests arriving while this batch is in flight start the next window
+            waiters, self._body_waiters = self._body_waiters, {}
+            self._body_flush = None
         try:
-            emails = await self.get_inbox_emails()
+            messages = await self._get_messages(list(waiters), format='full')
+            bodies = {msg['id']: self._extract_text(msg.get('payload', {})) for msg in messages}
+            for message_id, futures in waiters.items():
+                for future in futures:
+                    if not future.done():
+                        future.set_result(bodies.get(message_id))
+        except Exception as e:
+            logger.error(f"Error fetching message bodies: {str(e)}")
+            for futures in waiters.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+        finally:
+            # Cancelled mid-fetch (shutdown): do not leave callers waiting
+            for futures in waiters.values():
+                for future in futures:
+                    future.cancel()
+    
+    @staticmethod
+    def _extract_text(payload: Dict[str, Any]) -> str:
+        """Text of a full-format payload: its text/plain parts, else text/html stripped of tags"""
+        plain = []
+        markup = []
+        parts = [payload]
+        while parts:
+            part = parts.pop(0)
+            parts.extend(part.get('parts', []))
+            data = part.get('body', {}).get('data')
+            # Attachments carry a filename; their text is not part of the inquiry
+            if not data or part.get('filename'):
+                continue
+            text = base64.urlsafe_b64decode(data + '=' * (-len(data) % 4)).decode('utf-8', errors='replace')
+            if part.get('mimeType') == 'text/plain':
+                plain.append(text)
+            elif part.get('mimeType') == 'text/html':
+                markup.append(text)
+        if plain:
+            return "\n".join(plain).strip()
+        text = re.sub(r'(?is)<(script|style).*?</\1>|<[^>]+>', ' ', "\n".join(markup))
+        return re.sub(r'[ \t]+', ' ', html.unescape(text)).strip()
+    
+    async def sync_inbox(self, incremental: bool = True) -> List[Dict[str, Any]]:
+        """Discover new inbox mail and return the messages still waiting for processing.
+
+        Incremental mode asks users.history.list for messages added since the
+        stored historyId, so a poll costs O(new mail). Without a stored
+        historyId (first run) or when it has expired, it falls back to listing
+        the newest GMAIL_SYNC_MAX_RESULTS inbox messages.
+        """
+        try:
+            history_id = await asyncio.to_thread(self.ledger.get_history_id)
+            
+            new_ids = None
+            latest_history_id = None
+            if incremental and history_id:
+                try:
+                    new_ids, latest_history_id = await self._list_history(history_id)
+                except HttpError as e:
+                    # 404 means the historyId is too old to replay
+                    if e.resp.status != 404:
+                        raise
+                    logger.warning("Stored historyId expired, falling back to full sync")
             
-            for email in emails:
-                # Check if email needs auto-response
-                if await self._should_auto_respond(email):
-                    # Generate and send response
-                    await self._generate_auto_response(email)
-                    
-                await asyncio.sleep(settings.PROCESSING_DELAY)
-                
+            if new_ids is None:
+                # Take the profile historyId first so mail arriving mid-listing is not lost
+                profile = await self._execute(
+                    "gmail_profile", lambda service: service.users().getProfile(userId="me")
+                )
+                latest_history_id = profile['historyId']
+                new_ids = await self._list_message_ids(['INBOX'], settings.GMAIL_SYNC_MAX_RESULTS)
+            
+            added = await asyncio.to_thread(self.ledger.add_pending, new_ids)
+            await asyncio.to_thread(self.ledger.set_history_id, latest_history_id)
+            
+            pending_ids = await asyncio.to_thread(
+                self.ledger.pending, settings.GMAIL_SYNC_MAX_RESULTS
+            )
+            messages = await self._get_messages(pending_ids)
+            logger.info(f"Inbox sync: {added} new, {len(messages)} pending")
+            return [self._parse_message(msg) for msg in messages]
+            
+        except HttpError as e:
+            logger.error(f"Gmail API error: {str(e)}")
+            raise
         except Exception as e:
-            logger.error(f"Error processing inbox emails: {str(e)}")
+            logger.error(f"Error syncing inbox: {str(e)}")
             raise
     
-    async def _should_auto_respond(self, email: Dict[str, Any]) -> bool:
-        """Determine if email should get auto-response"""
-        # Add logic to determine if email needs auto-response
-        # For now, return True for demonstration
-        return True
-    
-    async def _generate_auto_response(self, email: Dict[str, Any]):
-        """Generate and send auto-response for email"""
-        # This would integrate with the response generator
-        # For now, just log the action
-        logger.info(f"Auto-responding to email: {email['id']}")
+    async def _list_history(self, start_history_id: str):
+        """Return (message IDs added to INBOX since start_history_id, latest historyId)"""
+        message_ids = []
+        page_token = None
+        latest_history_id = start_history_id
+        while True:
+            results = await self._execute(
+                "gmail_history",
+                lambda service, token=page_token: service.users().history().list(
+                    userId="me",
+                    startHistoryId=start_history_id,
+                    historyTypes=['messageAdded'],
+                    labelId='INBOX',
+                    pageToken=token
+                )
+            )
+            for record in results.get('history', []):
+                for added in record.get('messagesAdded', []):
+                    message_ids.append(added['message']['id'])
+            latest_history_id = results.get('historyId', latest_history_id)
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                break
+        return list(dict.fromkeys(message_ids)), latest_history_id
+    
+    async def get_email_address(self) -> str:
+        """Address of the authenticated account, fetched once"""
+        if self.email_address is None:
+            profile = await self._execute(
+                "gmail_profile", lambda service: service.users().getProfile(userId="me")
+            )
+            self.email_address = profile['emailAddress']
+        return self.email_address
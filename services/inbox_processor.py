@@ -0,0 +1,239 @@
+import asyncio
+import time
+from typing import List, Dict, Any, Optional, Set, Tuple
+import logging
+
+from services import tracing
+from services.rate_limiter import TokenBucket
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+class InboxProcessor:
+    """Producer/consumer pipeline for auto-responding to inbox mail.
+
+    The producer syncs the inbox and feeds a bounded queue; INBOX_WORKERS
+    consumers run triage, retrieval + generation and send. A full
+    queue blocks the producer (backpressure) instead of growing without
+    bound, and token buckets keep OpenAI and Gmail calls within quota.
+    Each queued message carries a future that resolves to its outcome, so a
+    caller can wait for the messages its own poll queued.
+    """
+
+    def __init__(self, gmail_service, response_generator, triage):
+        self.gmail_service = gmail_service
+        self.response_generator = response_generator
+        self.triage = triage
+        self.num_workers = settings.INBOX_WORKERS
+        self.queue_size = settings.INBOX_QUEUE_SIZE
+        self.poll_interval = settings.INBOX_POLL_INTERVAL
+        self.llm_limiter = TokenBucket(
+            rate=settings.OPENAI_REQUESTS_PER_MINUTE / 60,
+            capacity=settings.OPENAI_BURST
+        )
+        self.gmail_send_limiter = TokenBucket(
+            rate=settings.GMAIL_SEND_RATE_PER_SECOND,
+            capacity=settings.GMAIL_SEND_BURST
+        )
+        # Items are (email, future resolved with the message's outcome)
+        self.queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._poll_lock = asyncio.Lock()
+        # Message IDs queued or being worked on in this process
+        self._inflight: Set[str] = set()
+        self._busy_workers = 0
+        self.stats = {
+            'polls': 0,
+            'enqueued': 0,
+            'replied': 0,
+            'skipped': 0,
+            'failed': 0,
+            'producer_blocked': 0,
+            'producer_blocked_seconds': 0.0,
+            'last_poll_at': None
+        }
+
+    async def start(self):
+        """Start the worker pool and, if configured, the periodic poller"""
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self._tasks = [
+            asyncio.create_task(self._worker(i), name=f"inbox-worker-{i}")
+            for i in range(self.num_workers)
+        ]
+        if self.poll_interval > 0:
+            self._tasks.append(asyncio.create_task(self._poll_loop(), name="inbox-poller"))
+        logger.info(f"Inbox processor started with {self.num_workers} workers")
+
+    async def stop(self):
+        """Cancel workers; messages they were handling go back to pending"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def poll(self, incremental: bool = True) -> List[str]:
+        """Sync the inbox and enqueue pending messages; returns the IDs it enqueued"""
+        return list(await self._enqueue_pending(incremental))
+
+    async def poll_and_wait(self, incremental: bool = True) -> Dict[str, int]:
+        """Poll, then wait for just the messages this poll enqueued.
+
+        Messages queued by other polls are neither waited for nor counted.
+        Returns how many were enqueued and how many ended in each outcome.
+        """
+        outcomes = await self._enqueue_pending(incremental)
+        counts = {'enqueued': len(outcomes), 'replied': 0, 'skipped': 0, 'failed': 0, 'elsewhere': 0}
+        for outcome in await asyncio.gather(*outcomes.values()):
+            counts[outcome] = counts.get(outcome, 0) + 1
+        return counts
+
+    async def _enqueue_pending(self, incremental: bool) -> Dict[str, asyncio.Future]:
+        """Sync the inbox and enqueue pending messages; message ID -> outcome future"""
+        if self.queue is None:
+            await self.start()
+
+        # One sync at a time per process; concurrent triggers just queue up
+        async with self._poll_lock:
+            try:
+                if self.gmail_service.email_address is None:
+                    # Lets triage recognise our own messages
+                    self.triage.add_own_address(await self.gmail_service.get_email_address())
+                
+                emails = await self.gmail_service.sync_inbox(incremental=incremental)
+                outcomes: Dict[str, asyncio.Future] = {}
+                for email in emails:
+                    if email['id'] in self._inflight:
+                        continue
+                    self._inflight.add(email['id'])
+                    item = (email, asyncio.get_running_loop().create_future())
+
+                    if self.queue.full():
+                        self.stats['producer_blocked'] += 1
+                        started = time.monotonic()
+                        await self.queue.put(item)
+                        self.stats['producer_blocked_seconds'] += time.monotonic() - started
+                    else:
+                        self.queue.put_nowait(item)
+                    outcomes[email['id']] = item[1]
+
+                self.stats['polls'] += 1
+                self.stats['enqueued'] += len(outcomes)
+                self.stats['last_poll_at'] = time.time()
+                return outcomes
+
+            except Exception as e:
+                logger.error(f"Error polling inbox: {str(e)}")
+                raise
+
+    async def _poll_loop(self):
+        while True:
+            try:
+                await self.poll()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Already logged in poll(); keep polling
+                pass
+            await asyncio.sleep(self.poll_interval)
+
+    async def _worker(self, worker_id: int):
+        while True:
+            email, outcome = await self.queue.get()
+            self._busy_workers += 1
+            result = 'interrupted'
+            try:
+                # Logs and stage timings for this message carry its Gmail ID
+                with tracing.request_scope(f"gmail-{email['id']}"):
+                    result = await self._process_email(email)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                result = 'failed'
+                logger.error(f"Worker {worker_id} failed on {email['id']}: {str(e)}")
+            finally:
+                self._busy_workers -= 1
+                self._inflight.discard(email['id'])
+                outcome.set_result(result)
+                self.queue.task_done()
+
+    async def _process_email(self, email: Dict[str, Any]) -> str:
+        """Classify, generate and send the reply for one message.
+
+        Returns 'replied', 'skipped', or 'elsewhere' when another process
+        claimed the message first.
+        """
+        ledger = self.gmail_service.ledger
+
+        # Another process may have claimed it since the sync
+        if not await asyncio.to_thread(ledger.claim, email['id']):
+            return 'elsewhere'
+
+        reply_id = None
+        try:
+            with tracing.span("triage"):
+                decision = self.triage.classify(email)
+            if not decision.respond:
+                await asyncio.to_thread(ledger.complete, email['id'], 'skipped')
+                self.stats['skipped'] += 1
+                logger.debug(f"Skipped {email['id']}: {decision.reason}")
+                return 'skipped'
+
+            # Sync only downloads metadata; the snippet is a ~200 character preview
+            body = await self.gmail_service.get_message_body(email['id'])
+            if body is None:
+                raise RuntimeError("message body could not be fetched")
+
+            # Only drawn on when the reply really needs the LLM (not cached or templated)
+            response_data = await self.response_generator.generate_response(
+                subject=email['subject'],
+                body=body or email['snippet'],
+                rate_limiter=self.llm_limiter
+            )
+
+            with tracing.span("gmail_rate_limit"):
+                await self.gmail_send_limiter.acquire()
+            subject = email['subject']
+            if not subject.lower().startswith('re:'):
+                subject = f"Re: {subject}"
+            reply_id = await self.gmail_service.send_email(
+                to=email['sender'],
+                subject=subject,
+                body=response_data['response'],
+                thread_id=email.get('thread_id'),
+                in_reply_to=email.get('headers', {}).get('message-id'),
+                auto_submitted='auto-replied'
+            )
+            self.triage.record_reply(email.get('thread_id'))
+
+            await asyncio.to_thread(ledger.complete, email['id'], 'replied', reply_id)
+            self.stats['replied'] += 1
+            return 'replied'
+
+        except asyncio.CancelledError:
+            # Stopped mid-message: hand it back for the next poll, unless the reply already went out
+            if reply_id is not None:
+                await asyncio.to_thread(ledger.complete, email['id'], 'replied', reply_id)
+            else:
+                await asyncio.to_thread(ledger.unclaim, email['id'])
+            raise
+        except Exception as e:
+            await asyncio.to_thread(ledger.release, email['id'], str(e))
+            self.stats['failed'] += 1
+            raise
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Queue depth, backpressure and throughput counters"""
+        return {
+            'queue_depth': self.queue.qsize() if self.queue else 0,
+            'queue_capacity': self.queue_size,
+            'workers': self.num_workers,
+            'busy_workers': self._busy_workers,
+            'inflight': len(self._inflight),
+            **self.stats,
+            'producer_blocked_seconds': round(self.stats['producer_blocked_seconds'], 3),
+            'triage': self.triage.get_stats(),
+            'rate_limits': {
+                'openai': self.llm_limiter.get_stats(),
+                'gmail_send': self.gmail_send_limiter.get_stats()
+            }
+        }
@@ -0,0 +1,170 @@
+import math
+import time
+from collections import namedtuple
+from typing import Dict, Any, Optional
+import logging
+
+import faiss
+import numpy as np
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# family identifies the structure ("flat", "ivf<nlist>", "hnsw"); factory is the faiss index_factory string
+IndexPlan = namedtuple("IndexPlan", ["family", "factory"])
+
+# k-means wants ~39 points per IVF list and PQ needs 256 points per codebook
+MIN_POINTS_PER_LIST = 39
+PQ_MIN_TRAINING_POINTS = 256
+
+def plan_index(n_vectors: int, dim: int) -> IndexPlan:
+    """Pick the index structure for a corpus of n_vectors from settings.
+
+    ``auto`` uses an exact flat index below POLICY_INDEX_FLAT_THRESHOLD and
+    IVF above it. IVF's list count is a power of two near 4*sqrt(n), so it
+    only changes (and triggers a rebuild) when the corpus roughly quadruples.
+    """
+    kind = settings.POLICY_INDEX_TYPE.lower()
+    if kind == "auto":
+        kind = "flat" if n_vectors < settings.POLICY_INDEX_FLAT_THRESHOLD else "ivf"
+    if kind not in ("flat", "ivf", "hnsw"):
+        raise ValueError(f"Unknown POLICY_INDEX_TYPE: {settings.POLICY_INDEX_TYPE}")
+
+    encoding = _encoding(n_vectors, dim)
+    if kind == "ivf":
+        target = max(1, min(4 * math.sqrt(n_vectors), n_vectors // MIN_POINTS_PER_LIST))
+        nlist = 2 ** int(math.log2(target))
+        return IndexPlan(f"ivf{nlist}", f"IVF{nlist},{encoding}")
+    if kind == "hnsw":
+        suffix = "" if encoding == "Flat" else f",{encoding}"
+        return IndexPlan("hnsw", f"HNSW{settings.POLICY_INDEX_HNSW_M}{suffix}")
+    return IndexPlan("flat", encoding)
+
+def _encoding(n_vectors: int, dim: int) -> str:
+    """Vector encoding: full floats, 8-bit scalar quantization or product quantization"""
+    quantizer = settings.POLICY_INDEX_QUANTIZER.lower()
+    if quantizer == "none":
+        return "Flat"
+    if quantizer == "sq8":
+        return "SQ8"
+    if quantizer == "pq":
+        m = settings.POLICY_INDEX_PQ_M
+        if dim % m != 0:
+            raise ValueError(f"POLICY_INDEX_PQ_M={m} must divide the embedding dimension {dim}")
+        if n_vectors < PQ_MIN_TRAINING_POINTS:
+            # Too few points to train PQ codebooks; SQ8 needs no such minimum
+            return "SQ8"
+        return f"PQ{m}"
+    raise ValueError(f"Unknown POLICY_INDEX_QUANTIZER: {settings.POLICY_INDEX_QUANTIZER}")
+
+def build_index(vectors: np.ndarray) -> faiss.Index:
+    """Create and train an empty index suited to these vectors"""
+    n_vectors, dim = vectors.shape
+    plan = plan_index(n_vectors, dim)
+    index = faiss.index_factory(dim, plan.factory)
+    if not index.is_trained:
+        index.train(vectors)
+    configure(index)
+    logger.info(f"Built {plan.factory} index for {n_vectors} vectors")
+    return index
+
+def empty_like(index: faiss.Index) -> faiss.Index:
+    """An empty copy of a trained index that keeps its training (IVF centroids, codebooks)"""
+    clone = faiss.clone_index(index)
+    clone.reset()
+    configure(clone)
+    return clone
+
+def configure(index: faiss.Index):
+    """Apply search-time parameters, which are not always stored with the index"""
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIVF):
+        index.nprobe = min(settings.POLICY_INDEX_NPROBE, index.nlist)
+    elif isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = settings.POLICY_INDEX_HNSW_EF_SEARCH
+
+def describe(index: faiss.Index) -> str:
+    """Family of an existing index, comparable with IndexPlan.family"""
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIVF):
+        return f"ivf{index.nlist}"
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    return "flat"
+
+def needs_rebuild(index: faiss.Index, n_vectors: Optional[int] = None) -> bool:
+    """True when the corpus has grown or shrunk into a different index structure"""
+    n_vectors = index.ntotal if n_vectors is None else n_vectors
+    return describe(index) != plan_index(n_vectors, index.d).family
+
+def supports_remove(index: faiss.Index) -> bool:
+    """Whether vectors can be removed in place with positions compacted.
+
+    The vector store maps positions to chunk IDs and assumes removal shifts
+    later vectors down, which holds only for flat-coded indexes. IVF keeps
+    the original labels and HNSW cannot remove at all, so those are rebuilt.
+    """
+    return isinstance(faiss.downcast_index(index), faiss.IndexFlatCodes)
+
+def recall_report(
+    index: faiss.Index,
+    vectors: np.ndarray,
+    k: int = 10,
+    n_queries: int = 100,
+    seed: int = 0
+) -> Dict[str, Any]:
+    """Recall@k and per-query latency of an index against an exact flat baseline.
+
+    ``vectors`` must be in index position order. Queries are stored vectors
+    with a little noise added, so each has a meaningful neighbourhood.
+    """
+    n_vectors, dim = vectors.shape
+    k = min(k, n_vectors)
+    rng = np.random.default_rng(seed)
+    sample = rng.choice(n_vectors, size=min(n_queries, n_vectors), replace=False)
+    queries = vectors[sample] + rng.normal(0, 0.01, size=(len(sample), dim)).astype(np.float32)
+
+    baseline = faiss.IndexFlatL2(dim)
+    baseline.add(vectors)
+
+    def timed_search(idx):
+        latencies = []
+        labels = []
+        for query in queries:
+            start = time.perf_counter()
+            _, found = idx.search(query.reshape(1, -1), k)
+            latencies.append((time.perf_counter() - start) * 1000)
+            labels.append(found[0])
+        return np.array(labels), np.array(latencies)
+
+    exact_labels, exact_ms = timed_search(baseline)
+    ann_labels, ann_ms = timed_search(index)
+    recall = np.mean([
+        len(set(a[a >= 0]) & set(e)) / k for a, e in zip(ann_labels, exact_labels)
+    ])
+
+    def latency(ms):
+        return {
+            'mean_ms': round(float(ms.mean()), 4),
+            'p95_ms': round(float(np.percentile(ms, 95)), 4)
+        }
+
+    return {
+        'index': describe(index),
+        'index_type': type(faiss.downcast_index(index)).__name__,
+        'vectors': n_vectors,
+        'queries': len(sample),
+        'k': k,
+        'recall': round(float(recall), 4),
+        'latency': latency(ann_ms),
+        'flat_latency': latency(exact_ms),
+        'memory_bytes': _serialized_size(index),
+        'flat_memory_bytes': _serialized_size(baseline)
+    }
+
+def _serialized_size(index: faiss.Index) -> Optional[int]:
+    try:
+        return int(faiss.serialize_index(index).size)
+    except Exception:
+        return None
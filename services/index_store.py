@@ -0,0 +1,279 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+from typing import List, Dict, Any, Optional, Tuple
+import logging
+
+import faiss
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to no cross-process locking
+    fcntl = None
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Bump when the on-disk layout changes so old snapshots are rebuilt
+FORMAT_VERSION = 1
+
+class IndexStore:
+    """On-disk snapshots of the policy FAISS index.
+
+    Layout under ``path``::
+
+        policies.json          source of truth for the policy set
+        templates.json         response templates
+        CURRENT                name of the active snapshot directory
+        <snapshot>/index.faiss FAISS index
+        <snapshot>/docstore.json chunk documents and id mappings
+        <snapshot>/manifest.json format version, fingerprint and checksums
+
+    Snapshots are written to a fresh directory and published by atomically
+    replacing CURRENT, so readers in other processes never see a partial
+    write and can keep using a snapshot they already memory-mapped.
+    """
+
+    INDEX_FILE = "index.faiss"
+    DOCSTORE_FILE = "docstore.json"
+    MANIFEST_FILE = "manifest.json"
+
+    def __init__(self, path: Optional[str] = None, use_mmap: Optional[bool] = None):
+        self.path = path or settings.POLICY_INDEX_PATH
+        self.use_mmap = settings.POLICY_INDEX_MMAP if use_mmap is None else use_mmap
+        self.loaded_index_path: Optional[str] = None
+        os.makedirs(self.path, exist_ok=True)
+
+    @staticmethod
+    def fingerprint(policies: List[Dict[str, Any]], **build_params: Any) -> str:
+        """Hash the policy set and everything else that shapes the index"""
+        payload = {
+            'format_version': FORMAT_VERSION,
+            'build_params': build_params,
+            'policies': sorted(policies, key=lambda p: p['id'])
+        }
+        encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode('utf-8')
+        return hashlib.sha256(encoded).hexdigest()
+
+    def acquire_lock(self):
+        """Take an exclusive cross-process lock so only one worker rebuilds at a time"""
+        handle = open(os.path.join(self.path, ".lock"), "w")
+        if fcntl:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+        return handle
+
+    def release_lock(self, handle):
+        """Release a lock taken with acquire_lock"""
+        try:
+            if fcntl:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+        finally:
+            handle.close()
+
+    def load_policies(self) -> Optional[List[Dict[str, Any]]]:
+        """Read the persisted policy set, if any"""
+        policies_path = os.path.join(self.path, "policies.json")
+        if not os.path.exists(policies_path):
+            return None
+        with open(policies_path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def policies_version(self) -> Optional[Tuple[int, int, int]]:
+        """Cheap change marker for policies.json"""
+        return self._file_version("policies.json")
+
+    def save_policies(self, policies: List[Dict[str, Any]]):
+        """Persist the policy set"""
+        self._atomic_write(
+            os.path.join(self.path, "policies.json"),
+            json.dumps(policies, indent=2, ensure_ascii=False).encode('utf-8')
+        )
+
+    def load_templates(self) -> Optional[List[Dict[str, Any]]]:
+        """Read the persisted response templates, if any"""
+        templates_path = os.path.join(self.path, "templates.json")
+        if not os.path.exists(templates_path):
+            return None
+        with open(templates_path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def templates_version(self) -> Optional[Tuple[int, int, int]]:
+        """Cheap change marker for templates.json"""
+        return self._file_version("templates.json")
+
+    def save_templates(self, templates: List[Dict[str, Any]]):
+        """Persist the response templates"""
+        self._atomic_write(
+            os.path.join(self.path, "templates.json"),
+            json.dumps(templates, indent=2, ensure_ascii=False).encode('utf-8')
+        )
+
+    def load(
+        self,
+        fingerprint: str,
+        embeddings
+    ) -> Optional[Tuple[FAISS, Dict[str, List[str]]]]:
+        """Load the current snapshot if it matches the fingerprint and checksums"""
+        snapshot = self._current_snapshot()
+        if not snapshot:
+            return None
+
+        try:
+            with open(os.path.join(snapshot, self.MANIFEST_FILE), encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Unreadable index manifest, rebuilding: {str(e)}")
+            return None
+
+        if manifest.get('format_version') != FORMAT_VERSION:
+            logger.info("Index snapshot format changed, rebuilding")
+            return None
+        if manifest.get('fingerprint') != fingerprint:
+            logger.info("Policy set changed since last snapshot, rebuilding")
+            return None
+        for name, expected in manifest.get('checksums', {}).items():
+            if self._sha256(os.path.join(snapshot, name)) != expected:
+                logger.warning(f"Checksum mismatch for {name}, rebuilding")
+                return None
+
+        index_path = os.path.join(snapshot, self.INDEX_FILE)
+        # IO_FLAG_MMAP maps inverted lists read-only so workers share page cache;
+        # index types without mmap support are read into memory as usual
+        flags = faiss.IO_FLAG_MMAP if self.use_mmap else 0
+        index = faiss.read_index(index_path, flags)
+
+        with open(os.path.join(snapshot, self.DOCSTORE_FILE), encoding="utf-8") as f:
+            stored = json.load(f)
+        docstore = InMemoryDocstore({
+            doc_id: Document(id=doc_id, page_content=doc['page_content'], metadata=doc['metadata'])
+            for doc_id, doc in stored['documents'].items()
+        })
+        index_to_docstore_id = dict(enumerate(stored['index_to_docstore_id']))
+
+        vector_store = FAISS(embeddings, index, docstore, index_to_docstore_id)
+        self.loaded_index_path = index_path if self.use_mmap else None
+        logger.info(f"Loaded policy index snapshot {os.path.basename(snapshot)} ({index.ntotal} vectors)")
+        return vector_store, stored['chunk_ids']
+
+    def save(self, vector_store: FAISS, chunk_ids: Dict[str, List[str]], fingerprint: str):
+        """Write a new snapshot and publish it"""
+        name = f"{int(time.time() * 1000)}-{fingerprint[:12]}"
+        staging = os.path.join(self.path, f".{name}.tmp")
+        os.makedirs(staging, exist_ok=True)
+
+        faiss.write_index(vector_store.index, os.path.join(staging, self.INDEX_FILE))
+        ordered_ids = [
+            vector_store.index_to_docstore_id[i]
+            for i in range(len(vector_store.index_to_docstore_id))
+        ]
+        documents = {}
+        for doc_id in ordered_ids:
+            doc = vector_store.docstore.search(doc_id)
+            documents[doc_id] = {'page_content': doc.page_content, 'metadata': doc.metadata}
+        with open(os.path.join(staging, self.DOCSTORE_FILE), "w", encoding="utf-8") as f:
+            json.dump({
+                'documents': documents,
+                'index_to_docstore_id': ordered_ids,
+                'chunk_ids': chunk_ids
+            }, f, ensure_ascii=False)
+
+        manifest = {
+            'format_version': FORMAT_VERSION,
+            'fingerprint': fingerprint,
+            'vectors': vector_store.index.ntotal,
+            'created_at': time.time(),
+            'checksums': {
+                file_name: self._sha256(os.path.join(staging, file_name))
+                for file_name in (self.INDEX_FILE, self.DOCSTORE_FILE)
+            }
+        }
+        with open(os.path.join(staging, self.MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+
+        os.replace(staging, os.path.join(self.path, name))
+        self._atomic_write(os.path.join(self.path, "CURRENT"), name.encode('utf-8'))
+        self._prune_snapshots(keep={name})
+        logger.info(f"Saved policy index snapshot {name}")
+
+    def reopen_writable(self, index: faiss.Index) -> Optional[faiss.Index]:
+        """In-memory copy of a memory-mapped index, made before it is mutated.
+
+        Copied from the loaded index rather than re-read from disk, because
+        other processes' saves may have pruned the snapshot it came from.
+        """
+        if not self.loaded_index_path:
+            return None
+        writable = self._in_memory_copy(index)
+        self.loaded_index_path = None
+        return writable
+
+    @staticmethod
+    def _in_memory_copy(index: faiss.Index) -> faiss.Index:
+        ivf = faiss.try_extract_index_ivf(index)
+        lists = faiss.downcast_InvertedLists(ivf.invlists) if ivf is not None else None
+        if not isinstance(lists, faiss.OnDiskInvertedLists):
+            return faiss.deserialize_index(faiss.serialize_index(index))
+        # Mapped inverted lists serialize as a reference to their file, so copy
+        # the structure without them and the lists entry by entry from the mapping
+        reader = faiss.VectorIOReader()
+        faiss.copy_array_to_vector(faiss.serialize_index(index), reader.data)
+        copy = faiss.read_index(reader, faiss.IO_FLAG_SKIP_IVF_DATA)
+        arrays = faiss.ArrayInvertedLists(lists.nlist, lists.code_size)
+        for list_no in range(lists.nlist):
+            size = lists.list_size(list_no)
+            if size:
+                arrays.add_entries(list_no, size, lists.get_ids(list_no), lists.get_codes(list_no))
+        faiss.extract_index_ivf(copy).replace_invlists(arrays, True)
+        # The index owns the lists now
+        arrays.this.disown()
+        return copy
+
+    def _current_snapshot(self) -> Optional[str]:
+        try:
+            with open(os.path.join(self.path, "CURRENT"), encoding="utf-8") as f:
+                name = f.read().strip()
+        except OSError:
+            return None
+        snapshot = os.path.join(self.path, name)
+        return snapshot if os.path.isdir(snapshot) else None
+
+    def _prune_snapshots(self, keep: set):
+        """Remove superseded snapshots, leaving the previous one for in-flight readers"""
+        snapshots = sorted(
+            entry for entry in os.listdir(self.path)
+            if os.path.isdir(os.path.join(self.path, entry)) and not entry.startswith('.')
+        )
+        for entry in snapshots[:-2]:
+            if entry not in keep:
+                shutil.rmtree(os.path.join(self.path, entry), ignore_errors=True)
+
+    def _file_version(self, name: str) -> Optional[Tuple[int, int, int]]:
+        # Files are replaced atomically on every save, so a new write changes the inode
+        try:
+            stat = os.stat(os.path.join(self.path, name))
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    @staticmethod
+    def _atomic_write(path: str, data: bytes):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _sha256(path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
@@ -0,0 +1,130 @@
+import asyncio
+import random
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, AsyncIterator, Tuple
+import logging
+
+import openai
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Below this many policies a process pool costs more than it saves
+MIN_POOL_POLICIES = 200
+# Errors worth retrying: quota, timeouts, dropped connections and 5xx
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+def split_texts(contents: List[str], chunk_size: int, chunk_overlap: int) -> List[List[str]]:
+    """Split each text into chunks; runs in worker processes, so it must stay module-level"""
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len
+    )
+    return [splitter.split_text(content) for content in contents]
+
+async def split_in_pool(
+    contents: List[str],
+    chunk_size: int,
+    chunk_overlap: int,
+    workers: Optional[int] = None
+) -> List[List[str]]:
+    """Split texts across a process pool, preserving order"""
+    workers = settings.INGEST_SPLIT_WORKERS if workers is None else workers
+    if workers <= 0 or len(contents) < MIN_POOL_POLICIES:
+        return await asyncio.to_thread(split_texts, contents, chunk_size, chunk_overlap)
+
+    loop = asyncio.get_running_loop()
+    slice_size = -(-len(contents) // (workers * 4))
+    slices = [contents[i:i + slice_size] for i in range(0, len(contents), slice_size)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = await asyncio.gather(*[
+            loop.run_in_executor(pool, split_texts, part, chunk_size, chunk_overlap)
+            for part in slices
+        ])
+    return [chunks for part in results for chunks in part]
+
+class BatchEmbedder:
+    """Embed batches of texts with bounded concurrency and rate-limit-aware retries.
+
+    Up to INGEST_EMBED_CONCURRENCY requests are in flight at once. Retryable
+    failures back off exponentially with jitter, or for as long as the
+    server's Retry-After header asks.
+    """
+
+    def __init__(
+        self,
+        embeddings,
+        concurrency: Optional[int] = None,
+        max_retries: Optional[int] = None,
+        base_delay: Optional[float] = None
+    ):
+        self.embeddings = embeddings
+        self.concurrency = concurrency or settings.INGEST_EMBED_CONCURRENCY
+        self.max_retries = settings.INGEST_MAX_RETRIES if max_retries is None else max_retries
+        self.base_delay = base_delay or settings.INGEST_RETRY_BASE_DELAY
+        self.stats = {'requests': 0, 'retries': 0, 'texts': 0}
+
+    async def embed_batches(
+        self,
+        batches: List[List[str]]
+    ) -> AsyncIterator[Tuple[int, List[List[float]]]]:
+        """Yield (batch index, vectors) as each batch finishes, in completion order"""
+        slots = asyncio.Semaphore(self.concurrency)
+
+        async def run(position: int, texts: List[str]):
+            async with slots:
+                return position, await self._embed_with_retry(texts)
+
+        tasks = [asyncio.create_task(run(i, batch)) for i, batch in enumerate(batches)]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield await finished
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _embed_with_retry(self, texts: List[str]) -> List[List[float]]:
+        attempt = 0
+        while True:
+            try:
+                self.stats['requests'] += 1
+                vectors = await self.embeddings.aembed_documents(texts)
+                self.stats['texts'] += len(texts)
+                return vectors
+            except RETRYABLE_ERRORS as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._retry_after(e)
+                if delay is None:
+                    delay = self.base_delay * (2 ** attempt) * (0.5 + random.random() / 2)
+                attempt += 1
+                self.stats['retries'] += 1
+                logger.warning(
+                    f"Embedding batch failed ({type(e).__name__}), retry {attempt} in {delay:.1f}s"
+                )
+                await asyncio.sleep(delay)
+
+    @staticmethod
+    def _retry_after(error: Exception) -> Optional[float]:
+        """Delay requested by the server, if any"""
+        response = getattr(error, 'response', None)
+        headers = getattr(response, 'headers', None) or {}
+        try:
+            if 'retry-after-ms' in headers:
+                return float(headers['retry-after-ms']) / 1000
+            if 'retry-after' in headers:
+                return float(headers['retry-after'])
+        except ValueError:
+            pass
+        return None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(self.stats)
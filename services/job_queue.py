@@ -0,0 +1,303 @@
+import json
+import random
+import threading
+import time
+import uuid
+from typing import List, Dict, Any, Optional, Tuple
+import logging
+
+from services.database import connect
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+JOB_STATUSES = ('queued', 'running', 'succeeded', 'failed')
+
+class JobQueue:
+    """Durable job queue backed by settings.DATABASE_URL.
+
+    Job states:
+
+        queued     waiting to run; run_after delays retries
+        running    claimed by a worker, which renews its lease while working
+        succeeded  finished; result holds the output
+        failed     gave up after max_attempts; error holds the last failure
+
+    Claims run in an IMMEDIATE transaction, so each job goes to exactly one
+    worker across processes. A worker that dies stops renewing its lease and
+    the job is reclaimed once the lease expires. Submitting with an
+    idempotency key that was already used returns the existing job.
+
+    Finished pieces of a running job (one row per email of a batch) are
+    checkpointed in job_items, so each checkpoint writes only what is new.
+    """
+
+    def __init__(self, database_url: Optional[str] = None):
+        self.max_attempts = settings.JOB_MAX_ATTEMPTS
+        self._conn = connect(database_url)
+        self._lock = threading.Lock()
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL,
+                idempotency_key TEXT UNIQUE,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL,
+                progress TEXT,
+                result TEXT,
+                error TEXT,
+                locked_by TEXT,
+                lease_expires REAL,
+                run_after REAL NOT NULL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_status_run_after
+                ON jobs (status, run_after);
+            CREATE TABLE IF NOT EXISTS job_items (
+                job_id TEXT NOT NULL,
+                item TEXT NOT NULL,
+                result TEXT NOT NULL,
+                PRIMARY KEY (job_id, item)
+            );
+        """)
+
+    def submit(
+        self,
+        kind: str,
+        payload: Dict[str, Any],
+        idempotency_key: Optional[str] = None,
+        max_attempts: Optional[int] = None
+    ) -> Tuple[Dict[str, Any], bool]:
+        """Queue a job; returns (job, created). A reused idempotency key returns the original job."""
+        job_id = f"job_{uuid.uuid4().hex[:16]}"
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO jobs (id, kind, payload, status, idempotency_key, max_attempts, "
+                "run_after, created_at, updated_at) VALUES (?, ?, ?, 'queued', ?, ?, ?, ?, ?) "
+                "ON CONFLICT (idempotency_key) DO NOTHING",
+                (job_id, kind, json.dumps(payload), idempotency_key,
+                 max_attempts or self.max_attempts, now, now, now)
+            )
+            created = cursor.rowcount == 1
+            if created:
+                row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            else:
+                row = self._conn.execute(
+                    "SELECT * FROM jobs WHERE idempotency_key = ?", (idempotency_key,)
+                ).fetchone()
+        return self._to_job(row), created
+
+    def claim(
+        self,
+        worker_id: str,
+        lease_seconds: float,
+        kinds: Optional[List[str]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Take the next runnable job (or one whose worker's lease expired), if any"""
+        now = time.time()
+        kind_filter = ""
+        params: List[Any] = [now, now]
+        if kinds:
+            kind_filter = f" AND kind IN ({', '.join('?' for _ in kinds)})"
+            params.extend(kinds)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                while True:
+                    row = self._conn.execute(
+                        "SELECT * FROM jobs WHERE ((status = 'queued' AND run_after <= ?) "
+                        "OR (status = 'running' AND lease_expires < ?))" + kind_filter +
+                        " ORDER BY run_after LIMIT 1",
+                        params
+                    ).fetchone()
+                    if row is None:
+                        self._conn.execute("COMMIT")
+                        return None
+                    if row['status'] != 'running':
+                        break
+                    if row['attempts'] < row['max_attempts']:
+                        logger.warning(
+                            f"Reclaiming job {row['id']} from {row['locked_by']} after its lease expired"
+                        )
+                        break
+                    # Its last attempt died with the worker; do not run it again
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'failed', error = ?, locked_by = NULL, "
+                        "lease_expires = NULL, updated_at = ? WHERE id = ?",
+                        (f"Worker {row['locked_by']} stopped before finishing", now, row['id'])
+                    )
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'running', attempts = attempts + 1, locked_by = ?, "
+                    "lease_expires = ?, updated_at = ? WHERE id = ?",
+                    (worker_id, now + lease_seconds, now, row['id'])
+                )
+                row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (row['id'],)).fetchone()
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return self._to_job(row, include_payload=True)
+
+    def renew(self, job_id: str, worker_id: str, lease_seconds: float) -> bool:
+        """Extend a running job's lease; False if this worker no longer owns it"""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET lease_expires = ?, updated_at = ? "
+                "WHERE id = ? AND locked_by = ? AND status = 'running'",
+                (now + lease_seconds, now, job_id, worker_id)
+            )
+        return cursor.rowcount == 1
+
+    def save_progress(
+        self,
+        job_id: str,
+        worker_id: str,
+        progress: Dict[str, Any],
+        items: Optional[Dict[str, Any]] = None
+    ):
+        """Checkpoint progress and newly finished items so a retried job can skip finished work"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = self._conn.execute(
+                    "UPDATE jobs SET progress = ?, updated_at = ? WHERE id = ? AND locked_by = ?",
+                    (json.dumps(progress, default=str), time.time(), job_id, worker_id)
+                )
+                # Only the worker that owns the job may record its items
+                if items and cursor.rowcount == 1:
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO job_items (job_id, item, result) VALUES (?, ?, ?)",
+                        [(job_id, item, json.dumps(result, default=str)) for item, result in items.items()]
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def get_items(self, job_id: str) -> Dict[str, Any]:
+        """Items checkpointed by earlier attempts of a job"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT item, result FROM job_items WHERE job_id = ?", (job_id,)
+            ).fetchall()
+        return {row['item']: json.loads(row['result']) for row in rows}
+
+    def complete(self, job_id: str, worker_id: str, result: Any):
+        """Record a job's result; its checkpointed items are no longer needed"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = self._conn.execute(
+                    "UPDATE jobs SET status = 'succeeded', result = ?, error = NULL, locked_by = NULL, "
+                    "lease_expires = NULL, updated_at = ? WHERE id = ? AND locked_by = ?",
+                    (json.dumps(result, default=str), time.time(), job_id, worker_id)
+                )
+                if cursor.rowcount == 1:
+                    self._conn.execute("DELETE FROM job_items WHERE job_id = ?", (job_id,))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def fail(self, job_id: str, worker_id: str, error: str) -> Optional[str]:
+        """Schedule a retry with exponential backoff, or mark the job failed after max_attempts.
+
+        Returns the job's new status.
+        """
+        now = time.time()
+        with self._lock:
+            # Immediate, so another process cannot reclaim the job between the read and the update
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT attempts, max_attempts FROM jobs WHERE id = ? AND locked_by = ?",
+                    (job_id, worker_id)
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                if row['attempts'] >= row['max_attempts']:
+                    status, run_after = 'failed', now
+                else:
+                    delay = min(
+                        settings.JOB_RETRY_BASE_DELAY * (2 ** (row['attempts'] - 1)),
+                        settings.JOB_RETRY_MAX_DELAY
+                    ) * (0.5 + random.random() / 2)
+                    status, run_after = 'queued', now + delay
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, run_after = ?, locked_by = NULL, "
+                    "lease_expires = NULL, updated_at = ? WHERE id = ? AND locked_by = ?",
+                    (status, error, run_after, now, job_id, worker_id)
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return status
+
+    def get(self, job_id: str) -> Dict[str, Any]:
+        """Look up a job by ID"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            raise KeyError(f"Job not found: {job_id}")
+        return self._to_job(row)
+
+    def list_jobs(self, status: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """Most recent jobs, without their results"""
+        query = "SELECT * FROM jobs"
+        params: List[Any] = []
+        if status:
+            query += " WHERE status = ?"
+            params.append(status)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [self._to_job(row, include_result=False) for row in rows]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) AS count FROM jobs GROUP BY status"
+            ).fetchall()
+            oldest = self._conn.execute(
+                "SELECT MIN(created_at) AS created_at FROM jobs WHERE status = 'queued'"
+            ).fetchone()
+        counts = {status: 0 for status in JOB_STATUSES}
+        counts.update({row['status']: row['count'] for row in rows})
+        return {
+            'jobs': counts,
+            'oldest_queued_seconds': round(time.time() - oldest['created_at'], 1)
+            if oldest['created_at'] else 0.0
+        }
+
+    @staticmethod
+    def _to_job(
+        row,
+        include_payload: bool = False,
+        include_result: bool = True
+    ) -> Dict[str, Any]:
+        job = {
+            'id': row['id'],
+            'kind': row['kind'],
+            'status': row['status'],
+            'idempotency_key': row['idempotency_key'],
+            'attempts': row['attempts'],
+            'max_attempts': row['max_attempts'],
+            'error': row['error'],
+            'created_at': row['created_at'],
+            'updated_at': row['updated_at'],
+            'run_after': row['run_after']
+        }
+        if include_result:
+            job['progress'] = json.loads(row['progress']) if row['progress'] else None
+            job['result'] = json.loads(row['result']) if row['result'] else None
+        if include_payload:
+            job['payload'] = json.loads(row['payload'])
+        return job
@@ -0,0 +1,122 @@
+import asyncio
+import os
+import socket
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import logging
+
+from services import tracing
+from services.job_queue import JobQueue
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# handler(job, checkpoint) -> JSON-serializable result; checkpoint(progress, items) saves
+# partial work, and a retry finds the items saved so far in job['items']
+Checkpoint = Callable[[Dict[str, Any], Optional[Dict[str, Any]]], Awaitable[None]]
+JobHandler = Callable[[Dict[str, Any], Checkpoint], Awaitable[Any]]
+
+class JobWorker:
+    """Runs jobs from the durable JobQueue with a fixed number of concurrent slots.
+
+    Each slot claims a job, renews its lease while the handler runs, and
+    records the result. If the handler raises, the job is retried with
+    backoff. Handlers receive the job's saved progress and items, so a retry
+    can skip work a previous attempt already finished. If the lease is lost,
+    the handler is cancelled so the job never runs in two workers at once.
+    """
+
+    def __init__(self, job_queue: JobQueue, handlers: Dict[str, JobHandler]):
+        self.job_queue = job_queue
+        self.handlers = handlers
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.lease_seconds = settings.JOB_LEASE_SECONDS
+        self.poll_interval = settings.JOB_POLL_INTERVAL
+        self._tasks: List[asyncio.Task] = []
+        self._running = 0
+        self.stats = {'succeeded': 0, 'retried': 0, 'failed': 0, 'lease_lost': 0}
+
+    async def start(self, concurrency: int):
+        """Start the job slots; 0 leaves jobs to other processes"""
+        self._tasks = [
+            asyncio.create_task(self._loop(), name=f"job-worker-{i}")
+            for i in range(concurrency)
+        ]
+        if concurrency:
+            logger.info(f"Job worker {self.worker_id} started with {concurrency} slots")
+
+    async def stop(self):
+        """Cancel the slots; interrupted jobs are reclaimed when their leases expire"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _loop(self):
+        while True:
+            try:
+                job = await asyncio.to_thread(
+                    self.job_queue.claim, self.worker_id, self.lease_seconds, list(self.handlers)
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error claiming job: {str(e)}")
+                job = None
+            if job is None:
+                await asyncio.sleep(self.poll_interval)
+                continue
+            with tracing.request_scope(job['id']):
+                await self._run(job)
+
+    async def _run(self, job: Dict[str, Any]):
+        job_id = job['id']
+        handler = self.handlers[job['kind']]
+
+        async def checkpoint(progress: Dict[str, Any], items: Optional[Dict[str, Any]] = None):
+            await asyncio.to_thread(
+                self.job_queue.save_progress, job_id, self.worker_id, progress, items
+            )
+
+        job['items'] = await asyncio.to_thread(self.job_queue.get_items, job_id)
+        logger.info(f"Running job {job_id} ({job['kind']}), attempt {job['attempts']}")
+        self._running += 1
+        work = asyncio.create_task(handler(job, checkpoint))
+        heartbeat = asyncio.create_task(self._renew_lease(job_id, work))
+        try:
+            result = await work
+            await asyncio.to_thread(self.job_queue.complete, job_id, self.worker_id, result)
+            self.stats['succeeded'] += 1
+        except asyncio.CancelledError:
+            # The heartbeat cancelled the handler; another worker owns the job now
+            if heartbeat.done() and not heartbeat.cancelled() and heartbeat.exception() is None:
+                self.stats['lease_lost'] += 1
+                return
+            raise
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {str(e)}")
+            status = await asyncio.to_thread(self.job_queue.fail, job_id, self.worker_id, str(e))
+            self.stats['retried' if status == 'queued' else 'failed'] += 1
+        finally:
+            heartbeat.cancel()
+            self._running -= 1
+
+    async def _renew_lease(self, job_id: str, work: asyncio.Task):
+        """Keep the lease alive at a third of its length while the job runs; cancel the work if it is lost"""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            renewed = await asyncio.to_thread(
+                self.job_queue.renew, job_id, self.worker_id, self.lease_seconds
+            )
+            if not renewed:
+                logger.warning(f"Lost the lease on job {job_id}; stopping it here")
+                work.cancel()
+                return
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'worker_id': self.worker_id,
+            'slots': len(self._tasks),
+            'running': self._running,
+            **self.stats
+        }
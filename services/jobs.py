@@ -0,0 +1,52 @@
+import asyncio
+from typing import Any, Dict
+import logging
+
+from services.job_worker import Checkpoint, JobHandler
+
+logger = logging.getLogger(__name__)
+
+# Job kinds accepted by the queue
+EMAIL_BATCH = "email_batch"
+INBOX_POLL = "inbox_poll"
+
+def build_handlers(batch_processor, inbox_processor) -> Dict[str, JobHandler]:
+    """Job handlers for the durable queue, bound to the shared services"""
+
+    async def run_email_batch(job: Dict[str, Any], checkpoint: Checkpoint) -> Dict[str, Any]:
+        emails = job['payload']['emails']
+        # Results of emails finished by an earlier attempt; those are not sent twice
+        done = {int(position): result for position, result in (job.get('items') or {}).items()}
+        remaining = [i for i in range(len(emails)) if i not in done]
+        checkpoint_lock = asyncio.Lock()
+
+        # Jobs may hold more emails than one batch; work through them a batch at a time
+        size = batch_processor.max_batch_size
+        for start in range(0, len(remaining), size):
+            chunk = remaining[start:start + size]
+
+            async def record(position: int, result: Dict[str, Any], chunk=chunk):
+                done[chunk[position]] = result
+                # Save just this email's result, so each checkpoint costs the same however large the job
+                async with checkpoint_lock:
+                    await checkpoint(
+                        {'done': len(done), 'total': len(emails)}, {str(chunk[position]): result}
+                    )
+
+            await batch_processor.process_batch(
+                [emails[i] for i in chunk],
+                use_cache=job['payload'].get('use_cache', True),
+                on_result=record
+            )
+        results = [done[i] for i in range(len(emails))]
+        return {
+            'results': results,
+            'sent': sum(1 for r in results if r['status'] == 'sent'),
+            'failed': sum(1 for r in results if r['status'] == 'failed')
+        }
+
+    async def run_inbox_poll(job: Dict[str, Any], checkpoint: Checkpoint) -> Dict[str, Any]:
+        # Report on the messages this poll queued once the inbox workers have handled them
+        return await inbox_processor.poll_and_wait(job['payload'].get('incremental', True))
+
+    return {EMAIL_BATCH: run_email_batch, INBOX_POLL: run_inbox_poll}
@@ -0,0 +1,148 @@
+import math
+import re
+from collections import Counter, defaultdict
+from typing import List, Dict, Any, Iterable, Optional, Set, Tuple
+
+TOKEN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+STOPWORDS = frozenset("""
+a an and are as at be but by can do for from has have how i if in is it its me my
+no not of on or our please so that the their there this to was we what when where
+which who why will with would you your
+""".split())
+
+def _stem(token: str) -> str:
+    """Fold simple plurals so 'refunds' matches 'refund'"""
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase, lightly stemmed word tokens without stopwords"""
+    return [_stem(t) for t in TOKEN.findall((text or "").lower()) if t not in STOPWORDS]
+
+def reciprocal_rank_fusion(rankings: Iterable[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Merge ranked ID lists: each list contributes 1 / (k + rank) per ID"""
+    scores: Dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] += 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+class KeywordIndex:
+    """In-memory BM25 inverted index over policy chunks.
+
+    Each chunk is indexed on its text plus its policy's keywords; keyword
+    terms count KEYWORD_BOOST times so curated keywords outrank incidental
+    mentions. Declared keyword phrases are also kept per policy so callers
+    can tell when a query names exactly one policy's topic.
+    """
+
+    K1 = 1.2
+    B = 0.75
+    KEYWORD_BOOST = 3
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[str, int]] = defaultdict(dict)
+        self.doc_lengths: Dict[str, int] = {}
+        self.doc_policy: Dict[str, str] = {}
+        self.doc_terms: Dict[str, List[str]] = {}
+        # policy_id -> number of indexed chunks, so removal knows when a policy is gone
+        self.policy_docs: Counter = Counter()
+        self.total_length = 0
+        # policy_id -> normalized keyword phrases, and policy_id -> category
+        self.policy_keywords: Dict[str, Set[str]] = {}
+        self.policy_category: Dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def add(self, doc_id: str, text: str, keywords: List[str], policy_id: str, category: str):
+        """Index one chunk, replacing any previous entry with the same ID"""
+        self.remove([doc_id])
+        terms = Counter(tokenize(text))
+        for keyword in keywords:
+            for term in tokenize(keyword):
+                terms[term] += self.KEYWORD_BOOST
+
+        for term, count in terms.items():
+            self.postings[term][doc_id] = count
+        self.doc_terms[doc_id] = list(terms)
+        length = sum(terms.values())
+        self.doc_lengths[doc_id] = length
+        self.doc_policy[doc_id] = policy_id
+        self.policy_docs[policy_id] += 1
+        self.total_length += length
+        self.policy_keywords[policy_id] = {
+            " ".join(tokenize(k)) for k in keywords if tokenize(k)
+        }
+        self.policy_category[policy_id] = category
+
+    def remove(self, doc_ids: Iterable[str]):
+        for doc_id in doc_ids:
+            length = self.doc_lengths.pop(doc_id, None)
+            if length is None:
+                continue
+            self.total_length -= length
+            policy_id = self.doc_policy.pop(doc_id)
+            for term in self.doc_terms.pop(doc_id):
+                del self.postings[term][doc_id]
+                if not self.postings[term]:
+                    del self.postings[term]
+            self.policy_docs[policy_id] -= 1
+            if not self.policy_docs[policy_id]:
+                del self.policy_docs[policy_id]
+                self.policy_keywords.pop(policy_id, None)
+                self.policy_category.pop(policy_id, None)
+
+    def clear(self):
+        self.postings.clear()
+        self.doc_lengths.clear()
+        self.doc_policy.clear()
+        self.doc_terms.clear()
+        self.policy_docs.clear()
+        self.policy_keywords.clear()
+        self.policy_category.clear()
+        self.total_length = 0
+
+    def search(
+        self,
+        query: str,
+        k: int,
+        categories: Optional[Set[str]] = None
+    ) -> List[Tuple[str, float]]:
+        """Top-k (doc_id, BM25 score) for the query, optionally within categories"""
+        if not self.doc_lengths:
+            return []
+        n_docs = len(self.doc_lengths)
+        avg_length = self.total_length / n_docs
+        scores: Dict[str, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            for doc_id, tf in docs.items():
+                if categories is not None and self._category_of(doc_id) not in categories:
+                    continue
+                norm = self.K1 * (1 - self.B + self.B * self.doc_lengths[doc_id] / avg_length)
+                scores[doc_id] += idf * tf * (self.K1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def matching_policies(self, query: str, categories: Optional[Set[str]] = None) -> Set[str]:
+        """Policies with at least one declared keyword phrase present in the query"""
+        padded = f" {' '.join(tokenize(query))} "
+        return {
+            policy_id
+            for policy_id, phrases in self.policy_keywords.items()
+            if (categories is None or self.policy_category[policy_id] in categories)
+            and any(f" {phrase} " in padded for phrase in phrases)
+        }
+
+    def policy_of(self, doc_id: str) -> str:
+        return self.doc_policy[doc_id]
+
+    def _category_of(self, doc_id: str) -> str:
+        return self.policy_category[self.doc_policy[doc_id]]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {'documents': len(self.doc_lengths), 'terms': len(self.postings)}
@@ -0,0 +1,151 @@
+"""Prometheus metrics.
+
+Stage and HTTP timings are recorded as they happen (see services/tracing.py).
+Everything the services already count (cache tiers, token usage, queue
+depths) is read from their stats at scrape time by ServiceMetricsCollector,
+so the hot paths do not count anything twice.
+"""
+from typing import Any, Iterator, Tuple
+import logging
+
+from prometheus_client import REGISTRY, Counter, Gauge, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.exposition import choose_encoder
+
+logger = logging.getLogger(__name__)
+
+# 1ms to 30s: covers a cache read as well as a slow LLM call
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+STAGE_SECONDS = Histogram(
+    "autoresponder_stage_duration_seconds",
+    "Time spent in each stage of handling an email",
+    ["stage"],
+    buckets=LATENCY_BUCKETS
+)
+STAGE_ERRORS = Counter(
+    "autoresponder_stage_errors_total",
+    "Stages that raised",
+    ["stage"]
+)
+HTTP_SECONDS = Histogram(
+    "autoresponder_http_request_duration_seconds",
+    "HTTP request latency by route",
+    ["method", "route"],
+    buckets=LATENCY_BUCKETS
+)
+HTTP_REQUESTS = Counter(
+    "autoresponder_http_requests_total",
+    "HTTP requests by route and status",
+    ["method", "route", "status"]
+)
+HTTP_IN_FLIGHT = Gauge(
+    "autoresponder_http_requests_in_flight",
+    "HTTP requests being handled"
+)
+
+class ServiceMetricsCollector:
+    """Reads the services' own counters whenever Prometheus scrapes"""
+
+    def __init__(self, services):
+        self.services = services
+
+    def collect(self) -> Iterator[Any]:
+        services = self.services
+        try:
+            yield from self._cache_metrics(services)
+            yield from self._llm_metrics(services)
+            yield from self._queue_metrics(services)
+        except Exception as e:
+            # A failing collector would fail the whole scrape
+            logger.error(f"Error collecting service metrics: {str(e)}")
+
+    @staticmethod
+    def _cache_metrics(services) -> Iterator[Any]:
+        l2 = services.cache_service.l2_stats
+        embedding = services.policy_service.embeddings.cache.stats
+        semantic = services.response_generator.semantic_cache.stats
+        templates = services.template_service.stats
+        tiers = {
+            'l1': (services.cache_service.l1.hits, services.cache_service.l1.misses),
+            'l2': (l2['hits'], l2['misses']),
+            'semantic': (semantic['hits'], semantic['misses']),
+            'embedding': (embedding['lru_hits'] + embedding['store_hits'], embedding['misses']),
+            'template': (
+                templates['matched'],
+                templates['prefiltered'] + templates['below_threshold'] + templates['ambiguous']
+            )
+        }
+        lookups = CounterMetricFamily(
+            "autoresponder_cache_lookups", "Cache lookups by tier and result", labels=["tier", "result"]
+        )
+        ratio = GaugeMetricFamily(
+            "autoresponder_cache_hit_ratio", "Share of lookups each cache tier answered", labels=["tier"]
+        )
+        for tier, (hits, misses) in tiers.items():
+            lookups.add_metric([tier, "hit"], hits)
+            lookups.add_metric([tier, "miss"], misses)
+            ratio.add_metric([tier], hits / (hits + misses) if hits + misses else 0.0)
+        yield lookups
+        yield ratio
+
+    @staticmethod
+    def _llm_metrics(services) -> Iterator[Any]:
+        generator = services.response_generator
+        usage = generator.usage_stats
+        yield CounterMetricFamily("autoresponder_llm_calls", "LLM calls", value=usage['llm_calls'])
+        tokens = CounterMetricFamily("autoresponder_llm_tokens", "LLM tokens by type", labels=["type"])
+        tokens.add_metric(["input"], usage['input_tokens'])
+        tokens.add_metric(["cached_input"], usage['cached_input_tokens'])
+        tokens.add_metric(["output"], usage['output_tokens'])
+        yield tokens
+        yield GaugeMetricFamily(
+            "autoresponder_generations_in_flight",
+            "Distinct replies being generated in this process",
+            value=generator.single_flight.in_flight()
+        )
+
+    @staticmethod
+    def _queue_metrics(services) -> Iterator[Any]:
+        inbox = services.inbox_processor.get_stats()
+        yield GaugeMetricFamily(
+            "autoresponder_inbox_queue_depth", "Inbox messages waiting for a worker",
+            value=inbox['queue_depth']
+        )
+        yield GaugeMetricFamily(
+            "autoresponder_inbox_busy_workers", "Inbox workers handling a message",
+            value=inbox['busy_workers']
+        )
+        outcomes = CounterMetricFamily(
+            "autoresponder_inbox_messages", "Inbox messages handled by outcome", labels=["outcome"]
+        )
+        for outcome in ('replied', 'skipped', 'failed'):
+            outcomes.add_metric([outcome], inbox[outcome])
+        yield outcomes
+
+        job_stats = services.job_queue.get_stats()
+        jobs = GaugeMetricFamily("autoresponder_jobs", "Jobs by status", labels=["status"])
+        for status, count in job_stats['jobs'].items():
+            jobs.add_metric([status], count)
+        yield jobs
+        yield GaugeMetricFamily(
+            "autoresponder_jobs_oldest_queued_seconds", "Age of the oldest queued job",
+            value=job_stats['oldest_queued_seconds']
+        )
+        yield GaugeMetricFamily(
+            "autoresponder_jobs_running", "Jobs running in this process",
+            value=services.job_worker.get_stats()['running']
+        )
+
+def register_services(services):
+    """Export the container's service counters; call once per process"""
+    REGISTRY.register(ServiceMetricsCollector(services))
+
+def render(accept: str = "") -> Tuple[bytes, str]:
+    """The metrics page and its content type.
+
+    OpenMetrics, which carries the request-ID exemplars, is used when the
+    scraper asks for it; plain Prometheus text otherwise.
+    """
+    encoder, content_type = choose_encoder(accept)
+    return encoder(REGISTRY), content_type
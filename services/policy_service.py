@@ -1,57 +1,166 @@
 import asyncio
+import hashlib
 import json
-from typing import List, Dict, Any, Optional
+import time
+import uuid
+from contextlib import aclosing
+from typing import List, Dict, Any, Optional, Set, Tuple
 import logging
 
+import faiss
+import httpx
+import numpy as np
+
 # Updated imports for LangChain v0.3
-from langchain_openai import OpenAIEmbeddings
 from langchain_community.vectorstores import FAISS
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
 
+from services.backends import create_embeddings
+from services import index_factory, tracing
+from services.index_store import IndexStore
+from services.ingest import BatchEmbedder, split_in_pool
+from services.keyword_index import KeywordIndex, reciprocal_rank_fusion
+from services.rw_lock import ReadWriteLock
 from config.settings import settings
 
 logger = logging.getLogger(__name__)
 
 class PolicyService:
-    def __init__(self):
-        self.embeddings = OpenAIEmbeddings(openai_api_key=settings.OPENAI_API_KEY)
+    def __init__(
+        self,
+        http_client: Optional[httpx.Client] = None,
+        http_async_client: Optional[httpx.AsyncClient] = None
+    ):
+        self.embeddings = create_embeddings(http_client, http_async_client)
         self.vector_store = None
+        # category -> vector store holding only that category's chunks
+        self.partitions: Dict[str, FAISS] = {}
         self.policies = []
+        # policy_id -> ids of that policy's chunks in the vector store
+        self.chunk_ids: Dict[str, List[str]] = {}
+        self._lock = asyncio.Lock()
+        # FAISS indexes cannot be searched while they are written; searches read, in-place edits write
+        self._index_lock = ReadWriteLock()
+        self.index_store = IndexStore()
+        # BM25 over chunk text and policy keywords, kept in step with the vector store
+        self.keyword_index = KeywordIndex()
+        self.search_stats = {'keyword_fast_path': 0, 'hybrid': 0, 'vector_only': 0}
+        # Fingerprint of the indexed policy set; changes whenever policies do
+        self.corpus_version: Optional[str] = None
+        # policies.json as this process last read or wrote it, to notice other writers
+        self._stored_version: Optional[Tuple[int, int, int]] = None
+        self._synced_policies: Dict[str, Dict[str, Any]] = {}
+        self._watch_task: Optional[asyncio.Task] = None
+        self.chunk_size = 1000
+        self.chunk_overlap = 200
         self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
+            chunk_size=self.chunk_size,
+            chunk_overlap=self.chunk_overlap,
             length_function=len
         )
     
     async def load_policies(self):
         """Load company policies from storage"""
         try:
-            # Load default policies
-            await self._load_default_policies()
-            
-            # Initialize vector store
-            if self.policies:
-                documents = []
-                for policy in self.policies:
-                    chunks = self.text_splitter.split_text(policy['content'])
-                    for chunk in chunks:
-                        documents.append(Document(
-                            page_content=chunk,
-                            metadata={
-                                'title': policy['title'],
-                                'category': policy['category'],
-                                'keywords': policy['keywords']
-                            }
-                        ))
+            # Serialize startup across workers so only one of them rebuilds
+            lock = await asyncio.to_thread(self.index_store.acquire_lock)
+            try:
+                stored_policies = await asyncio.to_thread(self.index_store.load_policies)
+                if stored_policies is None:
+                    # Load default policies
+                    await self._load_default_policies()
+                else:
+                    self.policies = stored_policies
                 
-                self.vector_store = FAISS.from_documents(documents, self.embeddings)
-                logger.info(f"Loaded {len(self.policies)} policies")
+                # Initialize vector store, reusing the snapshot when nothing changed
+                if self.policies:
+                    fingerprint = self._fingerprint()
+                    loaded = await asyncio.to_thread(
+                        self.index_store.load, fingerprint, self.embeddings
+                    )
+                    if loaded:
+                        self.vector_store, self.chunk_ids = loaded
+                        index_factory.configure(self.vector_store.index)
+                    else:
+                        await self._rebuild_vector_store()
+                        await asyncio.to_thread(self._save_snapshot, fingerprint)
+                    await self._rebuild_partitions()
+                    self._rebuild_keyword_index()
+                    self.corpus_version = fingerprint
+                    logger.info(f"Loaded {len(self.policies)} policies")
+                self._mark_synced(await asyncio.to_thread(self.index_store.policies_version))
+            finally:
+                await asyncio.to_thread(self.index_store.release_lock, lock)
             
         except Exception as e:
             logger.error(f"Error loading policies: {str(e)}")
             raise
     
+    async def refresh_policies(self) -> bool:
+        """Pick up policy changes saved by another process; True if the policy set changed.
+        
+        Costs one stat() call when nothing changed. When the writer's snapshot
+        matches the stored policies it is loaded as is; otherwise only the
+        policies that differ are re-indexed, from the shared embedding cache.
+        """
+        if await asyncio.to_thread(self.index_store.policies_version) == self._stored_version:
+            return False
+        try:
+            async with self._lock:
+                lock = await asyncio.to_thread(self.index_store.acquire_lock)
+                try:
+                    version = await asyncio.to_thread(self.index_store.policies_version)
+                    if version == self._stored_version:
+                        return False
+                    stored = await asyncio.to_thread(self.index_store.load_policies) or []
+                    fingerprint = self._fingerprint(stored)
+                    loaded = await asyncio.to_thread(
+                        self.index_store.load, fingerprint, self.embeddings
+                    )
+                    if loaded:
+                        self.vector_store, self.chunk_ids = loaded
+                        index_factory.configure(self.vector_store.index)
+                        self.policies = stored
+                        await self._rebuild_partitions()
+                        self._rebuild_keyword_index()
+                    else:
+                        await self._apply_policy_set(stored)
+                    self._mark_synced(version)
+                    self.corpus_version = fingerprint
+                finally:
+                    await asyncio.to_thread(self.index_store.release_lock, lock)
+            
+            logger.info(f"Reloaded policies saved by another process ({len(self.policies)} policies)")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error reloading policies: {str(e)}")
+            raise
+    
+    async def start_watching(self, interval: float):
+        """Reload policies changed by other processes every ``interval`` seconds (0: never)"""
+        if interval > 0 and self._watch_task is None:
+            self._watch_task = asyncio.create_task(self._watch(interval), name="policy-watch")
+    
+    async def stop_watching(self):
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            await asyncio.gather(self._watch_task, return_exceptions=True)
+            self._watch_task = None
+    
+    async def _watch(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.refresh_policies()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Already logged in refresh_policies(); try again next interval
+                pass
+    
     async def _load_default_policies(self):
         """Load default company policies"""
         default_policies = [
@@ -97,7 +206,8 @@ class PolicyService:
     async def add_policy(self, title: str, content: str, category: str, keywords: List[str]) -> str:
         """Add a new policy"""
         try:
-            policy_id = f"policy_{len(self.policies) + 1}"
+            # IDs must not depend on list position so vectors can be removed by ID later
+            policy_id = f"policy_{uuid.uuid4().hex[:12]}"
             new_policy = {
                 'id': policy_id,
                 'title': title,
@@ -106,10 +216,11 @@ class PolicyService:
                 'keywords': keywords
             }
             
-            self.policies.append(new_policy)
-            
-            # Update vector store
-            await self._update_vector_store()
+            async with self._lock:
+                # Embed and index only this policy's chunks
+                await self._sync_policy_vectors(new_policy)
+                self.policies.append(new_policy)
+                await self._persist()
             
             logger.info(f"Added new policy: {title}")
             return policy_id
@@ -118,19 +229,181 @@ class PolicyService:
             logger.error(f"Error adding policy: {str(e)}")
             raise
     
-    async def search_policies(self, query: str, k: int = 3) -> List[Dict[str, Any]]:
-        """Search for relevant policies using semantic search"""
+    async def add_policies_bulk(self, records: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Ingest many policies at once.
+        
+        Chunks are split in a process pool and embedded in batches with
+        several requests in flight. Each batch holds whole policies and is
+        written to the index as soon as its embeddings arrive, so progress
+        is not lost to one late batch. The index is retrained (if its size
+        calls for it) and snapshotted once at the end.
+        """
+        started = time.perf_counter()
+        policies = [
+            {
+                'id': f"policy_{uuid.uuid4().hex[:12]}",
+                'title': record['title'],
+                'content': record['content'],
+                'category': record['category'],
+                'keywords': record.get('keywords') or []
+            }
+            for record in records
+        ]
+        added = 0
+        try:
+            split = await split_in_pool(
+                [p['content'] for p in policies], self.chunk_size, self.chunk_overlap
+            )
+            
+            batches = []
+            current, size = [], 0
+            for policy, chunks in zip(policies, split):
+                ids, docs = self._build_documents(policy, chunks)
+                current.append((policy, ids, docs))
+                size += len(docs)
+                if size >= settings.INGEST_EMBED_BATCH_SIZE:
+                    batches.append(current)
+                    current, size = [], 0
+            if current:
+                batches.append(current)
+            
+            embedder = BatchEmbedder(self.embeddings)
+            texts = [[d.page_content for _, _, docs in batch for d in docs] for batch in batches]
+            # Closed on the way out, so a failure here cancels the embedding requests still in flight
+            async with aclosing(embedder.embed_batches(texts)) as results:
+                async for position, vectors in results:
+                    async with self._lock:
+                        await self._index_batch(batches[position], vectors)
+                    added += len(batches[position])
+                    logger.info(f"Bulk ingest: {added}/{len(policies)} policies indexed")
+            
+            return {
+                'added': added,
+                'chunks': sum(len(t) for t in texts),
+                'batches': len(batches),
+                'embedding': embedder.get_stats(),
+                'seconds': round(time.perf_counter() - started, 2)
+            }
+            
+        except Exception as e:
+            logger.error(f"Error in bulk policy ingest after {added} policies: {str(e)}")
+            raise
+        finally:
+            if added:
+                async with self._lock:
+                    await self._retrain_stores()
+                    await self._persist()
+    
+    async def update_policy(
+        self,
+        policy_id: str,
+        title: Optional[str] = None,
+        content: Optional[str] = None,
+        category: Optional[str] = None,
+        keywords: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """Update an existing policy, re-embedding only chunks whose text changed"""
+        try:
+            async with self._lock:
+                policy = self._get_policy(policy_id)
+                
+                updated = dict(policy)
+                if title is not None:
+                    updated['title'] = title
+                if content is not None:
+                    updated['content'] = content
+                if category is not None:
+                    updated['category'] = category
+                if keywords is not None:
+                    updated['keywords'] = keywords
+                
+                await self._sync_policy_vectors(updated)
+                policy.update(updated)
+                await self._persist()
+            
+            logger.info(f"Updated policy: {policy_id}")
+            return policy
+            
+        except KeyError:
+            raise
+        except Exception as e:
+            logger.error(f"Error updating policy: {str(e)}")
+            raise
+    
+    async def delete_policy(self, policy_id: str) -> bool:
+        """Delete a policy and remove its vectors from the index"""
+        try:
+            async with self._lock:
+                policy = self._get_policy(policy_id)
+                await self._remove_policy_vectors(policy)
+                self.policies.remove(policy)
+                await self._persist()
+            
+            logger.info(f"Deleted policy: {policy_id}")
+            return True
+            
+        except KeyError:
+            raise
+        except Exception as e:
+            logger.error(f"Error deleting policy: {str(e)}")
+            raise
+    
+    async def search_policies(
+        self,
+        query: str,
+        k: int = 3,
+        categories: Optional[List[str]] = None,
+        score_threshold: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """Search for relevant policies using hybrid keyword + semantic search.
+        
+        With ``categories`` only those categories' partitions are searched.
+        ``score_threshold`` is a minimum vector relevance (0-1); keyword
+        ranking can then only re-order chunks that pass it.
+        """
         try:
             if not self.vector_store:
                 return []
             
-            # Perform semantic search
-            docs = self.vector_store.similarity_search(query, k=k)
+            category_set = set(categories) if categories else None
+            if not settings.HYBRID_SEARCH_ENABLED:
+                self.search_stats['vector_only'] += 1
+                vector_hits = await self._vector_search(query, k, category_set, score_threshold)
+                chunk_ids = [doc_id for doc_id, _ in vector_hits]
+            else:
+                with tracing.span("keyword_search"):
+                    keyword_hits = self.keyword_index.search(
+                        query, settings.HYBRID_CANDIDATES, category_set
+                    )
+                if score_threshold is None and self._is_strong_keyword_match(
+                    query, keyword_hits, category_set
+                ):
+                    # Clear lexical winner: skip the embedding round trip
+                    self.search_stats['keyword_fast_path'] += 1
+                    chunk_ids = [doc_id for doc_id, _ in keyword_hits[:k]]
+                else:
+                    self.search_stats['hybrid'] += 1
+                    vector_hits = await self._vector_search(
+                        query, settings.HYBRID_CANDIDATES, category_set, score_threshold
+                    )
+                    vector_ids = [doc_id for doc_id, _ in vector_hits]
+                    keyword_ids = [doc_id for doc_id, _ in keyword_hits]
+                    if score_threshold is not None:
+                        passed = set(vector_ids)
+                        keyword_ids = [doc_id for doc_id in keyword_ids if doc_id in passed]
+                    fused = reciprocal_rank_fusion(
+                        [vector_ids, keyword_ids], k=settings.HYBRID_RRF_K
+                    )
+                    chunk_ids = [doc_id for doc_id, _ in fused[:k]]
             
             # Extract relevant policies
             relevant_policies = []
-            for doc in docs:
+            for chunk_id in chunk_ids:
+                doc = self.vector_store.docstore.search(chunk_id)
+                if not isinstance(doc, Document):
+                    continue
                 policy_info = {
+                    'policy_id': doc.metadata['policy_id'],
                     'title': doc.metadata['title'],
                     'category': doc.metadata['category'],
                     'content': doc.page_content,
@@ -144,28 +417,456 @@ class PolicyService:
             logger.error(f"Error searching policies: {str(e)}")
             raise
     
+    async def _vector_search(
+        self,
+        query: str,
+        k: int,
+        categories: Optional[Set[str]] = None,
+        score_threshold: Optional[float] = None
+    ) -> List[Tuple[str, float]]:
+        """(chunk ID, relevance) ranked by embedding similarity.
+        
+        A category filter selects partitions up front, so the search only
+        touches the vectors of the requested categories.
+        """
+        if categories is None:
+            stores = [self.vector_store]
+        else:
+            stores = [self.partitions[c] for c in sorted(categories) if c in self.partitions]
+        
+        with tracing.span("embedding"):
+            embedding = await self.embeddings.aembed_query(query)
+        vector = np.array([embedding], dtype=np.float32)
+        hits = []
+        with tracing.span("vector_search"):
+            async with self._index_lock.read():
+                for store in stores:
+                    # Search the index directly: chunk IDs come from the store's position map,
+                    # since not every langchain_community release sets Document.id
+                    distances, positions = await asyncio.to_thread(store.index.search, vector, k)
+                    for distance, position in zip(distances[0], positions[0]):
+                        if position == -1:
+                            continue
+                        # Squared L2 between unit vectors -> cosine similarity
+                        relevance = max(0.0, 1.0 - float(distance) / 2)
+                        if score_threshold is None or relevance >= score_threshold:
+                            hits.append((store.index_to_docstore_id[int(position)], relevance))
+        hits.sort(key=lambda hit: hit[1], reverse=True)
+        return hits[:k]
+    
+    def _is_strong_keyword_match(
+        self,
+        query: str,
+        hits: List[Tuple[str, float]],
+        categories: Optional[Set[str]] = None
+    ) -> bool:
+        """True when the query names exactly one policy's keywords and BM25 agrees by a clear margin"""
+        margin = settings.HYBRID_FAST_PATH_MARGIN
+        if margin <= 0 or not hits:
+            return False
+        top_policy = self.keyword_index.policy_of(hits[0][0])
+        if self.keyword_index.matching_policies(query, categories) != {top_policy}:
+            return False
+        runner_up = next(
+            (score for doc_id, score in hits if self.keyword_index.policy_of(doc_id) != top_policy),
+            0.0
+        )
+        return hits[0][1] >= margin * runner_up
+    
+    def get_search_stats(self) -> Dict[str, Any]:
+        """How often each retrieval path was taken"""
+        return {
+            **self.search_stats,
+            'keyword_index': self.keyword_index.get_stats(),
+            'partitions': {c: store.index.ntotal for c, store in self.partitions.items()}
+        }
+    
+    async def index_report(self, k: int = 10, n_queries: int = 100) -> Dict[str, Any]:
+        """Recall and latency of the global index compared with exact flat search"""
+        if not self.vector_store or not self.vector_store.index.ntotal:
+            return {'vectors': 0}
+        chunks = self._chunks_of(self.vector_store)
+        vectors = await self.embeddings.aembed_documents([d.page_content for _, d in chunks])
+        async with self._index_lock.read():
+            return await asyncio.to_thread(
+                index_factory.recall_report,
+                self.vector_store.index,
+                np.asarray(vectors, dtype=np.float32),
+                k,
+                n_queries
+            )
+    
     async def get_all_policies(self) -> List[Dict[str, Any]]:
         """Get all company policies"""
         return self.policies
     
-    async def _update_vector_store(self):
-        """Update vector store with new policies"""
+    def _get_policy(self, policy_id: str) -> Dict[str, Any]:
+        """Look up a policy by ID"""
+        for policy in self.policies:
+            if policy['id'] == policy_id:
+                return policy
+        raise KeyError(f"Policy not found: {policy_id}")
+    
+    def _fingerprint(self, policies: Optional[List[Dict[str, Any]]] = None) -> str:
+        """Version of a policy set (this process's by default) plus the parameters that shape its index"""
+        return IndexStore.fingerprint(
+            self.policies if policies is None else policies,
+            embedding_model=self.embeddings.model,
+            chunk_size=self.chunk_size,
+            chunk_overlap=self.chunk_overlap,
+            index_type=settings.POLICY_INDEX_TYPE,
+            flat_threshold=settings.POLICY_INDEX_FLAT_THRESHOLD,
+            quantizer=settings.POLICY_INDEX_QUANTIZER,
+            pq_m=settings.POLICY_INDEX_PQ_M,
+            hnsw_m=settings.POLICY_INDEX_HNSW_M
+        )
+    
+    def _ensure_writable_index(self):
+        """Swap a memory-mapped (read-only) index for an in-memory copy"""
+        if self.vector_store is None:
+            return
+        index = self.index_store.reopen_writable(self.vector_store.index)
+        if index is not None:
+            index_factory.configure(index)
+            self.vector_store.index = index
+    
+    async def _persist(self):
+        """Save the policy set and a fresh index snapshot after a change.
+        
+        If another process saved policies since this one last read them, the
+        changes made here are applied on top of the stored set instead of
+        overwriting it.
+        """
+        lock = await asyncio.to_thread(self.index_store.acquire_lock)
+        try:
+            if await asyncio.to_thread(self.index_store.policies_version) != self._stored_version:
+                stored = await asyncio.to_thread(self.index_store.load_policies) or []
+                logger.info("Policies were changed by another process, merging before saving")
+                await self._apply_policy_set(self._merge_into(stored))
+            fingerprint = self._fingerprint()
+            await asyncio.to_thread(self._save_snapshot, fingerprint)
+        finally:
+            await asyncio.to_thread(self.index_store.release_lock, lock)
+        self.corpus_version = fingerprint
+    
+    def _merge_into(self, stored: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """The stored policy set with the adds, edits and deletes made here since the last sync.
+        
+        When both processes edited a policy the later save wins; a policy
+        deleted elsewhere stays deleted.
+        """
+        merged = {p['id']: p for p in stored}
+        current = {p['id']: p for p in self.policies}
+        for policy_id in self._synced_policies.keys() - current.keys():
+            merged.pop(policy_id, None)
+        for policy_id, policy in current.items():
+            synced = self._synced_policies.get(policy_id)
+            if synced == policy or (synced is not None and policy_id not in merged):
+                continue
+            merged[policy_id] = policy
+        return list(merged.values())
+    
+    def _save_snapshot(self, fingerprint: str):
+        self.index_store.save_policies(self.policies)
+        if self.vector_store is not None:
+            self.index_store.save(self.vector_store, self.chunk_ids, fingerprint)
+        # Our own write must not look like another process's change
+        self._mark_synced(self.index_store.policies_version())
+    
+    def _mark_synced(self, version: Optional[Tuple[int, int, int]]):
+        """Remember the stored policy set as matching this process's"""
+        self._stored_version = version
+        self._synced_policies = {p['id']: dict(p) for p in self.policies}
+    
+    def _build_documents(
+        self,
+        policy: Dict[str, Any],
+        chunks: Optional[List[str]] = None
+    ) -> Tuple[List[str], List[Document]]:
+        """Split a policy (unless already split) into chunk documents with content-addressed IDs"""
+        if chunks is None:
+            chunks = self.text_splitter.split_text(policy['content'])
+        ids = []
+        documents = []
+        for chunk in chunks:
+            # The ID only changes when the chunk text changes, so unchanged
+            # chunks keep their vectors across updates
+            chunk_hash = hashlib.sha256(chunk.encode('utf-8')).hexdigest()[:16]
+            chunk_id = f"{policy['id']}:{chunk_hash}"
+            if chunk_id in ids:
+                continue
+            ids.append(chunk_id)
+            documents.append(Document(
+                id=chunk_id,
+                page_content=chunk,
+                metadata={
+                    'policy_id': policy['id'],
+                    'title': policy['title'],
+                    'category': policy['category'],
+                    'keywords': policy['keywords']
+                }
+            ))
+        return ids, documents
+    
+    def _rebuild_keyword_index(self):
+        """Index every policy chunk for keyword search"""
+        self.keyword_index.clear()
+        for policy in self.policies:
+            self._index_keywords(*self._build_documents(policy))
+    
+    def _index_keywords(self, ids: List[str], documents: List[Document]):
+        for chunk_id, doc in zip(ids, documents):
+            self.keyword_index.add(
+                chunk_id, doc.page_content, doc.metadata['keywords'],
+                doc.metadata['policy_id'], doc.metadata['category']
+            )
+    
+    async def _rebuild_partitions(self):
+        """Build one vector store per category.
+        
+        Vectors come from the embedding cache, so this costs no API calls
+        once the global index has been built or loaded.
+        """
+        grouped: Dict[str, List[Tuple[str, Document]]] = {}
+        for policy in self.policies:
+            ids, docs = self._build_documents(policy)
+            grouped.setdefault(policy['category'], []).extend(zip(ids, docs))
+        
+        # Built aside and swapped in, so searches during a reload see complete partitions
+        partitions = {}
+        for category, chunks in grouped.items():
+            store = await self._build_store(chunks)
+            if store is not None:
+                partitions[category] = store
+        self.partitions = partitions
+    
+    async def _rebuild_vector_store(self):
+        """Build the vector store from scratch for all policies"""
         try:
-            documents = []
+            chunks = []
+            self.chunk_ids = {}
             for policy in self.policies:
-                chunks = self.text_splitter.split_text(policy['content'])
-                for chunk in chunks:
-                    documents.append(Document(
-                        page_content=chunk,
-                        metadata={
-                            'title': policy['title'],
-                            'category': policy['category'],
-                            'keywords': policy['keywords']
-                        }
-                    ))
-            
-            self.vector_store = FAISS.from_documents(documents, self.embeddings)
+                ids, docs = self._build_documents(policy)
+                self.chunk_ids[policy['id']] = ids
+                chunks.extend(zip(ids, docs))
+            
+            self.vector_store = await self._build_store(chunks)
+            
+        except Exception as e:
+            logger.error(f"Error rebuilding vector store: {str(e)}")
+            raise
+    
+    async def _sync_policy_vectors(self, policy: Dict[str, Any]):
+        """Bring a single policy's vectors in line with its current content"""
+        try:
+            new_ids, documents = self._build_documents(policy)
+            old_ids = self.chunk_ids.get(policy['id'], [])
+            previous = next((p for p in self.policies if p['id'] == policy['id']), None)
+            old_category = previous['category'] if previous else None
+            
+            stale_ids = [i for i in old_ids if i not in new_ids]
+            fresh = [(i, d) for i, d in zip(new_ids, documents) if i not in old_ids]
+            kept = [(i, d) for i, d in zip(new_ids, documents) if i in old_ids]
+            
+            self._ensure_writable_index()
+            self.vector_store = await self._apply_changes(self.vector_store, stale_ids, fresh, kept)
+            
+            # Mirror the change in the category partition, moving chunks if the category changed
+            if old_category == policy['category']:
+                await self._update_partition(policy['category'], stale_ids, fresh, kept)
+            else:
+                if old_category is not None:
+                    await self._update_partition(old_category, old_ids, [], [])
+                await self._update_partition(policy['category'], [], list(zip(new_ids, documents)), [])
+            
+            self.chunk_ids[policy['id']] = new_ids
+            self.keyword_index.remove(old_ids)
+            self._index_keywords(new_ids, documents)
+            logger.info(
+                f"Synced policy {policy['id']}: {len(fresh)} embedded, "
+                f"{len(stale_ids)} removed, {len(kept)} unchanged"
+            )
             
         except Exception as e:
             logger.error(f"Error updating vector store: {str(e)}")
             raise
+    
+    async def _remove_policy_vectors(self, policy: Dict[str, Any]):
+        """Drop a policy's chunks from every index"""
+        stale_ids = self.chunk_ids.pop(policy['id'], [])
+        if stale_ids and self.vector_store:
+            self._ensure_writable_index()
+            self.vector_store = await self._apply_changes(self.vector_store, stale_ids, [], [])
+        await self._update_partition(policy['category'], stale_ids, [], [])
+        self.keyword_index.remove(stale_ids)
+    
+    async def _apply_policy_set(self, policies: List[Dict[str, Any]]):
+        """Bring the indexes in line with a policy set, touching only policies that differ.
+        
+        Policies another process added were embedded by it, so their vectors
+        come from the shared embedding cache.
+        """
+        current = {p['id']: p for p in self.policies}
+        target = {p['id']: p for p in policies}
+        for policy_id in current.keys() - target.keys():
+            await self._remove_policy_vectors(current[policy_id])
+        for policy in policies:
+            if policy['id'] in current and current[policy['id']] != policy:
+                await self._sync_policy_vectors(policy)
+        
+        batch = [(p, *self._build_documents(p)) for p in policies if p['id'] not in current]
+        texts = [d.page_content for _, _, docs in batch for d in docs]
+        if texts:
+            vectors = await self.embeddings.aembed_documents(texts)
+            await self._index_batch(batch, vectors)
+            await self._retrain_stores()
+        self.policies = list(policies)
+    
+    async def _apply_changes(
+        self,
+        store: Optional[FAISS],
+        stale_ids: List[str],
+        fresh: List[Tuple[str, Document]],
+        kept: List[Tuple[str, Document]]
+    ) -> Optional[FAISS]:
+        """Delete, add and refresh chunks in one vector store, creating it if needed"""
+        if store is None:
+            return await self._build_store(fresh)
+        
+        if stale_ids and not index_factory.supports_remove(store.index):
+            # IVF/HNSW cannot drop vectors in place; rebuild from cached embeddings
+            stale = set(stale_ids)
+            refreshed = dict(kept)
+            chunks = [
+                (i, refreshed.get(i, d)) for i, d in self._chunks_of(store) if i not in stale
+            ] + fresh
+            # Reuse the trained index unless the new size calls for another structure
+            like = None if index_factory.needs_rebuild(store.index, len(chunks)) else store.index
+            return await self._build_store(chunks, like=like)
+        
+        # Embed before taking the write lock so searches only wait for the index edit itself
+        vectors = await self.embeddings.aembed_documents([d.page_content for _, d in fresh]) if fresh else []
+        async with self._index_lock.write():
+            if stale_ids:
+                store.delete(stale_ids)
+            if fresh:
+                await asyncio.to_thread(
+                    store.add_embeddings,
+                    [(d.page_content, v) for (_, d), v in zip(fresh, vectors)],
+                    metadatas=[d.metadata for _, d in fresh],
+                    ids=[i for i, _ in fresh]
+                )
+        if kept:
+            # Unchanged text keeps its vector; only refresh the metadata
+            kept_ids = [i for i, _ in kept]
+            store.docstore.delete(kept_ids)
+            store.docstore.add(dict(kept))
+        
+        if store.index.ntotal and index_factory.needs_rebuild(store.index):
+            # The corpus outgrew (or shrank below) the current index structure
+            return await self._build_store(self._chunks_of(store))
+        return store
+    
+    async def _index_batch(
+        self,
+        batch: List[Tuple[Dict[str, Any], List[str], List[Document]]],
+        vectors: List[List[float]]
+    ):
+        """Add a batch of whole policies with precomputed vectors to every index"""
+        chunks = [(i, d) for _, ids, docs in batch for i, d in zip(ids, docs)]
+        self._ensure_writable_index()
+        self.vector_store = await self._add_vectors(self.vector_store, chunks, vectors)
+        
+        by_category: Dict[str, Tuple[list, list]] = {}
+        for chunk, vector in zip(chunks, vectors):
+            bucket = by_category.setdefault(chunk[1].metadata['category'], ([], []))
+            bucket[0].append(chunk)
+            bucket[1].append(vector)
+        for category, (category_chunks, category_vectors) in by_category.items():
+            self.partitions[category] = await self._add_vectors(
+                self.partitions.get(category), category_chunks, category_vectors
+            )
+        
+        for policy, ids, docs in batch:
+            self.chunk_ids[policy['id']] = ids
+            self._index_keywords(ids, docs)
+            self.policies.append(policy)
+    
+    async def _add_vectors(
+        self,
+        store: Optional[FAISS],
+        chunks: List[Tuple[str, Document]],
+        vectors: List[List[float]]
+    ) -> FAISS:
+        """Append already-embedded chunks to a store, creating it if needed"""
+        if store is None:
+            index = await asyncio.to_thread(
+                index_factory.build_index, np.asarray(vectors, dtype=np.float32)
+            )
+            store = FAISS(self.embeddings, index, InMemoryDocstore(), {})
+        async with self._index_lock.write():
+            await asyncio.to_thread(
+                store.add_embeddings,
+                [(d.page_content, v) for (_, d), v in zip(chunks, vectors)],
+                metadatas=[d.metadata for _, d in chunks],
+                ids=[i for i, _ in chunks]
+            )
+        return store
+    
+    async def _retrain_stores(self):
+        """Rebuild any store whose size now calls for a different index structure"""
+        if self.vector_store is not None and index_factory.needs_rebuild(self.vector_store.index):
+            self.vector_store = await self._build_store(self._chunks_of(self.vector_store))
+        for category, store in list(self.partitions.items()):
+            if index_factory.needs_rebuild(store.index):
+                self.partitions[category] = await self._build_store(self._chunks_of(store))
+    
+    async def _build_store(
+        self,
+        chunks: List[Tuple[str, Document]],
+        like: Optional[faiss.Index] = None
+    ) -> Optional[FAISS]:
+        """Build a vector store with an index type chosen (and trained) for its size.
+        
+        With ``like`` the new index is an empty copy of that trained index,
+        so rebuilding after a delete skips training.
+        """
+        if not chunks:
+            return None
+        texts = [d.page_content for _, d in chunks]
+        vectors = await self.embeddings.aembed_documents(texts)
+        if like is not None:
+            index = index_factory.empty_like(like)
+        else:
+            matrix = np.asarray(vectors, dtype=np.float32)
+            index = await asyncio.to_thread(index_factory.build_index, matrix)
+        
+        store = FAISS(self.embeddings, index, InMemoryDocstore(), {})
+        await asyncio.to_thread(
+            store.add_embeddings,
+            list(zip(texts, vectors)),
+            metadatas=[d.metadata for _, d in chunks],
+            ids=[i for i, _ in chunks]
+        )
+        return store
+    
+    @staticmethod
+    def _chunks_of(store: FAISS) -> List[Tuple[str, Document]]:
+        """A store's chunks in index position order"""
+        return [
+            (doc_id, store.docstore.search(doc_id))
+            for _, doc_id in sorted(store.index_to_docstore_id.items())
+        ]
+    
+    async def _update_partition(
+        self,
+        category: str,
+        stale_ids: List[str],
+        fresh: List[Tuple[str, Document]],
+        kept: List[Tuple[str, Document]]
+    ):
+        store = await self._apply_changes(self.partitions.get(category), stale_ids, fresh, kept)
+        if store is None or store.index.ntotal == 0:
+            self.partitions.pop(category, None)
+        else:
+            self.partitions[category] = store
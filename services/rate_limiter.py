@@ -0,0 +1,47 @@
+import asyncio
+import time
+from typing import Dict, Any
+
+class TokenBucket:
+    """Async token bucket: sustained `rate` tokens per second with bursts up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+        self.acquired = 0
+        self.throttled = 0
+        self.wait_seconds = 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens: float = 1.0):
+        """Wait until `tokens` are available and take them"""
+        # The lock keeps waiters in FIFO order so nobody starves
+        async with self._lock:
+            self._refill()
+            if self._tokens < tokens:
+                wait = (tokens - self._tokens) / self.rate
+                self.throttled += 1
+                self.wait_seconds += wait
+                await asyncio.sleep(wait)
+                self._refill()
+            self._tokens -= tokens
+            self.acquired += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        # Read-only: metrics call this from another thread, so it must not race acquire()
+        available = min(self.capacity, self._tokens + (time.monotonic() - self._updated) * self.rate)
+        return {
+            'rate_per_second': self.rate,
+            'capacity': self.capacity,
+            'available': round(available, 2),
+            'acquired': self.acquired,
+            'throttled': self.throttled,
+            'wait_seconds': round(self.wait_seconds, 3)
+        }
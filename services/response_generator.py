@@ -1,27 +1,43 @@
 import asyncio
-from typing import Dict, List, Any
+import time
+from typing import Dict, List, Any, Optional, AsyncIterator, Tuple
 import logging
 
+import httpx
+
 # Updated imports for LangChain v0.3
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.messages import HumanMessage, SystemMessage
 
+from services.backends import create_chat_model
 from services.policy_service import PolicyService
 from services.cache_service import CacheService
+from services.cache_keys import response_cache_key
+from services.semantic_cache import SemanticCache
+from services.rate_limiter import TokenBucket
+from services.single_flight import SingleFlight
+from services.template_service import TemplateService
+from services import tracing
 from config.settings import settings
 
 logger = logging.getLogger(__name__)
 
 class ResponseGenerator:
-    def __init__(self):
-        self.llm = ChatOpenAI(
-            model_name=settings.OPENAI_MODEL,
-            openai_api_key=settings.OPENAI_API_KEY,
-            temperature=0.7
-        )
-        self.policy_service = PolicyService()
-        self.cache_service = CacheService()
+    def __init__(
+        self,
+        policy_service: PolicyService,
+        cache_service: CacheService,
+        template_service: TemplateService,
+        http_client: Optional[httpx.Client] = None,
+        http_async_client: Optional[httpx.AsyncClient] = None
+    ):
+        self.llm = create_chat_model(http_client, http_async_client)
+        # Shared, already-initialized services injected by the container
+        self.policy_service = policy_service
+        self.cache_service = cache_service
+        self.template_service = template_service
+        self.semantic_cache = SemanticCache(self.policy_service.embeddings)
+        self.single_flight = SingleFlight()
+        self.coalesce_stats = {'remote_waits': 0, 'remote_hits': 0}
         
         self.system_prompt = """
         You are an intelligent email response assistant for a company. 
@@ -35,82 +51,395 @@ class ResponseGenerator:
         4. Keep responses concise but complete
         5. Include next steps when appropriate
         """
+        
+        # Compiled once. The system prompt and the policy context come first so
+        # emails answered from the same policies share an identical prompt
+        # prefix, which the provider can serve from its prompt cache; only the
+        # trailing human message varies per email.
+        self.prompt = ChatPromptTemplate.from_messages([
+            ("system", "{system_prompt}{policy_context}"),
+            ("human", (
+                "Email Subject: {subject}\n"
+                "Email Body: {body}\n"
+                "Priority: {priority}\n\n"
+                "Please generate a professional email response based on the above information."
+            ))
+        ])
+        self.chain = self.prompt | self.llm
+        self.usage_stats = {'llm_calls': 0, 'input_tokens': 0, 'cached_input_tokens': 0, 'output_tokens': 0}
     
     async def generate_response(
         self, 
         subject: str, 
         body: str, 
         priority: str = "normal",
-        use_cache: bool = True
+        use_cache: bool = True,
+        rate_limiter: Optional[TokenBucket] = None
     ) -> Dict[str, Any]:
-        """Generate intelligent email response"""
+        """Generate intelligent email response.
+        
+        ``rate_limiter`` is drawn on just before the LLM is called, so replies
+        served from a cache or a template do not use up its tokens.
+        """
         try:
-            # Check cache first
-            cache_key = f"response_{hash(subject + body)}"
+            with tracing.span("generate"):
+                # Check cache first
+                cache_key = self._cache_key(subject, body, priority)
+                if not use_cache:
+                    return await self._generate(
+                        cache_key, subject, body, priority, use_cache=False, rate_limiter=rate_limiter
+                    )
+                
+                cached_response = await self.cache_service.get(cache_key)
+                if cached_response:
+                    return {**cached_response, 'cache': 'exact'}
+                if not settings.COALESCE_ENABLED:
+                    return await self._generate(
+                        cache_key, subject, body, priority, use_cache=True, rate_limiter=rate_limiter
+                    )
+                
+                # Identical inquiries in flight at the same time share one generation
+                result, coalesced = await self.single_flight.do(
+                    cache_key,
+                    lambda: self._generate_once(cache_key, subject, body, priority, rate_limiter)
+                )
+                if coalesced:
+                    # Tokens were spent (and reported) by the call that did the work
+                    return {**{k: v for k, v in result.items() if k != 'usage'}, 'cache': 'coalesced'}
+                return result
+            
+        except Exception as e:
+            logger.error(f"Error generating response: {str(e)}")
+            raise
+    
+    async def _generate_once(
+        self,
+        cache_key: str,
+        subject: str,
+        body: str,
+        priority: str,
+        rate_limiter: Optional[TokenBucket] = None
+    ) -> Dict[str, Any]:
+        """Generate under a short Redis lock so only one worker process does the work.
+        
+        A process that finds the lock taken waits for it to be released and
+        then reads the reply the holder cached. If the holder failed (nothing
+        was cached) it generates the reply itself.
+        """
+        token = await self.cache_service.acquire_lock(cache_key, settings.COALESCE_LOCK_TTL)
+        if token is None:
+            self.coalesce_stats['remote_waits'] += 1
+            with tracing.span("coalesce_wait"):
+                while await self.cache_service.is_locked(cache_key):
+                    await asyncio.sleep(settings.COALESCE_POLL_INTERVAL)
+            # get_many reads through, even when a batch has already looked this key up
+            cached_response = (await self.cache_service.get_many([cache_key])).get(cache_key)
+            if cached_response:
+                self.coalesce_stats['remote_hits'] += 1
+                return {**cached_response, 'cache': 'coalesced'}
+            return await self._generate(
+                cache_key, subject, body, priority, use_cache=True, rate_limiter=rate_limiter
+            )
+        
+        try:
+            return await self._generate(
+                cache_key, subject, body, priority, use_cache=True, rate_limiter=rate_limiter
+            )
+        finally:
+            await self.cache_service.release_lock(cache_key, token)
+    
+    async def _generate(
+        self,
+        cache_key: str,
+        subject: str,
+        body: str,
+        priority: str,
+        use_cache: bool,
+        rate_limiter: Optional[TokenBucket] = None
+    ) -> Dict[str, Any]:
+        """Templates, retrieval, semantic cache and the LLM, for a reply not in the exact cache"""
+        # A confident intent match is answered from its template, skipping retrieval and the LLM
+        query = f"{subject} {body}"
+        template_result = await self._template_lookup(query, subject, priority)
+        if template_result:
+            return template_result
+        
+        # Search for relevant policies
+        with tracing.span("retrieval"):
+            relevant_policies = await self.policy_service.search_policies(query)
+        policy_ids = sorted({p['policy_id'] for p in relevant_policies})
+        
+        # A near-duplicate inquiry answered from the same policies can reuse its reply.
+        # After hybrid retrieval the query embedding is an embedding-cache hit; after the
+        # keyword fast path it costs one embedding call, still far cheaper than the LLM call
+        # a hit saves.
+        if use_cache:
+            semantic_result = await self._semantic_lookup(cache_key, query, policy_ids, priority)
+            if semantic_result:
+                return semantic_result
+        
+        # Generate response using LLM
+        response, usage = await self._generate_llm_response(
+            subject, body, relevant_policies, priority, rate_limiter
+        )
+        
+        result = {
+            'response': response,
+            'policies_used': [p['title'] for p in relevant_policies],
+            'priority': priority,
+            'source': 'llm'
+        }
+        
+        # Cache the response
+        if use_cache:
+            await self._remember(cache_key, query, result, policy_ids, priority)
+        
+        return {**result, 'cache': 'miss', 'usage': usage}
+    
+    async def stream_response(
+        self,
+        subject: str,
+        body: str,
+        priority: str = "normal",
+        use_cache: bool = True
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Generate a response as a stream of events.
+        
+        Yields ``policies`` (citations) first, then ``token`` events as the
+        model produces text, then ``done`` with the full result. Cache hits
+        produce the same sequence with the cached text as a single token.
+        """
+        try:
+            cache_key = self._cache_key(subject, body, priority)
             if use_cache:
                 cached_response = await self.cache_service.get(cache_key)
                 if cached_response:
-                    return cached_response
+                    yield {'event': 'policies', 'data': {
+                        'policies': [{'title': title} for title in dict.fromkeys(cached_response['policies_used'])]
+                    }}
+                    yield {'event': 'token', 'data': {'text': cached_response['response']}}
+                    yield {'event': 'done', 'data': {**cached_response, 'cache': 'exact'}}
+                    return
             
-            # Search for relevant policies
             query = f"{subject} {body}"
-            relevant_policies = await self.policy_service.search_policies(query)
+            template_result = await self._template_lookup(query, subject, priority)
+            if template_result:
+                yield {'event': 'policies', 'data': {
+                    'policies': [{'title': title} for title in template_result['policies_used']]
+                }}
+                yield {'event': 'token', 'data': {'text': template_result['response']}}
+                yield {'event': 'done', 'data': template_result}
+                return
             
-            # Generate response using LLM
-            response = await self._generate_llm_response(
-                subject, body, relevant_policies, priority
-            )
+            with tracing.span("retrieval"):
+                relevant_policies = await self.policy_service.search_policies(query)
+            policy_ids = sorted({p['policy_id'] for p in relevant_policies})
+            yield {'event': 'policies', 'data': {'policies': self._citations(relevant_policies)}}
+            
+            if use_cache:
+                semantic_result = await self._semantic_lookup(cache_key, query, policy_ids, priority)
+                if semantic_result:
+                    yield {'event': 'token', 'data': {'text': semantic_result['response']}}
+                    yield {'event': 'done', 'data': semantic_result}
+                    return
+            
+            parts = []
+            usage = None
+            started = time.perf_counter()
+            # The span includes time the client takes to read the tokens
+            with tracing.span("llm_stream"):
+                async for chunk in self.chain.astream(
+                    self._prompt_inputs(subject, body, relevant_policies, priority)
+                ):
+                    if chunk.content:
+                        if not parts:
+                            tracing.record("llm_first_token", time.perf_counter() - started)
+                        parts.append(chunk.content)
+                        yield {'event': 'token', 'data': {'text': chunk.content}}
+                    if chunk.usage_metadata:
+                        usage = chunk.usage_metadata
+            usage = self._record_usage(usage)
             
             result = {
-                'response': response,
+                'response': "".join(parts).strip(),
                 'policies_used': [p['title'] for p in relevant_policies],
-                'priority': priority
+                'priority': priority,
+                'source': 'llm'
             }
-            
-            # Cache the response
             if use_cache:
-                await self.cache_service.set(cache_key, result)
+                await self._remember(cache_key, query, result, policy_ids, priority)
             
-            return result
+            yield {'event': 'done', 'data': {**result, 'cache': 'miss', 'usage': usage}}
             
         except Exception as e:
-            logger.error(f"Error generating response: {str(e)}")
+            logger.error(f"Error streaming response: {str(e)}")
             raise
     
+    def cache_scope(self, emails: List[Dict[str, Any]]):
+        """Batch the response-cache traffic for these emails: one read now, one write on exit"""
+        return self.cache_service.batch(
+            self._cache_key(e['subject'], e['body'], e.get('priority') or 'normal')
+            for e in emails
+        )
+    
+    def _cache_key(self, subject: str, body: str, priority: str) -> str:
+        return response_cache_key(
+            subject, body, priority,
+            model=settings.OPENAI_MODEL,
+            corpus_version=self.policy_service.corpus_version
+        )
+    
+    async def _template_lookup(
+        self,
+        query: str,
+        subject: str,
+        priority: str
+    ) -> Optional[Dict[str, Any]]:
+        """Fill in the template whose intent confidently matches the inquiry, if any.
+        
+        Only inquiries worded like a template example are embedded here. The
+        query string is the one retrieval embeds, so such a miss leaves its
+        embedding cached for the policy search that follows.
+        """
+        with tracing.span("template_match"):
+            match = await self.template_service.match(query)
+        if not match:
+            return None
+        template = match['template']
+        linked = set(template.get('policy_ids') or [])
+        policies = await self.policy_service.get_all_policies()
+        return {
+            'response': self.template_service.render(template, subject, priority),
+            'policies_used': [p['title'] for p in policies if p['id'] in linked],
+            'priority': priority,
+            'source': 'template',
+            'template_id': template['id'],
+            'confidence': round(match['confidence'], 4),
+            'cache': 'miss'
+        }
+    
+    async def _semantic_lookup(
+        self,
+        cache_key: str,
+        query: str,
+        policy_ids: List[str],
+        priority: str
+    ) -> Optional[Dict[str, Any]]:
+        """Return a reply cached for a near-duplicate inquiry, promoting it to the exact key"""
+        if not settings.SEMANTIC_CACHE_ENABLED:
+            return None
+        with tracing.span("semantic_cache"):
+            match = await self.semantic_cache.lookup(
+                query, policy_ids, priority, self.policy_service.corpus_version
+            )
+        if not match:
+            return None
+        result, similarity = match
+        await self.cache_service.set(cache_key, result)
+        return {**result, 'cache': 'semantic', 'similarity': round(similarity, 4)}
+    
+    async def _remember(
+        self,
+        cache_key: str,
+        query: str,
+        result: Dict[str, Any],
+        policy_ids: List[str],
+        priority: str
+    ):
+        """Store a freshly generated reply in the exact and semantic caches"""
+        await self.cache_service.set(cache_key, result)
+        if settings.SEMANTIC_CACHE_ENABLED:
+            await self.semantic_cache.add(
+                query, result, policy_ids, priority, self.policy_service.corpus_version
+            )
+    
+    @staticmethod
+    def _citations(policies: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """One citation per policy, in retrieval order"""
+        citations = {}
+        for policy in policies:
+            citations.setdefault(policy['policy_id'], {
+                'policy_id': policy['policy_id'],
+                'title': policy['title'],
+                'category': policy['category']
+            })
+        return list(citations.values())
+    
+    def _prompt_inputs(
+        self,
+        subject: str,
+        body: str,
+        policies: List[Dict[str, Any]],
+        priority: str
+    ) -> Dict[str, str]:
+        """Fill the compiled prompt for one email"""
+        # Policies are listed in a fixed order (not retrieval rank) so the same
+        # set of policies always renders the same prefix
+        policy_context = ""
+        if policies:
+            ordered = sorted(policies, key=lambda p: (p['policy_id'], p['content']))
+            policy_context = "\n\nRelevant Company Policies:\n"
+            for policy in ordered:
+                policy_context += f"- {policy['title']}: {policy['content']}\n"
+        
+        return {
+            'system_prompt': self.system_prompt,
+            'policy_context': policy_context,
+            'subject': subject,
+            'body': body,
+            'priority': priority
+        }
+    
+    def _record_usage(self, usage_metadata: Optional[Dict[str, Any]]) -> Optional[Dict[str, int]]:
+        """Summarize one call's token usage and add it to the running totals"""
+        self.usage_stats['llm_calls'] += 1
+        if not usage_metadata:
+            return None
+        usage = {
+            'input_tokens': usage_metadata.get('input_tokens', 0),
+            'cached_input_tokens': (usage_metadata.get('input_token_details') or {}).get('cache_read', 0) or 0,
+            'output_tokens': usage_metadata.get('output_tokens', 0)
+        }
+        for name, value in usage.items():
+            self.usage_stats[name] += value
+        return usage
+    
+    def get_usage_stats(self) -> Dict[str, Any]:
+        """Token totals and the share of input tokens served from the prompt cache"""
+        input_tokens = self.usage_stats['input_tokens']
+        return {
+            **self.usage_stats,
+            'prompt_cache_hit_ratio': round(
+                self.usage_stats['cached_input_tokens'] / input_tokens, 4
+            ) if input_tokens else 0.0
+        }
+    
+    def get_coalescing_stats(self) -> Dict[str, Any]:
+        """Generations shared within this process and across workers"""
+        return {**self.single_flight.get_stats(), **self.coalesce_stats}
+    
     async def _generate_llm_response(
         self, 
         subject: str, 
         body: str, 
         policies: List[Dict[str, Any]], 
-        priority: str
-    ) -> str:
-        """Generate response using language model"""
+        priority: str,
+        rate_limiter: Optional[TokenBucket] = None
+    ) -> Tuple[str, Optional[Dict[str, int]]]:
+        """Generate response using language model, returning the text and its token usage"""
         try:
-            # Prepare context from policies
-            policy_context = ""
-            if policies:
-                policy_context = "\n\nRelevant Company Policies:\n"
-                for policy in policies:
-                    policy_context += f"- {policy['title']}: {policy['content']}\n"
-            
-            # Create prompt
-            prompt = ChatPromptTemplate.from_messages([
-                SystemMessage(content=self.system_prompt),
-                HumanMessage(content=f"""
-                Email Subject: {subject}
-                Email Body: {body}
-                Priority: {priority}
-                {policy_context}
-                
-                Please generate a professional email response based on the above information.
-                """)
-            ])
+            if rate_limiter is not None:
+                with tracing.span("llm_rate_limit"):
+                    await rate_limiter.acquire()
             
             # Generate response
-            chain = prompt | self.llm
-            response = await chain.ainvoke({})
+            with tracing.span("llm"):
+                response = await self.chain.ainvoke(
+                    self._prompt_inputs(subject, body, policies, priority)
+                )
+            usage = self._record_usage(response.usage_metadata)
             
-            return response.content.strip()
+            return response.content.strip(), usage
             
         except Exception as e:
             logger.error(f"Error in LLM response generation: {str(e)}")
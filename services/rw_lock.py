@@ -0,0 +1,34 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+class ReadWriteLock:
+    """asyncio lock that admits many readers or a single writer.
+
+    A writer waits for the readers already inside to leave, and readers
+    arriving after it queue behind it, so a steady stream of searches
+    cannot starve an update.
+    """
+
+    def __init__(self):
+        self._writer = asyncio.Lock()
+        self._readers = 0
+        self._no_readers = asyncio.Event()
+        self._no_readers.set()
+
+    @asynccontextmanager
+    async def read(self):
+        async with self._writer:
+            self._readers += 1
+            self._no_readers.clear()
+        try:
+            yield
+        finally:
+            self._readers -= 1
+            if not self._readers:
+                self._no_readers.set()
+
+    @asynccontextmanager
+    async def write(self):
+        async with self._writer:
+            await self._no_readers.wait()
+            yield
@@ -0,0 +1,134 @@
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+import logging
+
+import faiss
+import numpy as np
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+class SemanticCache:
+    """Reuse replies for near-duplicate inquiries.
+
+    Past inquiries are embedded into a small inner-product FAISS index over
+    unit vectors (cosine similarity). A stored reply is returned only when
+    the similarity clears the threshold *and* the new inquiry retrieved the
+    same set of policies, so a reply is never reused against different
+    policy context. Oldest entries are evicted first. Index searches and
+    updates run in worker threads, one at a time.
+    """
+
+    def __init__(
+        self,
+        embeddings,
+        threshold: Optional[float] = None,
+        max_entries: Optional[int] = None
+    ):
+        self.embeddings = embeddings
+        self.threshold = threshold or settings.SEMANTIC_CACHE_THRESHOLD
+        self.max_entries = max_entries or settings.SEMANTIC_CACHE_MAX_ENTRIES
+        self.index = None
+        self.entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._next_id = 0
+        # FAISS cannot search an index while it is being written
+        self._index_lock = threading.Lock()
+        self.corpus_version: Optional[str] = None
+        self.stats = {'hits': 0, 'misses': 0, 'policy_mismatches': 0}
+
+    async def lookup(
+        self,
+        text: str,
+        policy_ids: List[str],
+        priority: str,
+        corpus_version: Optional[str]
+    ) -> Optional[Tuple[Dict[str, Any], float]]:
+        """Return (cached result, similarity) for a close enough inquiry, else None"""
+        self._check_version(corpus_version)
+        index = self.index
+        if index is None or index.ntotal == 0:
+            self.stats['misses'] += 1
+            return None
+
+        vector = await self._embed(text)
+        scores, ids = await asyncio.to_thread(self._search, index, vector)
+        wanted = frozenset(policy_ids)
+        for score, entry_id in zip(scores[0], ids[0]):
+            if entry_id < 0 or score < self.threshold:
+                break
+            entry = self.entries.get(int(entry_id))
+            if entry is None:
+                continue
+            if entry['policy_ids'] == wanted and entry['priority'] == priority:
+                self.stats['hits'] += 1
+                return entry['result'], float(score)
+            self.stats['policy_mismatches'] += 1
+
+        self.stats['misses'] += 1
+        return None
+
+    async def add(
+        self,
+        text: str,
+        result: Dict[str, Any],
+        policy_ids: List[str],
+        priority: str,
+        corpus_version: Optional[str]
+    ):
+        """Remember the reply generated for an inquiry"""
+        self._check_version(corpus_version)
+        vector = await self._embed(text)
+        if self.index is None:
+            self.index = faiss.IndexIDMap2(faiss.IndexFlatIP(vector.shape[1]))
+
+        entry_id = self._next_id
+        self._next_id += 1
+        self.entries[entry_id] = {
+            'result': result,
+            'policy_ids': frozenset(policy_ids),
+            'priority': priority
+        }
+        evicted = []
+        while len(self.entries) > self.max_entries:
+            oldest_id, _ = self.entries.popitem(last=False)
+            evicted.append(oldest_id)
+        await asyncio.to_thread(self._update, self.index, vector, entry_id, evicted)
+
+    def _search(self, index, vector: np.ndarray):
+        with self._index_lock:
+            return index.search(vector, min(4, index.ntotal))
+
+    def _update(self, index, vector: np.ndarray, entry_id: int, evicted: List[int]):
+        with self._index_lock:
+            index.add_with_ids(vector, np.array([entry_id], dtype=np.int64))
+            if evicted:
+                index.remove_ids(np.array(evicted, dtype=np.int64))
+
+    def clear(self):
+        self.index = None
+        self.entries.clear()
+
+    def _check_version(self, corpus_version: Optional[str]):
+        """Drop every entry once the policy corpus changes"""
+        if corpus_version != self.corpus_version:
+            if self.entries:
+                logger.info("Policy corpus changed, clearing semantic cache")
+            self.clear()
+            self.corpus_version = corpus_version
+
+    async def _embed(self, text: str) -> np.ndarray:
+        vector = np.asarray([await self.embeddings.aembed_query(text)], dtype=np.float32)
+        faiss.normalize_L2(vector)
+        return vector
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.stats['hits'] + self.stats['misses']
+        return {
+            **self.stats,
+            'hit_ratio': round(self.stats['hits'] / lookups, 4) if lookups else 0.0,
+            'entries': len(self.entries),
+            'threshold': self.threshold
+        }
@@ -0,0 +1,60 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+class _Call:
+    """One in-flight execution and the number of callers awaiting it"""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key into one execution.
+
+    The first caller for a key starts the work; callers arriving while it is
+    in flight await the same result (or exception) instead of repeating it.
+    The work runs as its own task, so cancelling any one caller, including
+    the first, leaves it running for the others; it is cancelled only once
+    every caller has given up. Nothing is remembered once the call finishes,
+    so this complements a cache rather than replacing it.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self.stats = {'executed': 0, 'coalesced': 0}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Run fn once per key at a time; returns (result, whether it was shared)"""
+        call = self._calls.get(key)
+        shared = call is not None
+        if shared:
+            self.stats['coalesced'] += 1
+        else:
+            call = _Call(asyncio.create_task(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda task: self._finished(key, call))
+            self.stats['executed'] += 1
+
+        call.waiters += 1
+        try:
+            # Shielded so a cancelled caller does not cancel the shared call
+            return await asyncio.shield(call.task), shared
+        except asyncio.CancelledError:
+            if call.waiters == 1:
+                call.task.cancel()
+            raise
+        finally:
+            call.waiters -= 1
+
+    def _finished(self, key: str, call: _Call):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        # Mark any exception retrieved in case every caller was cancelled
+        if not call.task.cancelled():
+            call.task.exception()
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, 'in_flight': self.in_flight()}
@@ -0,0 +1,161 @@
+import threading
+import time
+from typing import List, Dict, Any, Optional
+import logging
+
+from services.database import connect
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+class SyncLedger:
+    """Durable inbox sync state backed by settings.DATABASE_URL.
+
+    Stores the last Gmail historyId and the status of every message seen:
+
+        pending     discovered, waiting to be processed
+        processing  claimed by a worker
+        replied     auto-response sent
+        skipped     did not need a response
+        failed      gave up after max_attempts
+
+    Claims are a single conditional UPDATE, so a message is replied to at most
+    once even with several workers, while failures go back to pending and are
+    retried on the next poll. A claim expires after claim_timeout seconds, so
+    messages held by a worker that crashed or was stopped are retried too.
+    """
+
+    def __init__(
+        self,
+        database_url: Optional[str] = None,
+        max_attempts: int = 3,
+        claim_timeout: Optional[float] = None
+    ):
+        self.max_attempts = max_attempts
+        self.claim_timeout = settings.INBOX_CLAIM_TIMEOUT if claim_timeout is None else claim_timeout
+        self._conn = connect(database_url)
+        self._lock = threading.Lock()
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS gmail_sync_state (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS processed_messages (
+                message_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                reply_id TEXT,
+                error TEXT,
+                claimed_at REAL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_processed_messages_status
+                ON processed_messages (status);
+        """)
+        columns = {row['name'] for row in self._conn.execute("PRAGMA table_info(processed_messages)")}
+        if 'claimed_at' not in columns:
+            # Ledgers created before claims expired: date existing claims from their last update
+            self._conn.execute("ALTER TABLE processed_messages ADD COLUMN claimed_at REAL")
+            self._conn.execute(
+                "UPDATE processed_messages SET claimed_at = updated_at WHERE status = 'processing'"
+            )
+
+    def get_history_id(self) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM gmail_sync_state WHERE key = 'history_id'"
+            ).fetchone()
+        return row['value'] if row else None
+
+    def set_history_id(self, history_id: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO gmail_sync_state (key, value) VALUES ('history_id', ?)",
+                (str(history_id),)
+            )
+
+    def add_pending(self, message_ids: List[str]) -> int:
+        """Record newly discovered messages; already-known IDs are ignored"""
+        now = time.time()
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO processed_messages (message_id, status, updated_at) "
+                "VALUES (?, 'pending', ?)",
+                [(message_id, now) for message_id in message_ids]
+            )
+            return self._conn.total_changes - before
+
+    def pending(self, limit: int) -> List[str]:
+        """Oldest pending message IDs, including earlier failures and expired claims"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT message_id FROM processed_messages WHERE status = 'pending' "
+                "OR (status = 'processing' AND claimed_at < ?) ORDER BY updated_at LIMIT ?",
+                (time.time() - self.claim_timeout, limit)
+            ).fetchall()
+        return [row['message_id'] for row in rows]
+
+    def claim(self, message_id: str) -> bool:
+        """Atomically move a pending message to processing; False if someone else has it.
+
+        A claim older than claim_timeout is taken over, unless it was the
+        message's last attempt, in which case the message is marked failed.
+        """
+        now = time.time()
+        expired = now - self.claim_timeout
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE processed_messages SET status = 'processing', attempts = attempts + 1, "
+                "claimed_at = ?, updated_at = ? WHERE message_id = ? AND (status = 'pending' "
+                "OR (status = 'processing' AND claimed_at < ? AND attempts < ?))",
+                (now, now, message_id, expired, self.max_attempts)
+            )
+            if cursor.rowcount == 1:
+                return True
+            # Its last attempt died with the worker; do not run it again
+            self._conn.execute(
+                "UPDATE processed_messages SET status = 'failed', "
+                "error = 'Worker stopped before finishing', updated_at = ? "
+                "WHERE message_id = ? AND status = 'processing' AND claimed_at < ? AND attempts >= ?",
+                (now, message_id, expired, self.max_attempts)
+            )
+        return False
+
+    def complete(self, message_id: str, status: str, reply_id: Optional[str] = None):
+        """Record the final outcome for a claimed message"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE processed_messages SET status = ?, reply_id = ?, error = NULL, "
+                "updated_at = ? WHERE message_id = ?",
+                (status, reply_id, time.time(), message_id)
+            )
+
+    def release(self, message_id: str, error: str):
+        """Return a failed message to pending, or mark it failed after max_attempts"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE processed_messages SET "
+                "status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "error = ?, updated_at = ? WHERE message_id = ?",
+                (self.max_attempts, error, time.time(), message_id)
+            )
+
+    def unclaim(self, message_id: str):
+        """Return a claimed message to pending without using up an attempt (its worker was stopped)"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE processed_messages SET status = 'pending', attempts = MAX(attempts - 1, 0), "
+                "claimed_at = NULL, updated_at = ? WHERE message_id = ? AND status = 'processing'",
+                (time.time(), message_id)
+            )
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) AS count FROM processed_messages GROUP BY status"
+            ).fetchall()
+        return {
+            'history_id': self.get_history_id(),
+            'messages': {row['status']: row['count'] for row in rows}
+        }
@@ -0,0 +1,396 @@
+import asyncio
+import hashlib
+import uuid
+from string import Template
+from typing import List, Dict, Any, Optional, Set, Tuple
+import logging
+
+import faiss
+from langchain_community.vectorstores import FAISS
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_core.documents import Document
+
+from services.index_store import IndexStore
+from services.keyword_index import tokenize
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Nearest examples considered per match; enough to see the runner-up template
+MATCH_CANDIDATES = 20
+
+class TemplateService:
+    """Response templates for common intents, answered without the LLM.
+
+    Each template lists example inquiries for its intent. The examples are
+    embedded through the shared embedding cache into an exact FAISS index,
+    and an inquiry whose nearest example is close enough, and clearly closer
+    than any other template's, gets that template filled in directly.
+    Inquiries that share too few words with every example are ruled out
+    before anything is embedded. Templates are persisted next to the
+    policy set; edits saved by another process are merged on save and
+    picked up by a periodic reload.
+    """
+
+    def __init__(self, embeddings, index_store: Optional[IndexStore] = None):
+        self.embeddings = embeddings
+        self.index_store = index_store or IndexStore()
+        self.templates: List[Dict[str, Any]] = []
+        self.vector_store: Optional[FAISS] = None
+        # Content words of each indexed example, for the lexical pre-filter
+        self.example_terms: List[Set[str]] = []
+        self._lock = asyncio.Lock()
+        # templates.json as this process last read or wrote it, to notice other writers
+        self._stored_version: Optional[Tuple[int, int, int]] = None
+        self._synced_templates: Dict[str, Dict[str, Any]] = {}
+        self._watch_task: Optional[asyncio.Task] = None
+        self.stats = {'matched': 0, 'prefiltered': 0, 'below_threshold': 0, 'ambiguous': 0}
+
+    async def load_templates(self):
+        """Load templates from storage and index their examples"""
+        try:
+            version = await asyncio.to_thread(self.index_store.templates_version)
+            stored_templates = await asyncio.to_thread(self.index_store.load_templates)
+            templates = stored_templates if stored_templates is not None else self._default_templates()
+            self.vector_store = await self._build_index(templates)
+            self.templates = templates
+            self._mark_synced(version)
+            logger.info(f"Loaded {len(self.templates)} response templates")
+        except Exception as e:
+            logger.error(f"Error loading templates: {str(e)}")
+            raise
+
+    async def refresh_templates(self) -> bool:
+        """Pick up template changes saved by another process; True if the templates changed.
+
+        Costs one stat() call when nothing changed.
+        """
+        if await asyncio.to_thread(self.index_store.templates_version) == self._stored_version:
+            return False
+        try:
+            async with self._lock:
+                lock = await asyncio.to_thread(self.index_store.acquire_lock)
+                try:
+                    version = await asyncio.to_thread(self.index_store.templates_version)
+                    if version == self._stored_version:
+                        return False
+                    stored = await asyncio.to_thread(self.index_store.load_templates) or []
+                    self.vector_store = await self._build_index(stored)
+                    self.templates = stored
+                    self._mark_synced(version)
+                finally:
+                    await asyncio.to_thread(self.index_store.release_lock, lock)
+
+            logger.info(f"Reloaded templates saved by another process ({len(self.templates)} templates)")
+            return True
+
+        except Exception as e:
+            logger.error(f"Error reloading templates: {str(e)}")
+            raise
+
+    async def start_watching(self, interval: float):
+        """Reload templates changed by other processes every ``interval`` seconds (0: never)"""
+        if interval > 0 and self._watch_task is None:
+            self._watch_task = asyncio.create_task(self._watch(interval), name="template-watch")
+
+    async def stop_watching(self):
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            await asyncio.gather(self._watch_task, return_exceptions=True)
+            self._watch_task = None
+
+    async def _watch(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.refresh_templates()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Already logged in refresh_templates(); try again next interval
+                pass
+
+    @staticmethod
+    def _default_templates() -> List[Dict[str, Any]]:
+        """Templates for the questions the default policies answer most often"""
+        return [
+            {
+                'id': 'support_hours_inquiry',
+                'intent': 'support_hours',
+                'examples': [
+                    'What are your support hours?',
+                    'When is customer support available?',
+                    'What time does your support team open?'
+                ],
+                'response': (
+                    "Thank you for reaching out.\n\n"
+                    "Our customer support team is available Monday through Friday, 9 AM to 6 PM EST. "
+                    "For urgent technical issues we offer 24/7 support through our emergency hotline. "
+                    "We typically respond within 2 hours during business hours and within 24 hours outside them.\n\n"
+                    "Best regards,\nCustomer Support"
+                ),
+                'policy_ids': ['support_hours']
+            },
+            {
+                'id': 'shipping_time_inquiry',
+                'intent': 'shipping_time',
+                'examples': [
+                    'How long does shipping take?',
+                    'When will my order be delivered?',
+                    'Do you offer free shipping?'
+                ],
+                'response': (
+                    "Thank you for your question about shipping.\n\n"
+                    "Standard shipping takes 3-5 business days and is free on orders over $50. "
+                    "Express shipping takes 1-2 business days for an additional fee, and international "
+                    "orders usually arrive within 7-14 days.\n\n"
+                    "Best regards,\nCustomer Support"
+                ),
+                'policy_ids': ['shipping_policy']
+            }
+        ]
+
+    async def add_template(
+        self,
+        intent: str,
+        examples: List[str],
+        response: str,
+        policy_ids: Optional[List[str]] = None
+    ) -> str:
+        """Add a new response template"""
+        try:
+            template_id = f"template_{uuid.uuid4().hex[:12]}"
+            template = {
+                'id': template_id,
+                'intent': intent,
+                'examples': examples,
+                'response': response,
+                'policy_ids': policy_ids or []
+            }
+            async with self._lock:
+                self.vector_store = await self._build_index(self.templates + [template])
+                self.templates.append(template)
+                await self._persist()
+
+            logger.info(f"Added response template: {intent}")
+            return template_id
+
+        except Exception as e:
+            logger.error(f"Error adding template: {str(e)}")
+            raise
+
+    async def update_template(
+        self,
+        template_id: str,
+        intent: Optional[str] = None,
+        examples: Optional[List[str]] = None,
+        response: Optional[str] = None,
+        policy_ids: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """Update an existing response template"""
+        try:
+            async with self._lock:
+                template = self._get_template(template_id)
+
+                updated = dict(template)
+                if intent is not None:
+                    updated['intent'] = intent
+                if examples is not None:
+                    updated['examples'] = examples
+                if response is not None:
+                    updated['response'] = response
+                if policy_ids is not None:
+                    updated['policy_ids'] = policy_ids
+
+                self.vector_store = await self._build_index(
+                    [updated if t is template else t for t in self.templates]
+                )
+                template.update(updated)
+                await self._persist()
+
+            logger.info(f"Updated response template: {template_id}")
+            return template
+
+        except KeyError:
+            raise
+        except Exception as e:
+            logger.error(f"Error updating template: {str(e)}")
+            raise
+
+    async def delete_template(self, template_id: str) -> bool:
+        """Delete a response template"""
+        try:
+            async with self._lock:
+                template = self._get_template(template_id)
+                self.vector_store = await self._build_index(
+                    [t for t in self.templates if t is not template]
+                )
+                self.templates.remove(template)
+                await self._persist()
+
+            logger.info(f"Deleted response template: {template_id}")
+            return True
+
+        except KeyError:
+            raise
+        except Exception as e:
+            logger.error(f"Error deleting template: {str(e)}")
+            raise
+
+    async def get_all_templates(self) -> List[Dict[str, Any]]:
+        """Get all response templates"""
+        return self.templates
+
+    async def match(self, query: str) -> Optional[Dict[str, Any]]:
+        """Best template for an inquiry, or None when no template fits confidently.
+
+        The result carries the template and ``confidence``, the cosine
+        similarity of the inquiry to the template's nearest example. It must
+        reach TEMPLATE_MATCH_THRESHOLD and lead the next template by
+        TEMPLATE_MATCH_MARGIN.
+        """
+        if not settings.TEMPLATES_ENABLED or self.vector_store is None:
+            return None
+        if not self._could_match(query):
+            # Saves the embedding call that retrieval's keyword fast path may not need
+            self.stats['prefiltered'] += 1
+            return None
+
+        embedding = await self.embeddings.aembed_query(query)
+        results = await self.vector_store.asimilarity_search_with_score_by_vector(
+            embedding, k=min(MATCH_CANDIDATES, self.vector_store.index.ntotal)
+        )
+        # Best example similarity per template
+        best: Dict[str, float] = {}
+        for doc, distance in results:
+            relevance = max(0.0, 1.0 - float(distance) / 2)
+            template_id = doc.metadata['template_id']
+            best[template_id] = max(best.get(template_id, 0.0), relevance)
+        if not best:
+            return None
+
+        ranked = sorted(best.items(), key=lambda item: item[1], reverse=True)
+        template_id, confidence = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+        if confidence < settings.TEMPLATE_MATCH_THRESHOLD:
+            self.stats['below_threshold'] += 1
+            return None
+        if confidence - runner_up < settings.TEMPLATE_MATCH_MARGIN:
+            self.stats['ambiguous'] += 1
+            return None
+
+        self.stats['matched'] += 1
+        return {'template': self._get_template(template_id), 'confidence': confidence}
+
+    def _could_match(self, query: str) -> bool:
+        """Whether the inquiry contains enough of some example's words to be worth embedding.
+
+        A match needs near-identical wording (TEMPLATE_MATCH_THRESHOLD), so
+        an inquiry sharing few words with every example cannot reach it.
+        """
+        overlap = settings.TEMPLATE_PREFILTER_OVERLAP
+        if overlap <= 0:
+            return True
+        terms = set(tokenize(query))
+        return any(
+            len(example & terms) >= overlap * len(example)
+            for example in self.example_terms if example
+        )
+
+    @staticmethod
+    def render(template: Dict[str, Any], subject: str, priority: str) -> str:
+        """Fill in a template's $subject and $priority placeholders"""
+        return Template(template['response']).safe_substitute(
+            subject=subject, priority=priority
+        ).strip()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            'templates': len(self.templates),
+            'examples': self.vector_store.index.ntotal if self.vector_store else 0
+        }
+
+    def _get_template(self, template_id: str) -> Dict[str, Any]:
+        """Look up a template by ID"""
+        for template in self.templates:
+            if template['id'] == template_id:
+                return template
+        raise KeyError(f"Template not found: {template_id}")
+
+    async def _build_index(self, templates: List[Dict[str, Any]]) -> Optional[FAISS]:
+        """Index every template example; vectors come from the embedding cache when unchanged.
+
+        Also refreshes the examples' words used by the pre-filter.
+        """
+        ids = []
+        documents = []
+        for template in templates:
+            for example in dict.fromkeys(template['examples']):
+                example_hash = hashlib.sha256(example.encode('utf-8')).hexdigest()[:16]
+                ids.append(f"{template['id']}:{example_hash}")
+                documents.append(Document(
+                    id=ids[-1],
+                    page_content=example,
+                    metadata={'template_id': template['id'], 'intent': template['intent']}
+                ))
+        if not documents:
+            self.example_terms = []
+            return None
+
+        texts = [d.page_content for d in documents]
+        vectors = await self.embeddings.aembed_documents(texts)
+        # Templates number in the tens to hundreds, so exact search is always cheap enough
+        index = faiss.IndexFlatL2(len(vectors[0]))
+        store = FAISS(self.embeddings, index, InMemoryDocstore(), {})
+        await asyncio.to_thread(
+            store.add_embeddings,
+            list(zip(texts, vectors)),
+            metadatas=[d.metadata for d in documents],
+            ids=ids
+        )
+        self.example_terms = [set(tokenize(text)) for text in texts]
+        return store
+
+    async def _persist(self):
+        """Save the templates after a change.
+
+        If another process saved templates since this one last read them, the
+        changes made here are applied on top of the stored set instead of
+        overwriting it.
+        """
+        lock = await asyncio.to_thread(self.index_store.acquire_lock)
+        try:
+            if await asyncio.to_thread(self.index_store.templates_version) != self._stored_version:
+                stored = await asyncio.to_thread(self.index_store.load_templates) or []
+                logger.info("Templates were changed by another process, merging before saving")
+                merged = self._merge_into(stored)
+                self.vector_store = await self._build_index(merged)
+                self.templates = merged
+            await asyncio.to_thread(self.index_store.save_templates, self.templates)
+            # Our own write must not look like another process's change
+            self._mark_synced(await asyncio.to_thread(self.index_store.templates_version))
+        finally:
+            await asyncio.to_thread(self.index_store.release_lock, lock)
+
+    def _merge_into(self, stored: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """The stored templates with the adds, edits and deletes made here since the last sync.
+
+        When both processes edited a template the later save wins; a template
+        deleted elsewhere stays deleted.
+        """
+        merged = {t['id']: t for t in stored}
+        current = {t['id']: t for t in self.templates}
+        for template_id in self._synced_templates.keys() - current.keys():
+            merged.pop(template_id, None)
+        for template_id, template in current.items():
+            synced = self._synced_templates.get(template_id)
+            if synced == template or (synced is not None and template_id not in merged):
+                continue
+            merged[template_id] = template
+        return list(merged.values())
+
+    def _mark_synced(self, version: Optional[Tuple[int, int, int]]):
+        """Remember the stored templates as matching this process's"""
+        self._stored_version = version
+        self._synced_templates = {t['id']: dict(t) for t in self.templates}
@@ -0,0 +1,135 @@
+"""Request IDs and per-stage timing spans.
+
+Every HTTP request, inbox message and job runs under a request ID held in
+a context variable, so it follows the work across awaits and into tasks
+started from it. Log lines carry it, and stage timings attach it as an
+exemplar, so one email's path can be traced from a slow histogram bucket
+to its log lines.
+"""
+import contextvars
+import logging
+import re
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from starlette.routing import Match
+
+from services import metrics
+
+logger = logging.getLogger(__name__)
+
+LOG_FORMAT = "%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s"
+REQUEST_ID_HEADER = "X-Request-ID"
+# Caller-supplied IDs are echoed into logs and headers, so only accept plain tokens
+VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._:-]{1,64}$")
+
+_request_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex
+
+def get_request_id() -> Optional[str]:
+    """ID of the request, message or job being handled, if any"""
+    return _request_id.get()
+
+@contextmanager
+def request_scope(request_id: Optional[str] = None) -> Iterator[str]:
+    """Run the enclosed work under a request ID (a new one if none is given)"""
+    request_id = request_id or new_request_id()
+    token = _request_id.set(request_id)
+    try:
+        yield request_id
+    finally:
+        _request_id.reset(token)
+
+def _exemplar() -> Optional[dict]:
+    request_id = get_request_id()
+    return {'request_id': request_id} if request_id else None
+
+def record(stage: str, seconds: float):
+    """Record a stage timing measured elsewhere"""
+    metrics.STAGE_SECONDS.labels(stage).observe(seconds, exemplar=_exemplar())
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Time one stage (an embedding call, a FAISS search, a Redis round trip...).
+
+    Works around awaits too: ``with span("llm"): await chain.ainvoke(...)``.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        metrics.STAGE_ERRORS.labels(stage).inc()
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        record(stage, elapsed)
+        logger.debug(f"{stage} took {elapsed * 1000:.1f}ms")
+
+class RequestIdFilter(logging.Filter):
+    """Adds the current request ID to every log record as ``request_id``"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = get_request_id() or "-"
+        return True
+
+def configure_logging(level: int = logging.INFO):
+    """Log with the request ID on every line"""
+    logging.basicConfig(level=level, format=LOG_FORMAT)
+    for handler in logging.getLogger().handlers:
+        handler.addFilter(RequestIdFilter())
+
+def _route_path(scope) -> str:
+    """Route template (e.g. /jobs/{job_id}), so metric labels stay bounded"""
+    app = scope.get("app")
+    for route in getattr(app, "routes", []):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+class RequestContextMiddleware:
+    """ASGI middleware giving each HTTP request an ID and recording request metrics.
+
+    The ID comes from the X-Request-ID header when it is a plain token,
+    otherwise a new one is made; it is returned in the response header.
+    Implemented at the ASGI level so streamed responses stay inside the
+    request's context and are counted as in flight until they finish.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        supplied = dict(scope["headers"]).get(REQUEST_ID_HEADER.lower().encode(), b"").decode("latin-1")
+        request_id = supplied if VALID_REQUEST_ID.match(supplied) else new_request_id()
+        status = 500
+
+        async def send_with_request_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (REQUEST_ID_HEADER.lower().encode(), request_id.encode())
+                ]
+            await send(message)
+
+        metrics.HTTP_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        with request_scope(request_id):
+            try:
+                await self.app(scope, receive, send_with_request_id)
+            finally:
+                elapsed = time.perf_counter() - started
+                metrics.HTTP_IN_FLIGHT.dec()
+                route = _route_path(scope)
+                metrics.HTTP_REQUESTS.labels(scope["method"], route, str(status)).inc()
+                metrics.HTTP_SECONDS.labels(scope["method"], route).observe(elapsed, exemplar=_exemplar())
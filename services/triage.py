@@ -0,0 +1,133 @@
+import re
+import time
+from collections import Counter, deque, namedtuple
+from email.utils import parseaddr
+from typing import Dict, Any, Iterable, Optional, Deque
+import logging
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# respond: whether to generate a reply; reason: why not (None when responding)
+TriageDecision = namedtuple("TriageDecision", ["respond", "reason"])
+
+NO_REPLY_LOCAL_PART = re.compile(r"^(no[-_.]?reply|do[-_.]?not[-_.]?reply|notifications?|alerts?)\b")
+BOUNCE_LOCAL_PART = re.compile(r"^(mailer[-_.]?daemon|postmaster|bounces?)\b")
+BULK_PRECEDENCE = {"bulk", "list", "junk"}
+AUTO_RESPONSE_SUPPRESS = {"all", "oof", "autoreply"}
+
+# (weight, category, pattern) features for the subject + snippet text model.
+# Weights are log-odds style: a message is automated when they sum past
+# TRIAGE_TEXT_THRESHOLD, and the strongest category becomes the reason.
+TEXT_FEATURES = [
+    (3.0, "out_of_office", re.compile(r"\b(out of (the )?office|automatic reply|auto[- ]?reply|on (annual )?leave|away from my desk)\b")),
+    (3.0, "bounce", re.compile(r"\b(undeliverable|delivery (status notification|has failed|failure)|mail delivery failed|returned mail)\b")),
+    (2.0, "newsletter", re.compile(r"\b(unsubscribe|newsletter|view (this email )?in (your )?browser|manage (your )?preferences)\b")),
+    (1.5, "notification", re.compile(r"\b(verification code|one[- ]time (password|code)|password reset|your (order|receipt|invoice|statement) (#|no\.?|number)|sign[- ]in attempt)\b")),
+    (1.0, "marketing", re.compile(r"\b(\d{1,2}% off|limited time|special offer|exclusive deal|shop now)\b")),
+    (-2.0, "question", re.compile(r"\?|\b(please|could you|can you|help|issue|problem|refund|how do i)\b")),
+]
+
+class EmailTriage:
+    """Local pre-filter that decides, before any OpenAI call, whether mail needs a reply.
+
+    Checks run cheapest first: RFC 3834 / mailing-list headers, automated
+    sender addresses, loop detection against our own address and recent
+    replies per thread, then a small weighted-pattern text classifier over
+    the subject and snippet. Each skip is counted by reason.
+    """
+
+    def __init__(self, own_addresses: Optional[Iterable[str]] = None):
+        self.own_addresses = {a.strip().lower() for a in (own_addresses or []) if a.strip()}
+        self.text_threshold = settings.TRIAGE_TEXT_THRESHOLD
+        self.max_replies_per_thread = settings.TRIAGE_MAX_REPLIES_PER_THREAD
+        self.loop_window = settings.TRIAGE_LOOP_WINDOW
+        # thread_id -> timestamps of our recent replies in that thread
+        self._replies: Dict[str, Deque[float]] = {}
+        self.counters = Counter()
+        self.total_seconds = 0.0
+
+    def add_own_address(self, address: Optional[str]):
+        if address:
+            self.own_addresses.add(address.strip().lower())
+
+    def record_reply(self, thread_id: Optional[str]):
+        """Remember that we replied in a thread, for loop detection"""
+        if thread_id:
+            self._replies.setdefault(thread_id, deque()).append(time.monotonic())
+
+    def classify(self, email: Dict[str, Any]) -> TriageDecision:
+        started = time.perf_counter()
+        reason = self._skip_reason(email)
+        self.total_seconds += time.perf_counter() - started
+        self.counters[reason or "respond"] += 1
+        return TriageDecision(reason is None, reason)
+
+    def _skip_reason(self, email: Dict[str, Any]) -> Optional[str]:
+        headers = email.get('headers') or {}
+
+        auto_submitted = headers.get('auto-submitted', '').strip().lower()
+        if auto_submitted and auto_submitted != 'no':
+            return 'auto_submitted'
+        if headers.get('x-autoreply') or headers.get('x-autorespond'):
+            return 'auto_reply'
+        if headers.get('x-auto-response-suppress', '').strip().lower() in AUTO_RESPONSE_SUPPRESS:
+            return 'auto_reply'
+        if headers.get('list-unsubscribe') or headers.get('list-id'):
+            return 'mailing_list'
+        if headers.get('precedence', '').strip().lower() in BULK_PRECEDENCE:
+            return 'mailing_list'
+        if headers.get('return-path', '').strip() == '<>' \
+                or 'multipart/report' in headers.get('content-type', '').lower():
+            return 'bounce'
+
+        address = parseaddr(email.get('sender', ''))[1].lower()
+        local_part = address.split('@')[0]
+        if BOUNCE_LOCAL_PART.match(local_part):
+            return 'bounce'
+        if NO_REPLY_LOCAL_PART.match(local_part):
+            return 'no_reply_sender'
+
+        if address in self.own_addresses:
+            return 'own_message'
+        if self._is_reply_loop(email.get('thread_id')):
+            return 'reply_loop'
+
+        return self._classify_text(f"{email.get('subject', '')} {email.get('snippet', '')}")
+
+    def _is_reply_loop(self, thread_id: Optional[str]) -> bool:
+        """True when we already replied in this thread too often within the window"""
+        replies = self._replies.get(thread_id) if thread_id else None
+        if not replies:
+            return False
+        cutoff = time.monotonic() - self.loop_window
+        while replies and replies[0] < cutoff:
+            replies.popleft()
+        if not replies:
+            del self._replies[thread_id]
+            return False
+        return len(replies) >= self.max_replies_per_thread
+
+    def _classify_text(self, text: str) -> Optional[str]:
+        text = text.lower()
+        score = 0.0
+        strongest = None
+        for weight, category, pattern in TEXT_FEATURES:
+            if pattern.search(text):
+                score += weight
+                if weight > 0 and (strongest is None or weight > strongest[0]):
+                    strongest = (weight, category)
+        if strongest and score >= self.text_threshold:
+            return f"text_{strongest[1]}"
+        return None
+
+    def get_stats(self) -> Dict[str, Any]:
+        classified = sum(self.counters.values())
+        skipped = {k: v for k, v in self.counters.items() if k != 'respond'}
+        return {
+            'classified': classified,
+            'respond': self.counters['respond'],
+            'skipped': skipped,
+            'avg_microseconds': round(self.total_seconds / classified * 1e6, 2) if classified else 0.0
+        }
@@ -0,0 +1,284 @@
+"""Local stand-in for the Gmail REST API, for offline load testing.
+
+Run it and point the app at it:
+
+    uvicorn tools.fake_gmail_server:app --port 8025
+    GMAIL_API_ENDPOINT=http://localhost:8025/ uvicorn main:app
+
+Only the endpoints the app uses are implemented, including the batch
+endpoint. Every request sleeps for FAKE_GMAIL_LATENCY_MS to mimic a real
+round trip, and FAKE_GMAIL_ERROR_RATE of requests fail with a 503.
+"""
+import asyncio
+import base64
+import itertools
+import json
+import os
+import random
+import re
+import time
+import uuid
+from email import message_from_bytes
+from email.parser import Parser
+from typing import List, Dict, Any, Optional
+from urllib.parse import urlparse, parse_qs
+
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+LATENCY_MS = int(os.getenv("FAKE_GMAIL_LATENCY_MS", "50"))
+SEED_MESSAGES = int(os.getenv("FAKE_GMAIL_SEED_MESSAGES", "100"))
+ERROR_RATE = float(os.getenv("FAKE_GMAIL_ERROR_RATE", "0"))
+
+app = FastAPI(title="Fake Gmail API")
+
+class Mailbox:
+    """In-memory mailbox holding inbound and sent messages"""
+
+    def __init__(self):
+        self.messages: Dict[str, Dict[str, Any]] = {}
+        self.order: List[str] = []  # newest first
+        self._ids = itertools.count(1)
+        self.history_id = 1000
+        # (historyId, messageId) for every message added
+        self.history: List[tuple] = []
+        self.request_count = 0
+        self.error_count = 0
+
+    def add(
+        self,
+        sender: str,
+        subject: str,
+        body: str,
+        label_ids: Optional[List[str]] = None,
+        headers: Optional[Dict[str, str]] = None
+    ) -> Dict[str, Any]:
+        message_id = f"{next(self._ids):016x}"
+        all_headers = {
+            'From': sender,
+            'To': 'support@example.com',
+            'Subject': subject,
+            'Message-ID': f"<{message_id}@fake.gmail>",
+            **(headers or {})
+        }
+        message = {
+            'id': message_id,
+            'threadId': message_id,
+            'labelIds': label_ids or ['INBOX', 'UNREAD'],
+            'snippet': body[:200],
+            'internalDate': str(int(time.time() * 1000)),
+            'payload': {
+                'mimeType': 'text/plain',
+                'headers': [{'name': k, 'value': v} for k, v in all_headers.items()],
+                'body': {'data': base64.urlsafe_b64encode(body.encode()).decode()}
+            }
+        }
+        self.history_id += 1
+        message['historyId'] = str(self.history_id)
+        self.messages[message_id] = message
+        self.order.insert(0, message_id)
+        self.history.append((self.history_id, message_id))
+        return message
+
+mailbox = Mailbox()
+
+def _seed():
+    subjects = [
+        ("Refund request", "I would like a refund for my order, it arrived damaged."),
+        ("Where is my package?", "My order has not arrived yet, can you check the shipping status?"),
+        ("Support hours", "When is your support team available?"),
+    ]
+    for i in range(SEED_MESSAGES):
+        subject, body = subjects[i % len(subjects)]
+        mailbox.add(f"customer{i}@example.com", subject, body)
+
+_seed()
+
+async def _round_trip():
+    mailbox.request_count += 1
+    if LATENCY_MS:
+        await asyncio.sleep(LATENCY_MS / 1000)
+    if ERROR_RATE and random.random() < ERROR_RATE:
+        mailbox.error_count += 1
+        raise HTTPException(status_code=503, detail="Injected backend error")
+
+def _view(message: Dict[str, Any], format: str, metadata_headers: Optional[List[str]]) -> Dict[str, Any]:
+    """Shape a message the way Gmail does for the requested format"""
+    if format == 'minimal':
+        return {k: message[k] for k in ('id', 'threadId', 'labelIds', 'snippet', 'internalDate')}
+    if format == 'metadata':
+        headers = message['payload']['headers']
+        if metadata_headers:
+            wanted = {h.lower() for h in metadata_headers}
+            headers = [h for h in headers if h['name'].lower() in wanted]
+        view = {k: message[k] for k in ('id', 'threadId', 'labelIds', 'snippet', 'internalDate')}
+        view['payload'] = {'mimeType': message['payload']['mimeType'], 'headers': headers}
+        return view
+    return message
+
+@app.get("/gmail/v1/users/{user_id}/profile")
+async def get_profile(user_id: str):
+    await _round_trip()
+    return {
+        'emailAddress': 'support@example.com',
+        'messagesTotal': len(mailbox.messages),
+        'historyId': str(mailbox.history_id)
+    }
+
+@app.get("/gmail/v1/users/{user_id}/history")
+async def list_history(
+    user_id: str,
+    startHistoryId: int,
+    labelId: Optional[str] = None,
+    historyTypes: Optional[List[str]] = Query(None),
+    maxResults: int = 100,
+    pageToken: Optional[str] = None
+):
+    await _round_trip()
+    records = [
+        (hid, mid) for hid, mid in mailbox.history
+        if hid > startHistoryId
+        and (not labelId or labelId in mailbox.messages[mid]['labelIds'])
+    ]
+    start = int(pageToken or 0)
+    page = records[start:start + min(maxResults, 500)]
+    response = {
+        'history': [
+            {
+                'id': str(hid),
+                'messagesAdded': [{'message': {
+                    'id': mid,
+                    'threadId': mailbox.messages[mid]['threadId'],
+                    'labelIds': mailbox.messages[mid]['labelIds']
+                }}]
+            }
+            for hid, mid in page
+        ],
+        'historyId': str(mailbox.history_id)
+    }
+    if start + len(page) < len(records):
+        response['nextPageToken'] = str(start + len(page))
+    return response
+
+@app.get("/gmail/v1/users/{user_id}/messages")
+async def list_messages(
+    user_id: str,
+    labelIds: Optional[List[str]] = Query(None),
+    maxResults: int = 100,
+    pageToken: Optional[str] = None
+):
+    await _round_trip()
+    ids = [
+        mid for mid in mailbox.order
+        if not labelIds or set(labelIds) <= set(mailbox.messages[mid]['labelIds'])
+    ]
+    start = int(pageToken or 0)
+    page = ids[start:start + min(maxResults, 500)]
+    response = {
+        'messages': [{'id': mid, 'threadId': mailbox.messages[mid]['threadId']} for mid in page],
+        'resultSizeEstimate': len(ids)
+    }
+    if start + len(page) < len(ids):
+        response['nextPageToken'] = str(start + len(page))
+    return response
+
+@app.get("/gmail/v1/users/{user_id}/messages/{message_id}")
+async def get_message(
+    user_id: str,
+    message_id: str,
+    format: str = "full",
+    metadataHeaders: Optional[List[str]] = Query(None)
+):
+    await _round_trip()
+    message = mailbox.messages.get(message_id)
+    if message is None:
+        raise HTTPException(status_code=404, detail="Requested entity was not found.")
+    return _view(message, format, metadataHeaders)
+
+MESSAGE_PATH = re.compile(r"^/gmail/v1/users/[^/]+/messages/([^/]+)$")
+
+@app.post("/batch/gmail/v1")
+async def batch(request: Request):
+    """multipart/mixed batch endpoint; only messages.get is supported"""
+    await _round_trip()
+    content_type = request.headers['content-type']
+    body = (await request.body()).decode()
+    parsed = Parser().parsestr(f"Content-Type: {content_type}\r\n\r\n{body}")
+
+    boundary = uuid.uuid4().hex
+    parts = []
+    for part in parsed.get_payload():
+        request_line = part.get_payload().lstrip().splitlines()[0]
+        method, target, _ = request_line.split(" ", 2)
+        url = urlparse(target)
+        query = parse_qs(url.query)
+        match = MESSAGE_PATH.match(url.path)
+        message = mailbox.messages.get(match.group(1)) if match and method == "GET" else None
+        if message is None:
+            status, payload = "404 Not Found", {'error': {'code': 404, 'message': 'Requested entity was not found.'}}
+        else:
+            status = "200 OK"
+            payload = _view(message, query.get('format', ['full'])[0], query.get('metadataHeaders'))
+        content_id = part['Content-ID'][1:-1]
+        parts.append(
+            f"--{boundary}\r\n"
+            "Content-Type: application/http\r\n"
+            f"Content-ID: <response-{content_id}>\r\n\r\n"
+            f"HTTP/1.1 {status}\r\n"
+            "Content-Type: application/json; charset=UTF-8\r\n\r\n"
+            f"{json.dumps(payload)}\r\n"
+        )
+    parts.append(f"--{boundary}--\r\n")
+    return Response(
+        content="".join(parts),
+        media_type=f"multipart/mixed; boundary={boundary}"
+    )
+
+class SendRequest(BaseModel):
+    raw: str
+    threadId: Optional[str] = None
+
+@app.post("/gmail/v1/users/{user_id}/messages/send")
+async def send_message(user_id: str, request: SendRequest):
+    await _round_trip()
+    parsed = message_from_bytes(base64.urlsafe_b64decode(request.raw))
+    headers = {k: v for k, v in parsed.items() if k.lower() not in ('to', 'subject')}
+    message = mailbox.add(
+        sender='support@example.com',
+        subject=parsed.get('subject', ''),
+        body='',
+        label_ids=['SENT'],
+        headers={'To': parsed.get('to', ''), **headers}
+    )
+    if request.threadId:
+        message['threadId'] = request.threadId
+    return {'id': message['id'], 'threadId': message['threadId'], 'labelIds': ['SENT']}
+
+class InjectRequest(BaseModel):
+    sender: str
+    subject: str
+    body: str
+    headers: Optional[Dict[str, str]] = None
+
+@app.post("/_fake/messages")
+async def inject_message(request: InjectRequest):
+    """Deliver a new inbound message to the fake inbox"""
+    message = mailbox.add(request.sender, request.subject, request.body, headers=request.headers)
+    return {'id': message['id']}
+
+@app.get("/_fake/stats")
+async def fake_stats():
+    sent = sum(1 for m in mailbox.messages.values() if 'SENT' in m['labelIds'])
+    return {
+        'messages': len(mailbox.messages),
+        'sent': sent,
+        'requests': mailbox.request_count,
+        'errors': mailbox.error_count,
+        'error_rate': ERROR_RATE,
+        'latency_ms': LATENCY_MS
+    }
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=int(os.getenv("FAKE_GMAIL_PORT", "8025")))
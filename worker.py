@@ -0,0 +1,56 @@
+"""Standalone job worker: runs queued batch and inbox jobs outside the API process.
+
+    python worker.py [--concurrency N] [--metrics-port PORT]
+
+Any number of workers can share one DATABASE_URL; each job is claimed by
+exactly one of them. With --metrics-port the worker serves its own
+Prometheus metrics, since the API's /metrics only covers the API process.
+"""
+import argparse
+import asyncio
+import logging
+import signal
+
+from prometheus_client import start_http_server
+
+from services import metrics, tracing
+from services.container import ServiceContainer
+from config.settings import settings
+
+tracing.configure_logging(logging.INFO)
+logger = logging.getLogger(__name__)
+
+async def run(concurrency: int, metrics_port: int = 0):
+    services = ServiceContainer()
+    if metrics_port:
+        metrics.register_services(services)
+        start_http_server(metrics_port)
+        logger.info(f"Serving metrics on port {metrics_port}")
+    await services.startup(job_workers=concurrency)
+    logger.info("Job worker ready")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:  # Windows: Ctrl+C raises KeyboardInterrupt instead
+            pass
+    try:
+        await stop.wait()
+    finally:
+        logger.info("Shutting down job worker")
+        await services.shutdown()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run queued email jobs")
+    parser.add_argument(
+        "--concurrency", type=int, default=settings.JOB_WORKER_CONCURRENCY,
+        help="jobs run at once by this process"
+    )
+    parser.add_argument(
+        "--metrics-port", type=int, default=0,
+        help="serve Prometheus metrics on this port (0: off)"
+    )
+    args = parser.parse_args()
+    asyncio.run(run(args.concurrency, args.metrics_port))